@@ -0,0 +1,103 @@
+"""
+Benchmark of the TTS text chunker against the original chunk_text.
+
+Generates long synthetic transcripts and reports, for both implementations,
+the time to chunk them, the number of chunks, how uneven the chunk lengths
+are and how many chunks end at a clause (comma) or in the middle of a phrase
+rather than at the end of a sentence.
+
+    python benchmarks/bench_chunker.py [--words 1000 10000 100000] [--vocab path/to/xtts/vocab.json]
+
+With --vocab the new chunker also runs in token mode, counting with the XTTS
+tokenizer (needs the TTS package).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.text_chunker import chunk_text, XTTS_DEFAULT_MAX_TOKENS, TOKEN_MARGIN
+
+WORDS = ("the", "patient", "said", "that", "speech", "therapy", "helps", "every", "morning", "with",
+         "breathing", "exercises", "and", "reading", "aloud", "slowly", "before", "lunch", "we", "practice")
+
+
+def legacy_chunk_text(text, max_length=250):
+    """The original chunker: re-joins the current chunk for every word."""
+    words = text.split()
+    chunks = []
+    current_chunk = []
+
+    for word in words:
+        if len(" ".join(current_chunk + [word])) <= max_length:
+            current_chunk.append(word)
+        else:
+            chunks.append(" ".join(current_chunk))
+            current_chunk = [word]
+
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+
+    return chunks
+
+
+def make_transcript(n_words, seed=0):
+    """Whisper-like text: sentences of 4-40 words, some with commas."""
+    rng = random.Random(seed)
+    sentences = []
+    count = 0
+    while count < n_words:
+        length = rng.randint(4, 40)
+        words = [rng.choice(WORDS) for _ in range(length)]
+        for position in range(6, length - 3, rng.randint(6, 12)):
+            words[position] += ","
+        sentences.append(" ".join(words).capitalize() + rng.choice(".?!"))
+        count += length
+    return " ".join(sentences)
+
+
+def report(name, chunker, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = chunker(text)
+        timings.append(time.perf_counter() - start)
+    lengths = [len(chunk) for chunk in chunks]
+    clause_cuts = sum(1 for chunk in chunks[:-1] if chunk[-1] in ",;:")
+    word_cuts = sum(1 for chunk in chunks[:-1] if chunk[-1] not in ".?!,;:")
+    print(f"  {name:<14} {min(timings) * 1000:9.2f} ms {len(chunks):6d} chunks  "
+          f"len mean {statistics.mean(lengths):6.1f} stdev {statistics.pstdev(lengths):5.1f} "
+          f"min {min(lengths):4d} max {max(lengths):4d}  "
+          f"cuts at clause {clause_cuts / len(chunks):6.1%} mid-phrase {word_cuts / len(chunks):6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--max-length", type=int, default=250)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--vocab", help="XTTS vocab.json, enables the token-counting mode")
+    args = parser.parse_args()
+
+    count_tokens = None
+    if args.vocab:
+        from TTS.tts.layers.xtts.tokenizer import VoiceBpeTokenizer
+        tokenizer = VoiceBpeTokenizer(args.vocab)
+        count_tokens = lambda text: len(tokenizer.encode(text, lang="en"))
+
+    for n_words in args.words:
+        text = make_transcript(n_words)
+        print(f"{n_words} words ({len(text)} characters)")
+        report("legacy", lambda t: legacy_chunk_text(t, args.max_length), text, args.repeat)
+        report("sentence-aware", lambda t: chunk_text(t, args.max_length), text, args.repeat)
+        if count_tokens is not None:
+            report("xtts tokens", lambda t: chunk_text(t, args.max_length, count_tokens,
+                                                      XTTS_DEFAULT_MAX_TOKENS - TOKEN_MARGIN), text, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
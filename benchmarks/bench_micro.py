@@ -0,0 +1,142 @@
+"""
+Micro-benchmarks of the request-path helpers at realistic data sizes:
+
+- chunk_text on transcripts of a short note, a long dictation and a whole session
+- the metadata store (save_metadata / lookups / per-user listings) holding --records records
+- the user store (store_user / lookups / snapshot / flush) holding --users users
+
+    python benchmarks/bench_micro.py [--records 20000] [--users 5000] [--repeat 200]
+                                     [--save-baseline micro.json] [--baseline micro.json]
+
+Everything runs in a temporary directory; nothing in the working tree is touched.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from common import (PeakRSS, add_baseline_arguments, add_repo_to_path, finish, print_result, summarize, time_calls,
+                    work_in_temp_dir)
+
+add_repo_to_path()
+BENCH_DIR = work_in_temp_dir()
+
+from bench_chunker import make_transcript
+from utils.metadata_store import JSONFileMetadataStore, SQLiteMetadataStore
+from utils.text_chunker import chunk_text
+from utils.user_storage import UserStore
+
+# Transcript sizes: a one minute note, a ten minute dictation, a hundred minute session
+TRANSCRIPT_WORDS = (150, 1500, 15000)
+
+
+def make_record(rng, index, n_users):
+    """A record shaped like the ones the frontend sends to /save_metadata."""
+    epoch = 1700000000 + index
+    user_id = f"user-{rng.randrange(n_users)}"
+    return {
+        "id": f"{rng.randint(1000, 9999)}_{epoch}",
+        "user_id": user_id,
+        "type": rng.choice(("recording", "conversation")),
+        "input_audio_url": f"{user_id}_input_{epoch}.ogg",
+        "generated_speech_url": f"{user_id}_output_{epoch}.wav",
+        "transcription": make_transcript(rng.randint(10, 80), seed=index)
+    }
+
+
+def measure(results, name, function, repeat, elapsed=None):
+    with PeakRSS() as rss:
+        latencies = time_calls(function, repeat)
+    metrics = summarize(latencies, elapsed)
+    metrics["peak_rss_mb"] = rss.peak_mb
+    results[name] = metrics
+    print_result(name, metrics)
+
+
+def bench_chunker(results, repeat):
+    print("chunk_text")
+    for n_words in TRANSCRIPT_WORDS:
+        text = make_transcript(n_words)
+        measure(results, f"chunk_text/{n_words}_words", lambda: chunk_text(text, 250),
+                max(1, repeat * 150 // n_words))
+
+
+def bench_metadata(results, directory, n_records, repeat, backends):
+    rng = random.Random(0)
+    n_users = max(1, n_records // 50)
+    records = [make_record(rng, index, n_users) for index in range(n_records)]
+    for backend in backends:
+        print(f"metadata store ({backend}, {n_records} records)")
+        if backend == "sqlite":
+            store = SQLiteMetadataStore(os.path.join(directory, "metadata.db"), legacy_path=None)
+            for record in records:
+                store.append(record)
+        else:
+            store = JSONFileMetadataStore(os.path.join(directory, "metadata.json"))
+            store._save(list(records))
+
+        new_records = iter(make_record(rng, n_records + index, n_users) for index in range(repeat))
+        # The JSON backend rewrites the whole file per record, keep its run short
+        writes = repeat if backend == "sqlite" else max(1, repeat // 20)
+        measure(results, f"metadata/{backend}/save", lambda: store.append(next(new_records)), writes)
+        ids = [record["id"] for record in rng.sample(records, min(len(records), repeat))]
+        lookups = iter(ids)
+        measure(results, f"metadata/{backend}/get", lambda: store.get(next(lookups)), len(ids))
+        users = iter(f"user-{rng.randrange(n_users)}" for _ in range(repeat))
+        measure(results, f"metadata/{backend}/user_records", lambda: list(store.iter_records(user_id=next(users))),
+                max(1, repeat // 4))
+        measure(results, f"metadata/{backend}/page_of_50", lambda: list(store.iter_records(limit=50)),
+                max(1, repeat // 4))
+
+
+def bench_user_store(results, directory, n_users, repeat):
+    print(f"user store ({n_users} users)")
+    path = os.path.join(directory, "user_details.json")
+    # Long flush interval: the flushes are measured on their own below
+    store = UserStore(path, f"{path}.journal", flush_seconds=3600)
+    store.replace_all({
+        f"user-{index}": {"uid": str(index), "displayName": f"User {index}", "email": f"user{index}@example.com",
+                          "user_id": f"user-{index}"}
+        for index in range(n_users)
+    })
+
+    counter = iter(range(n_users, n_users + repeat * 4))
+
+    def put():
+        index = next(counter)
+        store.put(f"user-{index}", {"uid": str(index), "displayName": f"User {index}", "user_id": f"user-{index}"})
+
+    measure(results, "user_store/store_user", put, repeat)
+    rng = random.Random(1)
+    measure(results, "user_store/get", lambda: store.get(f"user-{rng.randrange(n_users)}"), repeat)
+    measure(results, "user_store/snapshot", store.snapshot, max(1, repeat // 10))
+
+    def put_and_flush():
+        put()
+        store.flush()
+
+    measure(results, "user_store/flush", put_and_flush, max(1, repeat // 20))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--metadata-backends", nargs="+", default=["sqlite", "json"], choices=["sqlite", "json"])
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    directory = BENCH_DIR
+    start = time.time()
+    bench_chunker(results, args.repeat)
+    bench_metadata(results, directory, args.records, args.repeat, args.metadata_backends)
+    bench_user_store(results, directory, args.users, args.repeat)
+    print(f"\nFinished in {time.time() - start:.1f} seconds")
+    return finish(args, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
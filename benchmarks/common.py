@@ -0,0 +1,192 @@
+"""
+Shared helpers of the benchmark scripts: latency statistics, peak RSS
+sampling and the comparison against a stored baseline.
+
+Every script collects {benchmark name: metrics} where the metrics are
+p50_ms / p95_ms / p99_ms / mean_ms (lower is better), throughput_per_s
+(higher is better) and peak_rss_mb (lower is better). --save-baseline writes
+them to a JSON file; --baseline compares a run against such a file and exits
+with status 1 when a metric got worse by more than --tolerance. Latency
+percentiles of very short operations are noisy; compare runs made with the
+same --repeat on an otherwise idle machine.
+"""
+import atexit
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+# Metrics where a larger value is an improvement; all others are costs
+HIGHER_IS_BETTER = ("throughput_per_s",)
+# Latencies below this are timer noise and never flagged as regressions
+NOISE_FLOOR_MS = 0.05
+# Baseline paths on the command line are relative to where the script was started
+LAUNCH_DIR = os.getcwd()
+
+
+def percentile(sorted_values, q):
+    """Linear-interpolated percentile (q in 0-100) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies, elapsed=None):
+    """
+    Latency statistics in milliseconds of a list of durations in seconds.
+
+    :param elapsed: wall time the operations took in total; gives the throughput
+                    (defaults to the sum of the latencies, i.e. sequential runs)
+    """
+    values = sorted(latency * 1000 for latency in latencies)
+    total = elapsed if elapsed is not None else sum(latencies)
+    return {
+        "count": len(values),
+        "mean_ms": statistics.mean(values) if values else 0.0,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": values[-1] if values else 0.0,
+        "throughput_per_s": len(values) / total if total > 0 else 0.0
+    }
+
+
+def time_calls(function, repeat):
+    """Call function() repeat times and return the list of durations in seconds."""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+class PeakRSS:
+    """Context manager sampling the resident set size of this process in a background thread."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while True:
+            self.peak = max(self.peak, self._process.memory_info().rss)
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self.peak = self._process.memory_info().rss
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._process.memory_info().rss)
+
+    @property
+    def peak_mb(self):
+        return self.peak / (1024 * 1024)
+
+
+def print_result(name, metrics):
+    print(f"  {name:<32} n={metrics['count']:<6d} p50 {metrics['p50_ms']:9.3f} ms  p95 {metrics['p95_ms']:9.3f} ms  "
+          f"p99 {metrics['p99_ms']:9.3f} ms  {metrics['throughput_per_s']:10.1f}/s  "
+          f"peak RSS {metrics.get('peak_rss_mb', 0):7.1f} MB")
+
+
+def add_baseline_arguments(parser):
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results to this JSON file")
+    parser.add_argument("--baseline", metavar="PATH", help="compare the results against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.20,
+                        help="relative change counted as a regression (default 0.20 = 20%%)")
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print every metric next to its baseline value; return the list of regressions."""
+    regressions = []
+    print(f"\nComparison with baseline recorded {baseline.get('environment', {}).get('time', '?')} "
+          f"(tolerance {tolerance:.0%})")
+    for name, metrics in results.items():
+        reference = baseline.get("benchmarks", {}).get(name)
+        if reference is None:
+            print(f"  {name:<32} (not in baseline)")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s", "peak_rss_mb"):
+            if metric not in metrics or not reference.get(metric):
+                continue
+            change = metrics[metric] / reference[metric] - 1
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            noise = metric.endswith("_ms") and max(metrics[metric], reference[metric]) < NOISE_FLOOR_MS
+            flag = ""
+            if worse > tolerance and not noise:
+                flag = "  REGRESSION"
+                regressions.append((name, metric, reference[metric], metrics[metric]))
+            elif -worse > tolerance:
+                flag = "  improved"
+            print(f"  {name:<32} {metric:<17} {reference[metric]:12.3f} -> {metrics[metric]:12.3f} "
+                  f"({change:+7.1%}){flag}")
+    return regressions
+
+
+def finish(args, results):
+    """Save and/or compare the results as asked on the command line; return the exit status."""
+    if args.save_baseline:
+        with open(os.path.join(LAUNCH_DIR, args.save_baseline), 'w') as f:
+            json.dump({"environment": environment(), "benchmarks": results}, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(os.path.join(LAUNCH_DIR, args.baseline), 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+        print("\nNo regressions")
+    return 0
+
+
+def work_in_temp_dir():
+    """
+    Move to a fresh temporary directory, removed at exit, so the files the
+    stores create in the working directory never land in the repository.
+    Call before importing the repository modules: their exit handlers must
+    run before the directory is removed.
+    """
+    directory = tempfile.mkdtemp(prefix="speech-bench-")
+    atexit.register(shutil.rmtree, directory, True)
+    os.chdir(directory)
+    return directory
+
+
+def add_repo_to_path():
+    """Make the repository modules (utils/...) importable from benchmarks/."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    return root
@@ -0,0 +1,179 @@
+"""
+End-to-end load test of /process_audio with stub models.
+
+Serves the app (speech-endpoints.py or turbo.py) on a local port with the
+CPU stand-ins of benchmarks/stubs.py and drives it with concurrent uploads
+of distinct synthetic recordings, so every request misses the result cache.
+For each concurrency level it reports p50/p95/p99 request latency,
+throughput, errors and the peak RSS of the process, plus how long the
+background S3 uploads took to drain afterwards.
+
+    python benchmarks/load_test.py [--concurrency 1 4 8] [--requests 32] [--audio-seconds 8]
+                                   [--whisper-rtf 0.01] [--tts-rtf 0.05] [--s3-latency 0.02]
+                                   [--save-baseline load.json] [--baseline load.json]
+
+--s3-endpoint http://localhost:9000 uses a real S3-compatible server (e.g. MinIO)
+instead of the in-memory stand-in; the bucket must exist and the AWS_* variables
+must hold its credentials. The stub latencies are per second of audio (Whisper)
+or of generated speech (XTTS); tune them to the hardware being modeled.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from common import (PeakRSS, add_baseline_arguments, add_repo_to_path, finish, print_result, summarize,
+                    work_in_temp_dir)
+
+REPO_ROOT = add_repo_to_path()
+BENCH_DIR = work_in_temp_dir()
+
+from stubs import install_stubs
+from utils.audio_io import TARGET_SAMPLE_RATE, encode_wav
+
+WARMUP_REQUESTS = 2
+
+
+def make_recording(seconds, seed):
+    """Speech-like test input: noise bursts of 0.3-2 s separated by short pauses, 16 kHz WAV bytes."""
+    rng = np.random.default_rng(seed)
+    samples = np.zeros(int(seconds * TARGET_SAMPLE_RATE), dtype=np.float32)
+    position = 0
+    while position < len(samples):
+        burst = int(rng.uniform(0.3, 2.0) * TARGET_SAMPLE_RATE)
+        envelope = np.hanning(burst).astype(np.float32)
+        samples[position:position + burst] = (rng.standard_normal(burst).astype(np.float32) * 0.2
+                                              * envelope)[:len(samples) - position]
+        position += burst + int(rng.uniform(0.1, 0.6) * TARGET_SAMPLE_RATE)
+    return encode_wav(samples, TARGET_SAMPLE_RATE)
+
+
+def load_app(script):
+    spec = importlib.util.spec_from_file_location("speech_app", os.path.join(REPO_ROOT, script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if hasattr(module, "wait_for_models"):
+        module.wait_for_models()
+    return module
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def serve(app):
+    """Run the app on a free local port in a background thread; return the server."""
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    return server
+
+
+def run_level(url, concurrency, n_requests, audio_seconds, seed_offset, form):
+    """Send n_requests uploads with at most `concurrency` in flight; return (latencies, errors, elapsed)."""
+    recordings = [make_recording(audio_seconds, seed_offset + index) for index in range(n_requests)]
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    session = threading.local()
+
+    def upload(index):
+        if not hasattr(session, "client"):
+            session.client = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.client.post(
+                url, files={"audio": (f"clip_{index}.wav", recordings[index], "audio/wav")},
+                data=dict(form, user_id=f"bench-{seed_offset + index}"), timeout=600
+            )
+            outcome = response.status_code
+        except requests.RequestException as e:
+            outcome = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            if outcome == 200:
+                latencies.append(elapsed)
+            else:
+                errors[str(outcome)] = errors.get(str(outcome), 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(upload, range(n_requests)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def drain_uploads(module, timeout=300):
+    """Wait for the app's background S3 uploads; return the seconds it took."""
+    uploader = getattr(module, "s3_uploader", None)
+    start = time.perf_counter()
+    while uploader is not None and uploader.pending() and time.perf_counter() - start < timeout:
+        time.sleep(0.01)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="speech-endpoints.py", choices=["speech-endpoints.py", "turbo.py"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=32, help="uploads per concurrency level")
+    parser.add_argument("--audio-seconds", type=float, default=8)
+    parser.add_argument("--tier", help="latency tier sent with every request (default: the app's)")
+    parser.add_argument("--format", help="output format sent with every request (default: the app's)")
+    parser.add_argument("--whisper-rtf", type=float, default=0.01,
+                        help="stub Whisper seconds per second of audio")
+    parser.add_argument("--tts-rtf", type=float, default=0.05, help="stub XTTS seconds per second of speech")
+    parser.add_argument("--s3-latency", type=float, default=0.02, help="stub S3 seconds per call")
+    parser.add_argument("--s3-endpoint", help="use this S3-compatible server instead of the stub")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ.setdefault("S3_BUCKET", "bench-bucket")
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    os.environ.setdefault("MODEL_LOADING", "eager")
+    if args.s3_endpoint:
+        os.environ["S3_ENDPOINT_URL"] = args.s3_endpoint
+    s3_stub = install_stubs(args.whisper_rtf, args.tts_rtf, args.s3_latency, stub_s3=not args.s3_endpoint)
+
+    module = load_app(args.app)
+    server = serve(module.app)
+    url = f"http://127.0.0.1:{server.server_port}/process_audio"
+    form = {key: value for key, value in (("tier", args.tier), ("format", args.format)) if value}
+    print(f"Serving {args.app} at {url} (working directory {BENCH_DIR})")
+
+    run_level(url, 1, WARMUP_REQUESTS, args.audio_seconds, 10 ** 6, form)
+    drain_uploads(module)
+
+    results = {}
+    for level, concurrency in enumerate(args.concurrency):
+        with PeakRSS() as rss:
+            latencies, errors, elapsed = run_level(url, concurrency, args.requests, args.audio_seconds,
+                                                   level * args.requests, form)
+            drain_time = drain_uploads(module)
+        metrics = summarize(latencies, elapsed)
+        metrics.update({
+            "peak_rss_mb": rss.peak_mb,
+            "errors": sum(errors.values()),
+            "upload_drain_s": drain_time
+        })
+        name = f"{args.app}/process_audio/c{concurrency}"
+        results[name] = metrics
+        print_result(name, metrics)
+        if errors:
+            print(f"    errors: {errors}")
+        print(f"    S3 uploads drained {drain_time:.2f} s after the last response")
+
+    if s3_stub is not None:
+        print(f"\nStub S3: {s3_stub.calls} calls, {len(s3_stub.objects)} objects")
+    server.shutdown()
+    return finish(args, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+CPU stand-ins for the heavy dependencies of the speech endpoints, so the full
+request path can be benchmarked without GPUs, model weights or AWS.
+
+- StubWhisperModel answers transcribe() and batched whisper.decode() calls with
+  deterministic text derived from the audio, taking whisper_rtf seconds per
+  second of audio (per 30 second window for batched decodes).
+- StubTTS / StubXtts return a deterministic tone whose length follows the text,
+  taking tts_rtf seconds per second of generated speech.
+- StubS3Client keeps objects in memory and adds a fixed latency per call plus
+  transfer time at the given bandwidth.
+
+install_stubs() must run before the app module is imported: it replaces the
+model loaders in utils.inference_backend and the S3 client factory in
+utils.s3_uploader, which the app picks up at import time.
+"""
+import random
+import threading
+import time
+import types
+import zlib
+
+import numpy as np
+import torch
+import whisper
+from whisper.tokenizer import get_tokenizer
+from botocore.exceptions import ClientError
+
+WORDS = ("the", "patient", "said", "that", "speech", "therapy", "helps", "every", "morning", "with",
+         "breathing", "exercises", "and", "reading", "aloud", "slowly", "before", "lunch", "we", "practice")
+# Average speaking rates used to size the stub outputs
+WORDS_PER_SECOND = 2.5
+CHARS_PER_SECOND = 15
+TTS_SAMPLE_RATE = 24000
+# Whisper frames are 10 ms; a batched decode costs a little more per extra window
+WHISPER_FRAME_SECONDS = 0.01
+BATCH_WINDOW_COST = 0.15
+
+
+def stub_text(duration, seed):
+    """Deterministic transcript of about WORDS_PER_SECOND words per second of audio."""
+    rng = random.Random(seed)
+    n_words = max(1, round(duration * WORDS_PER_SECOND))
+    sentences = []
+    while n_words > 0:
+        length = min(n_words, rng.randint(6, 18))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + ".")
+        n_words -= length
+    return " ".join(sentences)
+
+
+class StubWhisperModel:
+    """Whisper stand-in; see the module docstring."""
+
+    def __init__(self, name, rtf=0.01, n_mels=80):
+        self.name = name
+        self.rtf = rtf
+        self.dims = types.SimpleNamespace(n_mels=128 if name.startswith("large-v3") or name == "turbo" else n_mels)
+        self.device = torch.device("cpu")
+        self.is_multilingual = True
+        self.num_languages = 100 if self.dims.n_mels == 128 else 99
+
+    def state_dict(self):
+        # No weights; the model registry sizes models by their state dict
+        return {}
+
+    def transcribe(self, audio, language="en", initial_prompt=None, **options):
+        if isinstance(audio, str):
+            audio = whisper.load_audio(audio)
+        audio = np.asarray(audio, dtype=np.float32)
+        duration = len(audio) / whisper.audio.SAMPLE_RATE
+        time.sleep(duration * self.rtf)
+        text = stub_text(duration, zlib.crc32(audio.tobytes()))
+        return {
+            "text": " " + text,
+            "segments": [{"id": 0, "start": 0.0, "end": duration, "text": " " + text}],
+            "language": language
+        }
+
+    def decode(self, mel, options):
+        """Batched decode of (batch, n_mels, frames) log-mel windows."""
+        mel = mel.cpu().numpy()
+        time.sleep(30 * self.rtf * (1 + BATCH_WINDOW_COST * (len(mel) - 1)))
+        tokenizer = get_tokenizer(self.is_multilingual, num_languages=self.num_languages,
+                                  language=options.language, task="transcribe")
+        results = []
+        for window in mel:
+            # Padding frames sit at the floor of the normalized spectrogram
+            energy = window.mean(axis=0)
+            duration = int((energy > energy.min() + 1e-3).sum()) * WHISPER_FRAME_SECONDS
+            text = stub_text(duration, zlib.crc32(window.tobytes()))
+            results.append(types.SimpleNamespace(
+                text=text, tokens=self._timestamped_tokens(tokenizer, text, duration),
+                avg_logprob=-0.2, no_speech_prob=0.0
+            ))
+        return results
+
+    @staticmethod
+    def _timestamped_tokens(tokenizer, text, duration):
+        """One timestamped segment per sentence, timed by its share of the words."""
+        sentences = [sentence + "." for sentence in text.rstrip(".").split(". ")]
+        n_words = len(text.split())
+        tokens = []
+        words_before = 0
+        for sentence in sentences:
+            start = duration * words_before / n_words
+            words_before += len(sentence.split())
+            end = duration * words_before / n_words
+            tokens.append(tokenizer.timestamp_begin + round(start / 0.02))
+            tokens.extend(tokenizer.encode(" " + sentence))
+            tokens.append(tokenizer.timestamp_begin + round(end / 0.02))
+        return tokens
+
+
+class StubXtts:
+    """XTTS stand-in (tts.synthesizer.tts_model)."""
+
+    def __init__(self, rtf=0.05):
+        self.rtf = rtf
+        self.device = torch.device("cpu")
+        # The XttsConfig fields the app reads, with their library defaults
+        self.config = types.SimpleNamespace(
+            max_ref_len=10, gpt_cond_len=12, gpt_cond_chunk_len=4, sound_norm_refs=False,
+            temperature=0.85, length_penalty=1.0, repetition_penalty=2.0, top_k=50, top_p=0.85,
+            enable_text_splitting=False,
+            audio=types.SimpleNamespace(sample_rate=22050, output_sample_rate=TTS_SAMPLE_RATE)
+        )
+
+    def get_speaker_embedding(self, wav, sample_rate):
+        time.sleep(0.005)
+        return torch.zeros(1, 512, 1)
+
+    def get_gpt_cond_latents(self, wav, sample_rate, length=6, chunk_length=6):
+        time.sleep(0.01)
+        return torch.zeros(1, 32, 1024)
+
+    def get_conditioning_latents(self, audio_path=None, **kwargs):
+        return self.get_gpt_cond_latents(None, None), self.get_speaker_embedding(None, None)
+
+    def inference(self, text, language, gpt_cond_latent, speaker_embedding, **kwargs):
+        duration = max(len(text), 1) / CHARS_PER_SECOND
+        time.sleep(duration * self.rtf)
+        pitch = 110 + zlib.crc32(text.encode()) % 110
+        samples = np.arange(int(duration * TTS_SAMPLE_RATE), dtype=np.float32)
+        return {"wav": 0.1 * np.sin(2 * np.pi * pitch * samples / TTS_SAMPLE_RATE)}
+
+
+class StubTTS:
+    """Coqui TTS API stand-in (the object load_tts returns)."""
+
+    def __init__(self, rtf=0.05):
+        self.synthesizer = types.SimpleNamespace(output_sample_rate=TTS_SAMPLE_RATE, tts_model=StubXtts(rtf))
+
+    def to(self, device):
+        return self
+
+    def tts(self, text, speaker_wav=None, language="en", **kwargs):
+        return list(self.synthesizer.tts_model.inference(text, language, None, None)["wav"])
+
+
+class StubS3Client:
+    """In-memory S3 stand-in implementing the client calls the app makes."""
+
+    def __init__(self, latency=0.02, bandwidth_mbps=200):
+        self.latency = latency
+        self.bandwidth = bandwidth_mbps * 1024 * 1024 / 8
+        self.objects = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self, size=0):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency + size / self.bandwidth)
+
+    def _missing(self, operation, key):
+        return ClientError({"Error": {"Code": "404", "Message": f"Not Found: {key}"}}, operation)
+
+    def head_bucket(self, Bucket):
+        self._call()
+        return {}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Config=None, **kwargs):
+        data = Fileobj.read()
+        self._call(len(data))
+        with self._lock:
+            self.objects[(Bucket, Key)] = data
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        data = Body if isinstance(Body, bytes) else Body.read()
+        self._call(len(data))
+        with self._lock:
+            self.objects[(Bucket, Key)] = data
+        return {}
+
+    def head_object(self, Bucket, Key):
+        self._call()
+        with self._lock:
+            data = self.objects.get((Bucket, Key))
+        if data is None:
+            raise self._missing("HeadObject", Key)
+        return {"ContentLength": len(data)}
+
+    def copy_object(self, Bucket, CopySource, Key, **kwargs):
+        self._call()
+        with self._lock:
+            data = self.objects.get((CopySource["Bucket"], CopySource["Key"]))
+            if data is None:
+                raise self._missing("CopyObject", CopySource["Key"])
+            self.objects[(Bucket, Key)] = data
+        return {}
+
+    def delete_object(self, Bucket, Key):
+        self._call()
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        self._call()
+        deleted = []
+        with self._lock:
+            for entry in Delete["Objects"]:
+                self.objects.pop((Bucket, entry["Key"]), None)
+                deleted.append({"Key": entry["Key"]})
+        return {"Deleted": deleted}
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600):
+        # Signing is local computation in boto3, no round trip
+        return f"https://stub-s3.local/{Params['Bucket']}/{Params['Key']}?Expires={int(time.time()) + ExpiresIn}"
+
+
+def install_stubs(whisper_rtf=0.01, tts_rtf=0.05, s3_latency=0.02, stub_s3=True):
+    """Route model loading (and S3 unless stub_s3 is False) to the stand-ins; call before importing the app."""
+    import utils.inference_backend as inference_backend
+    import utils.s3_uploader as s3_uploader
+
+    inference_backend.load_whisper = lambda name, device: StubWhisperModel(name, whisper_rtf)
+    inference_backend.load_tts = lambda name, device: StubTTS(tts_rtf)
+
+    real_decode = whisper.decode
+
+    def decode(model, mel, options=whisper.DecodingOptions()):
+        if isinstance(model, StubWhisperModel):
+            return model.decode(mel, options)
+        return real_decode(model, mel, options)
+
+    whisper.decode = decode
+
+    if stub_s3:
+        s3_client = StubS3Client(s3_latency)
+        s3_uploader.make_s3_client = lambda **kwargs: s3_client
+        return s3_client
+    return None
@@ -0,0 +1,50 @@
+"""
+Pre-fork serving mode:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app (and with it the Whisper and XTTS weights) is imported once in the
+gunicorn master. Workers are forked afterwards and share the weight pages
+copy-on-write, so N workers cost roughly one copy of the models and one load.
+
+Notes:
+- CUDA cannot be used across fork. Pre-forking pays off on CPU-only nodes;
+  on a GPU node run a single worker (SERVE_WORKERS=1).
+- Only the models are meant to be shared. Everything bound to a process is
+  created on first use in each worker instead of in the master: SQLite
+  connections, the job, upload and sampler threads, and the artifact sweeper.
+- One worker by default. Job states are published to the metadata store,
+  so /jobs/<id> polling works whichever worker answers, but that needs the
+  SQLite backend (METADATA_STORE=sqlite). Socket.IO pushes (TTS chunks, job
+  updates, live transcription) need SOCKETIO_MESSAGE_QUEUE pointing at a
+  shared queue (e.g. redis://) so events emitted in one worker reach clients
+  connected to another, and clients must use the websocket transport: raise
+  SERVE_WORKERS only once both are in place. In-memory caches stay per worker.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("SERVE_BIND", "0.0.0.0:5050")
+workers = int(os.getenv("SERVE_WORKERS", "1"))
+threads = int(os.getenv("SERVE_THREADS", "8"))
+worker_class = "gthread"
+preload_app = True
+# Long recordings can take minutes to process
+timeout = int(os.getenv("SERVE_TIMEOUT", "600"))
+
+# Intra-op threads per worker, split the cores between the workers by default
+torch_threads = int(os.getenv("TORCH_THREADS_PER_WORKER", str(max(1, multiprocessing.cpu_count() // workers))))
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the GC's reach, otherwise the
+    # collector touches every object header and un-shares the pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    server.log.info(f"Worker {worker.pid} using {torch_threads} torch threads")
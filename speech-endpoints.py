@@ -1,113 +1,206 @@
+import json
 import os
+import threading
 import random
-import json
-import tempfile
-import whisper
 import time
-import psutil
-import boto3
+import uuid
 from flask_cors import CORS
-from flask import Flask, request, jsonify, send_file
-from flask_socketio import SocketIO, emit
-from TTS.api import TTS
-from pydub import AudioSegment
-from werkzeug.utils import secure_filename
-from utils.user_storage import store_user, load_user_data
-from botocore.exceptions import NoCredentialsError, ClientError
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask_socketio import SocketIO, emit, join_room
 from dotenv import load_dotenv
+
+# Load environment variables from .env file (before the utils modules read their settings)
+load_dotenv()
+
+from utils.user_storage import store_user, user_store
+from utils.speaker_cache import SpeakerLatentCache, audio_digest, reference_sample_rate
+from utils.tts_engine import SynthesisExecutor
+from utils.audio_io import (encode_wav, decode_audio, resample, transcode, negotiate_format, ffmpeg_available,
+                            AUDIO_FORMATS, TARGET_SAMPLE_RATE)
+from utils.streaming_asr import TranscriptionNamespace, WHISPER_SAMPLE_RATE
+from utils.pipeline import transcribe_and_synthesize, PIPELINE_MIN_SECONDS
+from utils.vad import split_on_silence, trim_silence, reference_window, VAD_TRIM
+from utils.longform import plan_windows, transcribe_long, LONGFORM_MIN_SECONDS, LONGFORM_WORKERS
+from utils.job_queue import JobQueue, QueueFull
+from utils.whisper_batcher import WhisperBatcher
+from utils.model_registry import ModelRegistry, load_tiers, DEFAULT_TIER
+from utils.text_chunker import chunk_text, xtts_limits
+from utils.result_cache import ResultCache, cache_key
+from utils.metadata_store import open_metadata_store, UPLOADING
+from utils.lazy_loader import MODEL_LOADING, LazyResource, start_loading
+from utils.s3_uploader import make_s3_client, S3Uploader
+from utils.presign_cache import PresignedURLCache
+from utils.inference_backend import (select_device, should_quantize, configure_threads, load_whisper, load_tts,
+                                     DEFAULT_WHISPER_MODEL)
+from utils.metrics import (registry as metrics_registry, stage, observe_stage, install_request_metrics,
+                           register_process_metrics)
+from botocore.exceptions import NoCredentialsError, ClientError
 #=============================================================================================
+process_start_time = time.time()
 app = Flask(__name__, static_folder="./build", static_url_path="/")
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
-os.environ['CUDA_LAUNCH_BLOCKING'] = '1'
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading",
+                    message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE'))  # needed when serving with several workers
+# Request and stage latency histograms, process and queue metrics on /metrics (per worker process);
+# send the TRACE_HEADER (X-Trace: 1) to get a request's stage breakdown back in Server-Timing
+install_request_metrics(app)
+register_process_metrics()
 #=============================================================================================
-# Load environment variables from .env file
-load_dotenv()
-
 # Access the environment variables
 AWS_REGION = os.getenv('AWS_REGION')
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 S3_BUCKET = os.getenv('S3_BUCKET')
 
-# Configure AWS S3
-s3_client = boto3.client(
-    's3',
+# Configure AWS S3: one pooled client for the whole process
+s3_client = make_s3_client(
     region_name=AWS_REGION,
     aws_access_key_id=AWS_ACCESS_KEY_ID,
     aws_secret_access_key=AWS_SECRET_ACCESS_KEY
 )
 
-# Now `s3_client` can interact with your S3 bucket
-print(f"Connected to S3 bucket: {S3_BUCKET}")
+# Input and output recordings are uploaded in the background, off the request path
+s3_uploader = S3Uploader(s3_client)
+# How long /temp_url waits for a file that is still being uploaded
+S3_UPLOAD_WAIT_SECONDS = float(os.getenv("S3_UPLOAD_WAIT_SECONDS", "30"))
+
+# Encoding of generated speech: wav, opus, mp3 or flac (requests can pick another, see process_audio)
+OUTPUT_AUDIO_FORMAT = os.getenv("OUTPUT_AUDIO_FORMAT", "wav")
+# Uploaded recordings are stored as 16 kHz mono in this format ("original" keeps the upload as it is)
+INPUT_STORAGE_FORMAT = os.getenv("INPUT_STORAGE_FORMAT", "opus")
+
+# Signed URLs are reused until shortly before they expire
+presigned_urls = PresignedURLCache(s3_client)
+# Most file names accepted by one /temp_urls call
+TEMP_URLS_MAX_FILES = int(os.getenv("TEMP_URLS_MAX_FILES", "500"))
 
 #=============================================================================================
 
-# Track load times
-whisper_load_time = 0
-tts_load_time = 0
-total_load_time = 0
+# Records metadata (SQLite by default, imports metadata.json on first start)
+metadata_store = open_metadata_store()
 
 #=============================================================================================
 
-# Measure Whisper model load time
-load_start_whisper = time.time()
-whisper_model = whisper.load_model("large-v3")
-whisper_load_time = time.time() - load_start_whisper
-print(f"Whisper model loaded successfully in {whisper_load_time:.2f} seconds.")
-
-# Measure TTS model load time
-load_start_tts = time.time()
-tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2", gpu=True)
-tts_load_time = time.time() - load_start_tts
-print(f"TTS model loaded successfully in {tts_load_time:.2f} seconds.")
-
-# Calculate total model load time
-total_load_time = whisper_load_time + tts_load_time
-print(f"Total time taken to load models: {total_load_time:.2f} seconds.")
+# Inference device (CUDA with CPU fallback, see INFERENCE_DEVICE) and torch thread counts
+INFERENCE_DEVICE = select_device()
+configure_threads()
+MODEL_PRECISION = "int8" if should_quantize(INFERENCE_DEVICE) else "fp32"
+print(f"Running inference on {INFERENCE_DEVICE} ({MODEL_PRECISION})")
+
+# Models served by this backend (also part of the result cache keys)
+WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL", DEFAULT_WHISPER_MODEL.get(INFERENCE_DEVICE, "large-v3"))
+TTS_MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
+
+# Latency tiers a request picks with the 'tier' form field (fast/balanced/accurate, see
+# utils/model_registry.py); the default tier's Whisper model is loaded at startup
+MODEL_TIERS = load_tiers(INFERENCE_DEVICE, WHISPER_MODEL_NAME)
+if DEFAULT_TIER not in MODEL_TIERS:
+    raise ValueError(f"DEFAULT_TIER {DEFAULT_TIER} is not one of {sorted(MODEL_TIERS)}")
+DEFAULT_WHISPER_MODEL_NAME = MODEL_TIERS[DEFAULT_TIER]["whisper"]
+
+
+def verify_s3():
+    """Helper function to check that the bucket is reachable with the configured credentials."""
+    s3_client.head_bucket(Bucket=S3_BUCKET)
+    print(f"Connected to S3 bucket: {S3_BUCKET}")
+    return True
+
+
+# Models load in parallel background threads (see MODEL_LOADING), so cheap
+# routes are served right away; /readyz reports when everything is loaded
+whisper_resource = LazyResource("Whisper model", lambda: load_whisper(DEFAULT_WHISPER_MODEL_NAME, INFERENCE_DEVICE))
+tts_resource = LazyResource("TTS model", lambda: load_tts(TTS_MODEL_NAME, INFERENCE_DEVICE))
+s3_resource = LazyResource("S3 bucket", verify_s3)
+start_loading([whisper_resource, tts_resource, s3_resource])
+
+
+def wait_for_models():
+    """Block until both models are loaded (used by the pre-fork server before forking workers)."""
+    for resource in (whisper_resource, tts_resource):
+        resource.get()
+
+# Whisper models of the other tiers are paged in on demand under MODEL_MEMORY_BUDGET_MB
+whisper_models = ModelRegistry(
+    lambda name: whisper_resource.get() if name == DEFAULT_WHISPER_MODEL_NAME else load_whisper(name, INFERENCE_DEVICE),
+    pinned=[DEFAULT_WHISPER_MODEL_NAME]
+)
+
+# Each Whisper model is shared by HTTP requests and live streams, one decode at a time
+whisper_lock = whisper_models.lock(DEFAULT_WHISPER_MODEL_NAME)
+socketio.on_namespace(TranscriptionNamespace('/transcribe', whisper_resource.get, whisper_lock))
+
+# Short clips from concurrent requests share one batched Whisper pass (one scheduler per model)
+whisper_batchers = {}
+whisper_batchers_lock = threading.Lock()
+
+# Speaker conditioning latents are reused across chunks and requests
+speaker_cache = SpeakerLatentCache()
+
+# Transcripts and generated speech of recordings seen before
+result_cache = ResultCache()
+
+# All TTS chunks, from every request, are synthesized one at a time by one worker
+synthesis_executor = SynthesisExecutor(lambda: tts_resource.get().synthesizer.tts_model)
 #======================================================================================================
-def chunk_text(text, max_length=250):
-    """Helper function to split text into chunks of a maximum character length."""
-    words = text.split()
-    chunks = []
-    current_chunk = []
-
-    for word in words:
-        if len(" ".join(current_chunk + [word])) <= max_length:
-            current_chunk.append(word)
-        else:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [word]
+def stream_chunks_to(sid, total_chunks, sample_rate):
+    """Helper function returning a callback that pushes each synthesized chunk to a Socket.IO client.
+    total_chunks may be None when the number of chunks is not known up front (pipelined mode)."""
+    def on_chunk(index, wav):
+        socketio.emit('tts_chunk', {
+            "index": index,
+            "total": total_chunks,
+            "sample_rate": sample_rate,
+            "audio": encode_wav(wav, sample_rate)
+        }, to=sid)
+    return on_chunk
+#============================================================================================
+def whisper_batcher_for(model_name):
+    """Helper function returning the micro-batching scheduler of a Whisper model."""
+    with whisper_batchers_lock:
+        if model_name not in whisper_batchers:
+            whisper_batchers[model_name] = WhisperBatcher(
+                lambda: whisper_models.get(model_name), whisper_models.lock(model_name)
+            )
+        return whisper_batchers[model_name]
 
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
 
-    return chunks
+def transcribe_window(audio, initial_prompt=None, tier=DEFAULT_TIER, language="en"):
+    """Helper function to run Whisper on 16 kHz samples through the micro-batching scheduler."""
+    settings = MODEL_TIERS[tier]
+    options = dict(settings["decode"], language=language)
+    return whisper_batcher_for(settings["whisper"]).transcribe(audio, initial_prompt, options)
 #============================================================================================
-def upload_to_s3(file_path, filename, bucket_name):
-    """Helper function to upload files to S3."""
-    s3_key = f"audio/{filename}"
-    try:
-        s3_client.upload_file(file_path, bucket_name, s3_key)
-        s3_url = f"https://{bucket_name}.s3.amazonaws.com/{s3_key}"
-        print(f"File uploaded successfully: {s3_url}")
-        return s3_url
-    except FileNotFoundError:
-        print(f"The file was not found: {file_path}")
-        return None
-    except NoCredentialsError:
-        print("Credentials not available")
-        return None
-    except Exception as e:
-        print(f"Error uploading to S3: {str(e)}")
-        return None
+def upload_bytes_to_s3(data, filename, bucket_name, content_type=None):
+    """Helper function to queue in-memory file contents (or a callable producing them) for upload to S3.
+    Returns a future resolving to the S3 URL (retries and errors are handled by the uploader)."""
+    # Other workers see the upload in progress and wait for it instead of reporting the file missing
+    metadata_store.mark_files([filename], UPLOADING)
+    upload = s3_uploader.submit(data, bucket_name, f"audio/{filename}", content_type)
+
+    def record_file(future):
+        # Once the file is in S3 the metadata store vouches for it, see split_existing_files
+        metadata_store.mark_files([filename], future.exception() is None)
+
+    upload.add_done_callback(record_file)
+    return upload
+
+
+def forget_files(s3_keys):
+    """Helper function to record that files were deleted from S3 and drop their cached URLs.
+
+    Deleting a user's input recording also drops the speaker latents cached for them."""
+    filenames = [key.split('/', 1)[-1] for key in s3_keys]
+    metadata_store.mark_files(filenames, False)
+    presigned_urls.invalidate(S3_BUCKET, s3_keys)
+    for filename in filenames:
+        if '_input_' in filename:
+            speaker_cache.invalidate_user(filename.rsplit('_input_', 1)[0])
 
 #=============================================================================================
 
 
 def delete_from_s3(bucket_name, filenames):
     """Helper function to delete multiple files from S3 using only file names."""
-    s3_client = boto3.client('s3')
 
     # Construct the S3 keys from filenames
     objects_to_delete = [{'Key': f'audio/{filename}'} for filename in filenames]
@@ -124,6 +217,7 @@ def delete_from_s3(bucket_name, filenames):
         deleted_files = response.get('Deleted', [])
         if deleted_files:
             print(f"Deleted files: {[obj['Key'] for obj in deleted_files]}")
+            forget_files([obj['Key'] for obj in deleted_files])
         else:
             print("No files were deleted.")
         
@@ -144,76 +238,121 @@ def rename_s3_file(bucket_name, old_filename, new_filename):
         copy_source = {'Bucket': bucket_name, 'Key': f"audio/{old_filename}"}
         s3_client.copy_object(Bucket=bucket_name, CopySource=copy_source, Key=f"audio/{new_filename}")
         s3_client.delete_object(Bucket=bucket_name, Key=f"audio/{old_filename}")
+        forget_files([f"audio/{old_filename}"])
+        metadata_store.mark_files([new_filename], True)
         new_s3_url = f"https://{bucket_name}.s3.amazonaws.com/audio/{new_filename}"
         return new_s3_url
     except Exception as e:
         print(f"Error renaming file: {str(e)}")
         return None
 #============================================================================================
-def save_metadata(metadata, filename="metadata.json"):
-    """Helper function to save metadata to a single JSON file on the server.
-    If the file exists, append the new metadata; otherwise, create the file."""
-    
-    # Define the path to save the JSON file in the server's working directory
-    metadata_filepath = os.path.join(os.getcwd(), filename)
-    
-    # Try to load existing metadata from the file, if it exists
-    if os.path.exists(metadata_filepath):
-        try:
-            with open(metadata_filepath, 'r') as json_file:
-                existing_data = json.load(json_file)
-        except json.JSONDecodeError:
-            # If file exists but is empty or invalid, start with an empty list
-            existing_data = []
-    else:
-        # If the file doesn't exist, start with an empty list
-        existing_data = []
-    
-    # Append the new metadata to the existing data
-    existing_data.append(metadata)
-    
-    # Write the updated data back to the file
+def save_metadata(metadata):
+    """Helper function to append a metadata record to the metadata store."""
     try:
-        with open(metadata_filepath, 'w') as json_file:
-            json.dump(existing_data, json_file, indent=4)
-        print(f"Metadata appended and saved at {metadata_filepath}")
-        return metadata_filepath
+        metadata_store.append(metadata)
+        print(f"Metadata record '{metadata.get('id')}' saved")
+        return metadata.get('id')
     except Exception as e:
         print(f"Error saving metadata: {str(e)}")
         return None
 #===========================================================================================
 
-
-# Initialize S3 client
-s3_client = boto3.client('s3')
-
-def create_presigned_url(bucket_name, object_name, expiration=3600):
+def create_presigned_url(bucket_name, object_name):
     """
-    Generate a presigned URL to share an S3 object.
+    Generate a presigned URL to share an S3 object, reusing a cached one while it is still fresh.
     :param bucket_name: string
     :param object_name: string
-    :param expiration: Time in seconds for the presigned URL to remain valid (default is 1 hour)
-    :return: Presigned URL as string. If error, returns None.
+    :return: Presigned URL as string, valid for PRESIGN_EXPIRY_SECONDS when signed. If error, returns None.
     """
     try:
-        response = s3_client.generate_presigned_url('get_object',
-                                                    Params={'Bucket': bucket_name, 'Key': object_name},
-                                                    ExpiresIn=expiration)
+        response = presigned_urls.get(bucket_name, object_name)
     except Exception as e:
         print(f"Error generating presigned URL: {e}")
         return None
     return response
+
+
+def split_existing_files(file_names):
+    """
+    Helper function to split file names into the ones present in S3 and the missing ones.
+
+    The metadata store knows every file uploaded, renamed or deleted through this
+    service, so only files it has never seen (older uploads) cost a head_object,
+    and that answer is recorded too. Files of a request that just finished may
+    still be uploading, here or in another worker: they are waited for, all
+    together for at most S3_UPLOAD_WAIT_SECONDS, and never recorded as missing.
+    """
+    deadline = time.monotonic() + S3_UPLOAD_WAIT_SECONDS
+    s3_uploader.wait_for_all(S3_BUCKET, [f"audio/{name}" for name in file_names], timeout=S3_UPLOAD_WAIT_SECONDS)
+
+    status = metadata_store.file_status(file_names)
+    uploading = [name for name, present in status.items() if present == UPLOADING]
+    while uploading and time.monotonic() < deadline:
+        time.sleep(0.1)
+        status.update(metadata_store.file_status(uploading))
+        uploading = [name for name in uploading if status[name] == UPLOADING]
+
+    for file_name in [name for name, present in status.items() if present is None or present == UPLOADING]:
+        in_progress = status[file_name] == UPLOADING or s3_uploader.is_pending(S3_BUCKET, f"audio/{file_name}")
+        try:
+            s3_client.head_object(Bucket=S3_BUCKET, Key=f"audio/{file_name}")
+            status[file_name] = True
+            metadata_store.mark_files([file_name], True)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                raise
+            status[file_name] = False
+            if not in_progress:
+                metadata_store.record_missing([file_name])
+
+    existing = [name for name, present in status.items() if present]
+    missing = [name for name, present in status.items() if not present]
+    return existing, missing
 #=============================================================================================
 
 @app.route('/')
 def hello_world():
     return "<h1>Hey there! <br> Backend script running here!!</h1>"
 #=======================================================================
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness probe: the process is up and serving requests."""
+    return jsonify({"status": "ok", "uptime": time.time() - process_start_time}), 200
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness probe: 200 once both models are loaded, 503 before that. S3 state is reported too.
+
+    With MODEL_LOADING=lazy nothing loads at startup, so the first probe starts
+    loading the models in the background; requests that arrive before then load
+    them on the request path.
+    """
+    if MODEL_LOADING == "lazy":
+        whisper_resource.start()
+        tts_resource.start()
+    resources = {
+        "whisper": whisper_resource.status(),
+        "tts": tts_resource.status(),
+        "s3": s3_resource.status()
+    }
+    ready = whisper_resource.ready and tts_resource.ready
+    return jsonify({
+        "status": "ready" if ready else "not ready",
+        "resources": resources,
+        "device": INFERENCE_DEVICE,
+        "uploads": s3_uploader.stats(),
+        "precision": MODEL_PRECISION,
+        "whisper_load_time": whisper_resource.load_time,
+        "tts_load_time": tts_resource.load_time
+    }), 200 if ready else 503
+#=======================================================================
 
 
 @app.route('/save_metadata', methods=['POST'])
 def save_metadata_endpoint():
-    """Endpoint to save arbitrary metadata to a JSON file."""
+    """Endpoint to save arbitrary metadata to the metadata store."""
     metadata = request.get_json()
 
     if not metadata:
@@ -227,14 +366,13 @@ def save_metadata_endpoint():
     metadata['id'] = f"{random_number}_{current_epoch_time}"
     
     # print(metadata)
-    data =  save_metadata(metadata)
+    data = save_metadata(metadata)
     # print(data)
     return jsonify({"status": "Success"}), 200
 #=============================================================================================
 @app.route('/remove_audio_s3', methods=['POST'])
 def delete_from_s3():
     """Helper function to delete multiple files from S3 using only file names."""
-    s3_client = boto3.client('s3')
 
     # Construct the S3 keys from filenames
 
@@ -254,6 +392,7 @@ def delete_from_s3():
         deleted_files = response.get('Deleted', [])
         if deleted_files:
             print(f"Deleted files: {[obj['Key'] for obj in deleted_files]}")
+            forget_files([obj['Key'] for obj in deleted_files])
             return jsonify({"status": "Success"}), 200
 
         else:
@@ -269,35 +408,15 @@ def delete_from_s3():
         print(f"Error deleting from S3: {str(e)}")
 #=============================================================================================
 @app.route('/remove_record', methods=['POST'])
-def remove_record_by_id(filename="metadata.json"):
+def remove_record_by_id():
     """
-    Remove a specific record from the JSON file by matching the provided id.
+    Remove a specific record from the metadata store by matching the provided id.
     """
     inputJSON = request.get_json()
 
-    # Define the path to the JSON file
-    metadata_filepath = os.path.join(os.getcwd(), filename)
-
-    # Check if the file exists
-    if not os.path.exists(metadata_filepath):
-        print(f"No file found at {metadata_filepath}")
-        return jsonify({"status": "failed", "message": "Metadata file not found"}), 404
-
-    # Load existing metadata
     try:
-        with open(metadata_filepath, 'r') as json_file:
-            data = json.load(json_file)
-    except json.JSONDecodeError:
-        print("File is empty or corrupted.")
-        return jsonify({"status": "failed", "message": "Metadata file corrupted"}), 400
-
-    # Filter out the record with the matching id
-    updated_data = [record for record in data if record.get("id") != inputJSON.get('id')]
-
-    # Write the updated data back to the file
-    try:
-        with open(metadata_filepath, 'w') as json_file:
-            json.dump(updated_data, json_file, indent=4)
+        if not metadata_store.remove(inputJSON.get('id')):
+            print(f"No record found with id '{inputJSON.get('id')}'")
 
         # Collect files to delete if specified
         filesList = [inputJSON.get('inputFile'), inputJSON.get('outputFile')]
@@ -314,115 +433,370 @@ def remove_record_by_id(filename="metadata.json"):
             deleted_files = response.get('Deleted', [])
             if deleted_files:
                 print(f"Deleted files: {[obj['Key'] for obj in deleted_files]}")
+                forget_files([obj['Key'] for obj in deleted_files])
             else:
                 print("No files were deleted.")
 
-        print(f"Record with id '{inputJSON['id']}' removed from {metadata_filepath}")
+        print(f"Record with id '{inputJSON['id']}' removed")
         return jsonify({"status": "Success", "message": f"Record with id '{inputJSON['id']}' removed"}), 200
 
     except Exception as e:
         print(f"Error updating metadata: {str(e)}")
         return jsonify({"status": "failed", "message": str(e)}), 500
 #=============================================================================================
+def run_process_audio(job):
+    """Transcribe an uploaded recording and synthesize it back in the user's voice.
+
+    Runs on a job worker thread, so everything it needs from the request is in `job`."""
+    audio_bytes = job['audio_bytes']
+    user_id = job['user_id']
+    stream_sid = job['stream_sid']
+    file_id = job['file_id']
+    tier = job['tier']
+    language = job['language']
+    output_format = job['output_format']
+    trace = job['trace']
+    observe_stage("queue_wait", time.perf_counter() - job['queued_at'], trace)
+    whisper_settings = json.dumps(MODEL_TIERS[tier]["decode"], sort_keys=True)
+    tts_settings = MODEL_TIERS[tier]["tts"]
+    max_chunk_length = tts_settings.get("max_chunk_length", 250)
+
+    # Measure total response time
+    response_start_time = time.time()
+
+    # Upload input audio file to S3 with proper naming, straight from memory, normalized to
+    # 16 kHz mono (transcoded and uploaded in the background, overlapping with transcription);
+    # without ffmpeg the upload is stored as it came
+    if INPUT_STORAGE_FORMAT == "original" or not ffmpeg_available():
+        input_filename = f"{user_id}_input_{file_id}.wav"
+        input_upload = upload_bytes_to_s3(audio_bytes, input_filename, S3_BUCKET)
+    else:
+        input_spec = AUDIO_FORMATS[INPUT_STORAGE_FORMAT]
+        input_filename = f"{user_id}_input_{file_id}.{input_spec['extension']}"
+
+        def normalize_input():
+            with stage("input_transcode"):
+                return transcode(audio_bytes, INPUT_STORAGE_FORMAT, sample_rate=TARGET_SAMPLE_RATE, channels=1)
+
+        input_upload = upload_bytes_to_s3(normalize_input, input_filename, S3_BUCKET, input_spec['content_type'])
+
+    tts = tts_resource.get()
+    digest = audio_digest(audio_bytes)
+    # A new recording replaces the speaker latents cached for this user
+    speaker_cache.invalidate_user(user_id, keep=digest)
+    sample_rate = tts.synthesizer.output_sample_rate
+
+    # Chunks are measured with the XTTS tokenizer and kept under its per-language limits
+    count_tokens, max_tokens, char_limit = xtts_limits(tts.synthesizer.tts_model, language)
+    chunk_length = min(max_chunk_length, char_limit or max_chunk_length)
+
+    def chunker(text):
+        return chunk_text(text, chunk_length, count_tokens, max_tokens)
+
+    # Resent recordings are answered from the result cache
+    transcript_key = cache_key("transcript", digest, MODEL_TIERS[tier]["whisper"], MODEL_PRECISION, language,
+                              whisper_settings)
+    cached_transcript = result_cache.get_json(transcript_key)
+    output_wav = None
+    if cached_transcript is not None:
+        transcription_text = cached_transcript['text']
+        speech_key = cache_key("speech", transcription_text, digest, TTS_MODEL_NAME, MODEL_PRECISION, language,
+                               json.dumps(tts_settings, sort_keys=True))
+        output_wav = result_cache.get(speech_key)
+
+    if output_wav is not None:
+        print("Transcription and generated speech served from the result cache.")
+        if stream_sid:
+            socketio.emit('tts_chunk', {"index": 0, "total": 1, "sample_rate": sample_rate, "audio": output_wav},
+                          to=stream_sid)
+    else:
+        # Decode the upload once, at the rate XTTS conditions on (22.05 kHz mono, ffmpeg resamples
+        # in the same pass); Whisper gets a 16 kHz copy, the speaker encoder the full band
+        reference_rate = reference_sample_rate(tts.synthesizer.tts_model)
+        with stage("decode", trace):
+            full_band = decode_audio(audio_bytes, reference_rate)
+
+        # Drop silent spans before Whisper and pick a clean stretch of speech for cloning
+        with stage("vad", trace):
+            if VAD_TRIM:
+                full_band, _ = trim_silence(full_band, reference_rate)
+            reference = reference_window(full_band, reference_rate)
+        with stage("resample", trace):
+            audio = resample(full_band, reference_rate, WHISPER_SAMPLE_RATE)
+        print(f"Speech after silence trimming: {len(audio) / WHISPER_SAMPLE_RATE:.1f} seconds, "
+              f"speaker reference: {len(reference) / reference_rate:.1f} seconds.")
+        pipelined = cached_transcript is None and (
+            job['pipelined'] or len(audio) > PIPELINE_MIN_SECONDS * WHISPER_SAMPLE_RATE
+        )
+        # Long recordings are cut into independent windows decoded in parallel
+        # (the form field longform=true/false overrides the length check)
+        longform = cached_transcript is None and (
+            job['longform'] if job['longform'] is not None
+            else len(audio) > LONGFORM_MIN_SECONDS * WHISPER_SAMPLE_RATE
+        )
+
+        # Compute the speaker conditioning once and reuse it for every chunk
+        with stage("speaker_latents", trace):
+            gpt_cond_latent, speaker_embedding = speaker_cache.get_latents(
+                tts.synthesizer.tts_model, reference, reference_rate, digest, user_id=user_id
+            )
+
+        def synthesize_chunks(chunks, on_chunk=None):
+            return synthesis_executor.synthesize(
+                chunks, gpt_cond_latent, speaker_embedding, language=language,
+                options=tts_settings.get("inference"), on_chunk=on_chunk, trace=trace
+            )
+
+        def transcribe_timed(window, prompt):
+            with stage("whisper_window", trace):
+                return transcribe_window(window, prompt, tier, language)
+
+        if pipelined:
+            # Hand each transcribed window to TTS while Whisper decodes the next one
+            pipeline_start_time = time.time()
+            transcription_text, final_audio = transcribe_and_synthesize(
+                audio,
+                plan_windows(audio, WHISPER_SAMPLE_RATE) if longform else split_on_silence(audio, WHISPER_SAMPLE_RATE),
+                transcribe_timed,
+                synthesize_chunks,
+                chunker,
+                on_chunk=stream_chunks_to(stream_sid, None, sample_rate) if stream_sid else None,
+                workers=LONGFORM_WORKERS if longform else 1
+            )
+            transcription_time = tts_generation_time = time.time() - pipeline_start_time
+            print(f"Pipelined transcription and TTS completed in {transcription_time:.2f} seconds.")
+            result_cache.put_json(transcript_key, {"text": transcription_text})
+        else:
+            if cached_transcript is None:
+                # Measure transcription time (Whisper)
+                transcription_start_time = time.time()
+                with stage("whisper", trace):
+                    if longform:
+                        result = transcribe_long(audio, transcribe_timed, WHISPER_SAMPLE_RATE)
+                    else:
+                        result = transcribe_window(audio, tier=tier, language=language)
+                transcription_text = result['text'].strip()
+                transcription_time = time.time() - transcription_start_time
+                print(f"Transcription completed in {transcription_time:.2f} seconds.")
+                result_cache.put_json(transcript_key, {"text": transcription_text, "segments": result.get('segments', [])})
+
+            # Split the transcription into the fewest evenly sized chunks, cut at sentence ends where possible
+            with stage("chunking", trace):
+                text_chunks = chunker(transcription_text)
+
+            # Measure TTS generation time
+            tts_start_time = time.time()
+
+            # Stream each chunk to the client as soon as it is ready, if requested
+            on_chunk = None
+            if stream_sid:
+                on_chunk = stream_chunks_to(stream_sid, len(text_chunks), sample_rate)
+
+            # Synthesize all chunks on the TTS worker and join them in memory
+            final_audio = synthesize_chunks(text_chunks, on_chunk)
+
+            tts_generation_time = time.time() - tts_start_time
+            print(f"TTS generation completed in {tts_generation_time:.2f} seconds.")
+
+        with stage("export", trace):
+            output_wav = encode_wav(final_audio, sample_rate)
+        result_cache.put(cache_key("speech", transcription_text, digest, TTS_MODEL_NAME, MODEL_PRECISION, language,
+                               json.dumps(tts_settings, sort_keys=True)), output_wav)
+
+    # Upload the output audio file to S3 from memory in the requested encoding,
+    # without holding back the response
+    output_spec = AUDIO_FORMATS[output_format]
+    output_filename = f"{user_id}_output_{file_id}.{output_spec['extension']}"
+
+    def encode_output():
+        with stage("output_transcode"):
+            return transcode(output_wav, output_format)
+
+    output_upload = upload_bytes_to_s3(
+        output_wav if output_format == "wav" else encode_output,
+        output_filename, S3_BUCKET, output_spec['content_type']
+    )
+    if stream_sid:
+        for filename, upload in ((input_filename, input_upload), (output_filename, output_upload)):
+            upload.add_done_callback(notify_upload(stream_sid, filename))
+
+    # Measure total response time
+    total_response_time = time.time() - response_start_time
+    print(f"Total time taken to generate response: {total_response_time:.2f} seconds.")
+
+    if stream_sid:
+        socketio.emit('tts_done', {
+            "transcription": transcription_text,
+            "generated_speech_url": output_filename
+        }, to=stream_sid)
+
+    return {
+        "message": "Process completed and metadata saved",
+        # "uid": metadata_id,
+        "user_id": user_id,
+        "transcription": transcription_text,
+        "tier": tier,
+        "output_format": output_format,
+        "input_audio_url": input_filename,  # Correctly reference input audio URL
+        "generated_speech_url": output_filename
+    }
+#=============================================================================================
+def notify_upload(sid, filename):
+    """Helper function returning a callback that tells a Socket.IO client when a file has reached S3."""
+    def on_done(future):
+        error = future.exception()
+        socketio.emit('upload_done', {
+            "file": filename,
+            "status": "failed" if error else "uploaded",
+            "error": str(error) if error else None
+        }, to=sid)
+    return on_done
+
+
+def publish_job_update(job_id, state):
+    """Helper function to push job state changes to Socket.IO clients subscribed to the job."""
+    socketio.emit('job_update', state, to=job_id)
+
+
+# /process_audio work is queued and drained by a fixed pool of model workers; job states are
+# published to the metadata store, so /jobs/<id> works whichever worker process answers it
+job_queue = JobQueue(run_process_audio, on_update=publish_job_update, store=metadata_store)
+
+
+def cache_counters():
+    """Helper function returning {cache: (hits, misses)} for the metrics endpoint."""
+    result = result_cache.stats()
+    speaker = speaker_cache.stats()
+    urls = presigned_urls.stats()
+    return {
+        "result": (result["memory_hits"] + result["disk_hits"], result["misses"]),
+        "speaker": (speaker["hits"], speaker["misses"]),
+        "presigned_url": (urls["hits"], urls["misses"])
+    }
+
+
+# Read at scrape time from the components that keep the numbers
+metrics_registry.gauge("speech_job_queue_depth", "Jobs waiting for a model worker", job_queue.depth)
+metrics_registry.gauge("speech_tts_queue_depth", "Requests waiting for the TTS executor", synthesis_executor.depth)
+metrics_registry.gauge("speech_whisper_queue_depth", "Clips waiting for a batched Whisper decode",
+                       lambda: [({"model": name}, batcher.depth()) for name, batcher in list(whisper_batchers.items())])
+metrics_registry.gauge("speech_s3_uploads_pending", "Background S3 uploads queued or running", s3_uploader.pending)
+metrics_registry.counter("speech_s3_uploads_total", "Finished background S3 uploads",
+                         lambda: [({"result": result}, s3_uploader.stats()[result]) for result in ("uploaded", "failed")])
+metrics_registry.counter("speech_s3_upload_retries_total", "Retried S3 upload attempts",
+                         lambda: s3_uploader.stats()["retried"])
+metrics_registry.counter("speech_cache_hits_total", "Cache hits",
+                         lambda: [({"cache": name}, hits) for name, (hits, _) in cache_counters().items()])
+metrics_registry.counter("speech_cache_misses_total", "Cache misses",
+                         lambda: [({"cache": name}, misses) for name, (_, misses) in cache_counters().items()])
+metrics_registry.gauge("speech_cache_hit_ratio", "Share of cache lookups that hit",
+                       lambda: [({"cache": name}, hits / (hits + misses) if hits + misses else 0.0)
+                                for name, (hits, misses) in cache_counters().items()])
+metrics_registry.gauge("speech_model_load_seconds", "Time the startup models took to load",
+                       lambda: [({"model": resource.name}, resource.load_time)
+                                for resource in (whisper_resource, tts_resource) if resource.load_time is not None])
+metrics_registry.gauge("speech_model_ready", "1 once a startup model is loaded",
+                       lambda: [({"model": resource.name}, int(resource.ready)) for resource in (whisper_resource, tts_resource)])
+metrics_registry.gauge("speech_whisper_model_bytes", "Memory held by each loaded Whisper model",
+                       lambda: [({"model": name}, size) for name, size in whisper_models.status()["loaded"].items()])
+#=============================================================================================
 @app.route('/process_audio', methods=['POST'])
 def process_audio():
-    """Combined endpoint for transcribing and generating speech using the same uploaded audio for cloning."""
-    
-    # Check if the required fields are present
-    if 'audio' not in request.files:
-        return jsonify({"error": "No audio file uploaded"}), 400
-
-    # Retrieve the audio file and other parameters from the request
-    audio_file = request.files['audio']
-    audio_filename = secure_filename(audio_file.filename)
+    """Combined endpoint for transcribing and generating speech using the same uploaded audio for cloning.
 
-    # Extract user-provided parameters
-    user_id = request.form.get('user_id', 'NO_ID')  # Use 'NO_ID' if not provided
-    input_type = request.form.get('type', 'speech')  # Default type is 'speech'
+    The work is queued. With the form field async=true the endpoint answers 202 with a job id
+    right away (poll /jobs/<job_id> or subscribe over Socket.IO); otherwise it waits for the result."""
     
-    current_epoch_time = int(time.time())
-    
-    # Get additional metadata fields with defaults
-    transcription_text = request.form.get('input', 'Default transcription')
-    input_filename = request.form.get('inputFile', audio_filename)
-    duration = request.form.get('duration', 'Unknown duration')
-    file_type = request.form.get('fileType', audio_file.content_type)
-    date_and_time = request.form.get('dateAndtime', time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(current_epoch_time)))
+    # Check if the required fields are present (parsing the form receives the whole upload)
+    with stage("upload_receive", g.trace):
+        if 'audio' not in request.files:
+            return jsonify({"error": "No audio file uploaded"}), 400
+
+        # Retrieve the audio file and other parameters from the request
+        audio_bytes = request.files['audio'].read()
+
+    job = {
+        "audio_bytes": audio_bytes,
+        "user_id": request.form.get('user_id', 'NO_ID'),  # Use 'NO_ID' if not provided
+        "stream_sid": request.form.get('stream_sid'),  # Socket.IO sid to stream TTS chunks to
+        "pipelined": request.form.get('pipelined', '').lower() == 'true',
+        # Parallel windowed transcription: true/false, or decided by length when not given
+        "longform": {'true': True, 'false': False}.get(request.form.get('longform', '').lower()),
+        "tier": request.form.get('tier', DEFAULT_TIER),  # fast / balanced / accurate
+        # Encoding of the generated speech: the 'format' field, else an audio type in the Accept header
+        "output_format": negotiate_format(request.form.get('format'), [value for value, _ in request.accept_mimetypes],
+                                          OUTPUT_AUDIO_FORMAT),
+        "language": request.form.get('language', 'en'),
+        # Unique per request: requests of the same user in the same second must not share S3 keys
+        "file_id": uuid.uuid4().hex,
+        "queued_at": time.perf_counter(),
+        "trace": g.trace  # stages measured on the worker, reported if the request asked for a trace
+    }
+    if job['output_format'] is None:
+        return jsonify({"error": f"Unknown format '{request.form.get('format')}', expected one of {sorted(AUDIO_FORMATS)}"}), 400
+    if job['tier'] not in MODEL_TIERS:
+        return jsonify({"error": f"Unknown tier '{job['tier']}', expected one of {sorted(MODEL_TIERS)}"}), 400
+
+    for resource in (whisper_resource, tts_resource):
+        if resource.state == "failed":
+            return jsonify({"error": f"{resource.name} failed to load: {resource.error}"}), 503
 
     try:
-        # Measure total response time
-        response_start_time = time.time()
-
-        # Save the uploaded audio file temporarily
-        input_filename = f"{user_id}_input_{current_epoch_time}.wav"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_audio_file:
-            tmp_audio_file.write(audio_file.read())
-            tmp_audio_path = tmp_audio_file.name
-
-        # Upload input audio file to S3 with proper naming
-        input_audio_s3_url = upload_to_s3(tmp_audio_path, input_filename, S3_BUCKET)
-
-        # Measure transcription time (Whisper)
-        transcription_start_time = time.time()
-        result = whisper_model.transcribe(tmp_audio_path, language='en')
-        transcription_text = result['text'].strip()
-        transcription_time = time.time() - transcription_start_time
-        print(f"Transcription completed in {transcription_time:.2f} seconds.")
-
-        # Split the transcription into chunks if it exceeds the character limit
-        text_chunks = chunk_text(transcription_text, max_length=250)
-
-        # Create an empty AudioSegment object to concatenate all chunks
-        final_audio = AudioSegment.silent(duration=0)
-
-        # Measure TTS generation time
-        tts_start_time = time.time()
-
-        # Process each chunk separately using TTS
-        for idx, chunk in enumerate(text_chunks):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f"_part_{idx}.wav") as tmp_output_file:
-                tts.tts_to_file(
-                    text=chunk,
-                    file_path=tmp_output_file.name,
-                    speaker_wav=tmp_audio_path,
-                    language="en"
-                )
-                
-                # Load the generated chunk audio and append it to the final audio
-                chunk_audio = AudioSegment.from_wav(tmp_output_file.name)
-                final_audio += chunk_audio
-
-        tts_generation_time = time.time() - tts_start_time
-        print(f"TTS generation completed in {tts_generation_time:.2f} seconds.")
-
-        # Save the final concatenated audio to a new file
-        output_filename = f"{user_id}_output_{current_epoch_time}.wav"
-        combined_output_path = os.path.join(tempfile.gettempdir(), output_filename)
-        final_audio.export(combined_output_path, format="wav")
-
-        # Upload output audio file to S3
-        output_audio_s3_url = upload_to_s3(combined_output_path, output_filename, S3_BUCKET)
-
-        # Clean up temporary files
-        os.remove(tmp_audio_path)
-
-        # Measure total response time
-        total_response_time = time.time() - response_start_time
-        print(f"Total time taken to generate response: {total_response_time:.2f} seconds.")
+        job_id = job_queue.submit(job)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
 
-        
+    if request.form.get('async', '').lower() == 'true':
+        return jsonify({"job_id": job_id, "status": "queued"}), 202
 
-        return jsonify({
-            "message": "Process completed and metadata saved",
-            # "uid": metadata_id,
-            "user_id": user_id,
-            "transcription": transcription_text,
-            "input_audio_url": input_filename,  # Correctly reference input audio URL
-            "generated_speech_url": output_filename
-        })
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    state = job_queue.wait(job_id)
+    if state['status'] == 'failed':
+        return jsonify({"error": state['error']}), 500
+    return jsonify(state['result'])
+#=============================================================================================
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Endpoint to poll the state of a queued /process_audio job."""
+    state = job_queue.get(job_id)
+    if state is None:
+        return jsonify({"error": "Job not found"}), 404
+    state['queue_depth'] = job_queue.depth()
+    return jsonify(state), 200
+
+
+@app.route('/models', methods=['GET'])
+def get_models():
+    """Endpoint to list the latency tiers and the Whisper models currently loaded."""
+    return jsonify({
+        "default_tier": DEFAULT_TIER,
+        "tiers": MODEL_TIERS,
+        "whisper_models": whisper_models.status(),
+        "tts_model": TTS_MODEL_NAME,
+        "device": INFERENCE_DEVICE
+    }), 200
+
+
+@app.route('/cache_stats', methods=['GET'])
+def get_cache_stats():
+    """Endpoint to report hit/miss counters of the result and speaker caches."""
+    return jsonify({
+        "result_cache": result_cache.stats(),
+        "speaker_cache": speaker_cache.stats(),
+        "presigned_urls": presigned_urls.stats()
+    }), 200
+
+
+@socketio.on('subscribe_job')
+def subscribe_job(data):
+    """Join the room of a job to receive its 'job_update' events."""
+    job_id = (data or {}).get('job_id')
+    state = job_queue.get(job_id) if job_id else None
+    if state is None:
+        emit('job_update', {"job_id": job_id, "status": "unknown"})
+        return
+    join_room(job_id)
+    # The job may have progressed before the client subscribed
+    emit('job_update', state)
 #=============================================================================================
 
 @app.route('/update_filename', methods=['POST'])
@@ -470,10 +844,12 @@ def get_file_url():
         return jsonify({"error": "Missing 'fileName' parameter"}), 400
 
     try:
-        # Check if the file exists in S3 with proper key
-        s3_client.head_object(Bucket=S3_BUCKET, Key=f"audio/{file_name}")
-        
-        # Generate presigned URL using the correct S3 client
+        # Check that the file exists (metadata store first, S3 only for unknown files)
+        _, missing = split_existing_files([file_name])
+        if missing:
+            return jsonify({"error": f"File '{file_name}' not found in S3 bucket."}), 404
+
+        # Generate presigned URL (cached until close to expiry)
         signed_url = create_presigned_url(S3_BUCKET, f"audio/{file_name}")
 
         if signed_url:
@@ -484,76 +860,121 @@ def get_file_url():
     except NoCredentialsError:
         return jsonify({"error": "AWS credentials are not available."}), 500
     except ClientError as e:
-        if e.response['Error']['Code'] == '404':
-            return jsonify({"error": f"File '{file_name}' not found in S3 bucket."}), 404
-        else:
-            return jsonify({"error": "Error checking file in S3."}), 500
+        print(f"Error checking {file_name} in S3: {str(e)}")
+        return jsonify({"error": "Error checking file in S3."}), 500
+
+
+@app.route('/temp_urls', methods=['POST'])
+def get_file_urls():
+    """
+    Endpoint to presign many files in one call, e.g. every input and output of a user's history.
+
+    Expects {"fileNames": [...]} and returns {"temp_URLs": {fileName: url}, "missing": [fileName, ...]}.
+    """
+    file_names = (request.get_json(silent=True) or {}).get('fileNames')
+
+    if not isinstance(file_names, list) or not all(isinstance(name, str) and name for name in file_names):
+        return jsonify({"error": "Expected a JSON body with a 'fileNames' list"}), 400
+    if len(file_names) > TEMP_URLS_MAX_FILES:
+        return jsonify({"error": f"At most {TEMP_URLS_MAX_FILES} file names per request"}), 400
+
+    try:
+        existing, missing = split_existing_files(list(dict.fromkeys(file_names)))
+        urls = {}
+        for file_name in existing:
+            signed_url = create_presigned_url(S3_BUCKET, f"audio/{file_name}")
+            if signed_url is None:
+                return jsonify({"error": f"Failed to generate signed URL for '{file_name}'"}), 500
+            urls[file_name] = signed_url
+        return jsonify({"temp_URLs": urls, "missing": missing})
+
+    except NoCredentialsError:
+        return jsonify({"error": "AWS credentials are not available."}), 500
+    except ClientError as e:
+        print(f"Error checking {len(file_names)} files in S3: {str(e)}")
+        return jsonify({"error": "Error checking files in S3."}), 500
 
 #==============================================================================================
 @app.route('/get_metadata/<user_id>', methods=['GET'])
 def get_user(user_id):
     """Retrieve user details based on user_id."""
-    stored_data = load_user_data()
+    details = user_store.get(user_id)
 
     # Check if the user_id exists
-    if user_id in stored_data:
+    if details is not None:
         return jsonify({
             "user_id": user_id,
-            "details": stored_data[user_id]
+            "details": details
         }), 200
     else:
         return jsonify({"error": "User not found"}), 404
         
 #==============================================================================================
+def list_records(response_key, user_id=None, empty_message=None):
+    """
+    Helper function to list metadata records with optional filters, pagination and NDJSON streaming.
+
+    Query parameters: type, since / until (epoch seconds), limit, cursor (the next_cursor of
+    the previous page) and format=ndjson. NDJSON responses are serialized one record per line
+    while they are read from the store; with a limit, a last {"next_cursor": ...} line follows
+    when more records may be available. A limit that is not a positive integer, or a cursor
+    that is not an integer, is rejected with a 400.
+    """
+    try:
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+        cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be integers"}), 400
+    if limit is not None and limit <= 0:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+
+    records = metadata_store.iter_records(
+        user_id=user_id,
+        record_type=request.args.get('type'),
+        since=request.args.get('since', type=float),
+        until=request.args.get('until', type=float),
+        after=cursor,
+        limit=limit
+    )
+
+    if request.args.get('format') == 'ndjson':
+        def generate():
+            count = 0
+            last_cursor = None
+            for last_cursor, record in records:
+                count += 1
+                yield json.dumps(record) + "\n"
+            if limit is not None and count == limit and last_cursor is not None:
+                yield json.dumps({"next_cursor": str(last_cursor)}) + "\n"
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    page = list(records)
+    body = {response_key: [record for _, record in page]}
+    if limit is not None:
+        body["next_cursor"] = str(page[-1][0]) if page and len(page) == limit else None
+    if not page and empty_message:
+        body["message"] = empty_message
+    return jsonify(body), 200
+#==============================================================================================
 @app.route('/get_user_records/<user_id>', methods=['GET'])
 def get_user_records(user_id):
-    """Endpoint to retrieve metadata records for a specific user based on user_id."""
-    metadata_filename = "metadata.json"
-    metadata_filepath = os.path.join(os.getcwd(), metadata_filename)
-
-    # Check if the metadata file exists
-    if not os.path.exists(metadata_filepath):
-        return jsonify({"user_records": []}), 200  # Return empty list if no metadata found
-
+    """Endpoint to retrieve metadata records for a specific user based on user_id (see list_records for paging)."""
     try:
-        # Load the metadata from the file
-        with open(metadata_filepath, 'r') as json_file:
-            records_metadata = json.load(json_file)
-
-        # Filter records for the given user_id
-        user_records = [record for record in records_metadata if record.get("user_id") == user_id]
-
-        if user_records:
-            return jsonify({"user_records": user_records}), 200
-        else:
-            return jsonify({"user_records": [], "message": "No records found for the specified user"}), 200
-
-    except json.JSONDecodeError:
-        return jsonify({"error": "Error decoding metadata file."}), 500
+        # Indexed lookup on user_id
+        return list_records("user_records", user_id=user_id,
+                            empty_message="No records found for the specified user")
     except Exception as e:
         return jsonify({"error": str(e)}), 500    
 #==============================================================================================
 @app.route('/get_records_metadata', methods=['GET'])
 def get_records_metadata():
-    """Endpoint to retrieve metadata of all uploaded records."""
-    metadata_filename = "metadata.json"
-    metadata_filepath = os.path.join(os.getcwd(), metadata_filename)
-
-    # Check if the metadata file exists
-    if not os.path.exists(metadata_filepath):
-        return jsonify({"records_metadata": []}), 200  # Return empty list if no metadata found
-
+    """Endpoint to retrieve metadata of all uploaded records (optionally ?user_id=, see list_records for paging)."""
     try:
-        # Load the metadata from the file
-        with open(metadata_filepath, 'r') as json_file:
-            records_metadata = json.load(json_file)
-            return jsonify({"records_metadata": records_metadata}), 200
-    except json.JSONDecodeError:
-        return jsonify({"error": "Error decoding metadata file."}), 500
+        return list_records("records_metadata", user_id=request.args.get('user_id'))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 #==============================================================================================
 if __name__ == '__main__':
-    app.run(debug=False, host='0.0.0.0', port=5050)
+    socketio.run(app, debug=False, host='0.0.0.0', port=5050, allow_unsafe_werkzeug=True)
 
 
@@ -0,0 +1,68 @@
+import importlib.util
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Make the repository modules (utils/...) importable from tests/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# State the app writes (metadata.db, user_details.json, result_cache/, artifacts) goes to a
+# scratch directory instead of the checkout; set before any utils module reads its settings
+STATE_DIR = tempfile.mkdtemp(prefix="speech-tests-")
+os.environ.setdefault("METADATA_DB", os.path.join(STATE_DIR, "metadata.db"))
+os.environ.setdefault("RESULT_CACHE_DIR", os.path.join(STATE_DIR, "result_cache"))
+os.environ.setdefault("ARTIFACT_DIR", os.path.join(STATE_DIR, "artifacts"))
+os.environ.setdefault("MODEL_LOADING", "eager")
+os.environ.setdefault("S3_BUCKET", "test-bucket")
+os.environ.setdefault("AWS_REGION", "us-east-1")
+
+
+@pytest.fixture(scope="session")
+def stub_models():
+    """Route model loading and S3 to the CPU stand-ins of benchmarks/stubs.py."""
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    from stubs import install_stubs
+
+    return install_stubs(whisper_rtf=0, tts_rtf=0, s3_latency=0)
+
+
+def load_script(name, module_name):
+    """Import one of the entry scripts (their file names are not module names) by path."""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT, name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if hasattr(module, "wait_for_models"):
+        module.wait_for_models()
+    return module
+
+
+@pytest.fixture(scope="session")
+def app_module(stub_models):
+    """speech-endpoints.py running on the stand-in models and S3, with its state in STATE_DIR."""
+    # The user store resolves its files against the working directory
+    previous_cwd = os.getcwd()
+    os.chdir(STATE_DIR)
+    try:
+        yield load_script("speech-endpoints.py", "speech_app")
+    finally:
+        os.chdir(previous_cwd)
+
+
+@pytest.fixture(scope="session")
+def turbo_module(stub_models):
+    """turbo.py running on the stand-in models."""
+    return load_script("turbo.py", "turbo_app")
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def turbo_client(turbo_module):
+    return turbo_module.app.test_client()
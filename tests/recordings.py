@@ -0,0 +1,30 @@
+import io
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def speech_over_noise(seconds, snr_db, seed=0, noise_level=0.02):
+    """Noise bursts of 0.5-2 s (stand-ins for speech) mixed snr_db above steady background noise."""
+    rng = np.random.default_rng(seed)
+    length = int(seconds * SAMPLE_RATE)
+    audio = rng.standard_normal(length).astype(np.float32) * noise_level
+    # Burst power over noise power is 10^(snr/10) - 1 once the noise is added
+    burst_level = noise_level * np.sqrt(10 ** (snr_db / 10) - 1)
+    position = 0
+    while position < length:
+        burst = min(int(rng.uniform(0.5, 2.0) * SAMPLE_RATE), length - position)
+        audio[position:position + burst] += rng.standard_normal(burst).astype(np.float32) * burst_level
+        position += burst + int(rng.uniform(0.2, 0.6) * SAMPLE_RATE)
+    return audio
+
+
+def continuous_noise(seconds, seed=0, level=0.05):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal(int(seconds * SAMPLE_RATE)).astype(np.float32) * level
+
+
+def upload_form(audio_bytes, **form):
+    """Multipart form of a /process_audio request."""
+    return dict(form, audio=(io.BytesIO(audio_bytes), "clip.wav"))
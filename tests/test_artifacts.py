@@ -0,0 +1,58 @@
+import os
+
+from recordings import SAMPLE_RATE, speech_over_noise, upload_form
+from utils.audio_io import encode_wav
+
+
+def generate(turbo_client, **form):
+    recording = encode_wav(speech_over_noise(3, 20, seed=7), SAMPLE_RATE)
+    response = turbo_client.post('/process_audio', data=upload_form(recording, **form))
+    assert response.status_code == 200
+    return response.get_json()["generated_speech_url"].rsplit('/', 1)[1]
+
+
+def test_download_supports_range_and_etag(turbo_client):
+    name = generate(turbo_client)
+
+    full = turbo_client.get(f'/download/{name}')
+    assert full.status_code == 200 and full.data[:4] == b"RIFF"
+    etag = full.headers["ETag"]
+
+    partial = turbo_client.get(f'/download/{name}', headers={"Range": "bytes=0-99"})
+    assert partial.status_code == 206
+    assert partial.data == full.data[:100]
+    assert partial.headers["Content-Range"] == f"bytes 0-99/{len(full.data)}"
+
+    assert turbo_client.get(f'/download/{name}', headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_each_request_gets_its_own_artifact(turbo_client):
+    assert generate(turbo_client) != generate(turbo_client)
+
+
+def test_other_formats_are_converted_once(turbo_client, turbo_module):
+    name = generate(turbo_client)
+
+    response = turbo_client.get(f'/download/{name}?format=flac')
+    assert response.status_code == 200 and response.mimetype == "audio/flac"
+    variant = turbo_module.artifacts.path(name.replace(".wav", ".flac"))
+    converted_at = os.path.getmtime(variant)
+    assert turbo_client.get(f'/download/{name}', headers={"Accept": "audio/flac"}).data == response.data
+    assert os.path.getmtime(variant) == converted_at
+
+
+def test_streamed_artifact_can_be_downloaded_while_it_is_written(turbo_client, turbo_module):
+    name = generate(turbo_client, stream="true")
+
+    data = turbo_client.get(f'/download/{name}').data
+    assert turbo_module.artifacts.wait(name, timeout=30)
+    with open(turbo_module.artifacts.path(name), 'rb') as f:
+        written = f.read()
+    # The streamed copy started before the WAV header sizes were patched in
+    assert data[44:] == written[44:] and data[:4] == b"RIFF"
+
+
+def test_unknown_or_foreign_names_are_not_served(turbo_client):
+    assert turbo_client.get('/download/../../etc/passwd').status_code == 404
+    assert turbo_client.get(f'/download/{"0" * 32}.wav').status_code == 404
+    assert turbo_client.get(f'/download/{"0" * 31}.exe').status_code == 404
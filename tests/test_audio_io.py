@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from utils import audio_io
+from utils.audio_io import decode_audio, encode_wav, negotiate_format, resample
+
+
+def test_resample_matches_decoding_at_the_target_rate():
+    rate = 22050
+    t = np.arange(2 * rate) / rate
+    audio = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+    resampled = resample(audio, rate, 16000)
+    decoded = decode_audio(encode_wav(audio, rate), 16000)
+
+    assert resampled.dtype == np.float32 and abs(len(resampled) - 32000) <= 1
+    length = min(len(resampled), len(decoded))
+    assert np.abs(resampled[:length] - decoded[:length]).max() < 1e-3
+    assert resample(audio, rate, rate) is audio
+
+
+@pytest.mark.parametrize("requested, expected", [
+    ("opus", "opus"), ("OGG", "opus"), ("mp3", "mp3"), ("flac", "flac"), ("wav", "wav"), ("aac", None),
+])
+def test_explicit_format_by_name_or_extension(requested, expected):
+    assert negotiate_format(requested, ["audio/flac"], "wav") == expected
+
+
+def test_accept_header_then_default():
+    assert negotiate_format(None, ["text/html", "audio/x-flac", "audio/mpeg"], "wav") == "flac"
+    assert negotiate_format("", ["audio/opus"], "wav") == "opus"
+    assert negotiate_format(None, ["*/*"], "mp3") == "mp3"
+
+
+def test_without_ffmpeg_only_what_needs_no_encoder_is_offered(monkeypatch):
+    monkeypatch.setattr(audio_io.shutil, "which", lambda name: None)
+
+    assert negotiate_format("mp3", [], "opus") == "wav"
+    assert negotiate_format(None, ["audio/ogg", "audio/wav"], "opus") == "wav"
+    assert negotiate_format("aac", [], "wav") is None
+    # An existing file can still be served as it is stored, but not converted
+    available = audio_io.available_formats("opus")
+    assert negotiate_format("flac", [], "opus", available) == "opus"
+    assert negotiate_format(None, ["audio/ogg"], "opus", available) == "opus"
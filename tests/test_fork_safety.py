@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import sqlite3
+import threading
+
+from utils.artifacts import ArtifactStore
+from utils.job_queue import JobQueue
+from utils.metadata_store import SQLiteMetadataStore
+from utils.s3_uploader import S3Uploader
+
+
+def in_child(function):
+    """Run function() in a forked process and return its result."""
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=lambda: queue.put(function()))
+    child.start()
+    result = queue.get(timeout=30)
+    child.join(10)
+    return result
+
+
+def test_sqlite_store_reopens_connection_after_fork(tmp_path):
+    store = SQLiteMetadataStore(str(tmp_path / "metadata.db"), legacy_path=None)
+    store.append({"id": "1_1700000000", "user_id": "alice"})
+    parent_connection = store._connection()
+
+    def child():
+        store.append({"id": "2_1700000001", "user_id": "alice"})
+        return store._connection() is not parent_connection, len(store.records(user_id="alice"))
+
+    assert in_child(child) == (True, 2)
+    # The parent's connection still works
+    assert isinstance(parent_connection, sqlite3.Connection)
+    assert len(store.records(user_id="alice")) == 2
+
+
+def test_job_queue_starts_workers_in_forked_process():
+    jobs = JobQueue(lambda payload: payload * 2, workers=1)
+    jobs.wait(jobs.submit(1))
+
+    def child():
+        return jobs.wait(jobs.submit(21), timeout=10)["result"]
+
+    assert in_child(child) == 42
+
+
+def test_job_state_is_visible_to_other_worker_processes(tmp_path):
+    store = SQLiteMetadataStore(str(tmp_path / "metadata.db"), legacy_path=None)
+    jobs = JobQueue(lambda payload: {"doubled": payload * 2}, workers=1, store=store)
+
+    def child():
+        job_id = jobs.submit(21)
+        jobs.wait(job_id, timeout=10)
+        return job_id
+
+    job_id = in_child(child)
+    # This process never saw the job, the shared store answers for it
+    assert jobs.get(job_id)["status"] == "done"
+    assert jobs.get(job_id)["result"] == {"doubled": 42}
+    assert jobs.get("unknown") is None
+
+
+class MemoryClient:
+    def __init__(self):
+        self.keys = []
+
+    def upload_fileobj(self, fileobj, bucket_name, s3_key, ExtraArgs=None, Config=None):
+        self.keys.append(s3_key)
+
+
+def test_uploader_pool_is_per_process():
+    uploader = S3Uploader(MemoryClient(), workers=1)
+    uploader.submit(b"data", "bucket", "audio/parent.wav").result(10)
+
+    def child():
+        return uploader.submit(b"data", "bucket", "audio/child.wav").result(10)
+
+    assert in_child(child).endswith("audio/child.wav")
+    uploader.shutdown()
+
+
+def test_artifact_sweeper_restarts_in_forked_process(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.start_sweeper(interval=3600)
+
+    def child():
+        store.create("wav", 24000).abort()
+        return store._sweeper_pid == os.getpid() and store._sweeper.is_alive(), threading.active_count() > 1
+
+    assert in_child(child) == (True, True)
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from utils.job_queue import JobQueue, QueueFull
+
+
+def test_job_moves_from_queued_to_running_to_done():
+    started = threading.Event()
+    release = threading.Event()
+    updates = []
+
+    def handler(payload):
+        started.set()
+        release.wait(10)
+        return {"doubled": payload * 2}
+
+    jobs = JobQueue(handler, workers=1, on_update=lambda job_id, state: updates.append(state["status"]))
+    job_id = jobs.submit(21)
+    assert started.wait(10)
+    assert jobs.get(job_id)["status"] == "running"
+
+    release.set()
+    state = jobs.wait(job_id, timeout=10)
+
+    assert state["status"] == "done" and state["result"] == {"doubled": 42}
+    assert updates == ["queued", "running", "done"]
+    assert state["submitted_at"] <= state["started_at"] <= state["finished_at"]
+
+
+def test_handler_errors_fail_the_job():
+    def handler(payload):
+        raise RuntimeError("TTS model exploded")
+
+    jobs = JobQueue(handler, workers=1)
+    state = jobs.wait(jobs.submit(None), timeout=10)
+
+    assert state["status"] == "failed" and state["error"] == "TTS model exploded"
+    assert "result" not in state
+
+
+def test_submit_rejects_work_beyond_the_queue_size():
+    started = threading.Event()
+    release = threading.Event()
+
+    def handler(payload):
+        started.set()
+        return release.wait(10)
+
+    jobs = JobQueue(handler, workers=1, max_pending=1)
+    jobs.submit(1)
+    assert started.wait(10)
+    jobs.submit(2)
+
+    with pytest.raises(QueueFull):
+        jobs.submit(3)
+    release.set()
@@ -0,0 +1,88 @@
+import threading
+
+from recordings import SAMPLE_RATE, speech_over_noise, upload_form
+from utils.audio_io import encode_wav
+
+
+def submit(client, **form):
+    recording = encode_wav(speech_over_noise(2, 20, seed=4), SAMPLE_RATE)
+    response = client.post('/process_audio', data=upload_form(recording, **form))
+    assert response.status_code == 202
+    assert response.get_json()["status"] == "queued"
+    return response.get_json()["job_id"]
+
+
+def gate_handler(app_module, monkeypatch, handler=None):
+    """Hold jobs until the returned event is set, then run handler (default: the real one)."""
+    release = threading.Event()
+    run = handler or app_module.job_queue.handler
+
+    def gated(job):
+        release.wait(30)
+        return run(job)
+
+    monkeypatch.setattr(app_module.job_queue, "handler", gated)
+    return release
+
+
+def test_async_job_can_be_polled_until_done(client, app_module, monkeypatch):
+    release = gate_handler(app_module, monkeypatch)
+    job_id = submit(client, **{"async": "true"})
+
+    assert client.get(f'/jobs/{job_id}').get_json()["status"] in ("queued", "running")
+    release.set()
+    app_module.job_queue.wait(job_id, timeout=30)
+
+    state = client.get(f'/jobs/{job_id}').get_json()
+    assert state["status"] == "done"
+    assert state["result"]["generated_speech_url"].startswith("NO_ID_output_")
+    assert "queue_depth" in state
+
+
+def test_failed_job_reports_its_error(client, app_module, monkeypatch):
+    def explode(job):
+        raise RuntimeError("TTS model exploded")
+
+    release = gate_handler(app_module, monkeypatch, explode)
+    release.set()
+    job_id = submit(client, **{"async": "true"})
+    app_module.job_queue.wait(job_id, timeout=30)
+
+    state = client.get(f'/jobs/{job_id}').get_json()
+    assert state["status"] == "failed" and state["error"] == "TTS model exploded"
+
+    # Without async the request waits and answers with the error
+    recording = encode_wav(speech_over_noise(2, 20, seed=4), SAMPLE_RATE)
+    response = client.post('/process_audio', data=upload_form(recording))
+    assert response.status_code == 500 and response.get_json()["error"] == "TTS model exploded"
+
+
+def test_unknown_job_is_not_found(client):
+    assert client.get(f'/jobs/{"0" * 32}').status_code == 404
+
+
+def test_subscribers_are_notified_of_every_state_change(client, app_module, monkeypatch):
+    release = gate_handler(app_module, monkeypatch)
+    job_id = submit(client, **{"async": "true"})
+    socket = app_module.socketio.test_client(app_module.app)
+
+    socket.emit('subscribe_job', {"job_id": job_id})
+    release.set()
+    app_module.job_queue.wait(job_id, timeout=30)
+
+    statuses = [event["args"][0]["status"] for event in socket.get_received() if event["name"] == "job_update"]
+    # The current state on subscribing, then every later change
+    assert statuses[0] in ("queued", "running")
+    assert statuses[-1] == "done"
+    assert statuses == sorted(statuses, key=["queued", "running", "done"].index)
+    socket.disconnect()
+
+
+def test_subscribing_to_an_unknown_job(app_module):
+    socket = app_module.socketio.test_client(app_module.app)
+
+    socket.emit('subscribe_job', {"job_id": "missing"})
+
+    assert socket.get_received() == [{"name": "job_update", "args": [{"job_id": "missing", "status": "unknown"}],
+                                      "namespace": "/"}]
+    socket.disconnect()
@@ -0,0 +1,41 @@
+import threading
+
+from utils.lazy_loader import LazyResource
+
+
+def gated_resource(name, gate, loads):
+    def loader():
+        loads.append(name)
+        gate.wait(10)
+        return name
+    return LazyResource(name, loader)
+
+
+def test_start_loads_once():
+    gate = threading.Event()
+    loads = []
+    resource = gated_resource("model", gate, loads)
+
+    resource.start()
+    resource.start()
+    gate.set()
+
+    assert resource.get(timeout=10) == "model"
+    assert loads == ["model"]
+
+
+def test_lazy_mode_loads_on_the_first_readiness_probe(client, app_module, monkeypatch):
+    gate = threading.Event()
+    loads = []
+    monkeypatch.setattr(app_module, "MODEL_LOADING", "lazy")
+    monkeypatch.setattr(app_module, "whisper_resource", gated_resource("whisper", gate, loads))
+    monkeypatch.setattr(app_module, "tts_resource", gated_resource("tts", gate, loads))
+
+    first = client.get('/readyz')
+    assert first.status_code == 503
+    assert {first.get_json()["resources"][name]["state"] for name in ("whisper", "tts")} <= {"pending", "loading"}
+
+    gate.set()
+    assert app_module.whisper_resource.wait(10) and app_module.tts_resource.wait(10)
+    assert client.get('/readyz').status_code == 200
+    assert sorted(loads) == ["tts", "whisper"]
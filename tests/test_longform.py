@@ -0,0 +1,73 @@
+import zlib
+
+from recordings import SAMPLE_RATE, continuous_noise, speech_over_noise
+from utils.longform import TranscriptStitcher, plan_windows, transcribe_long
+
+
+def fake_transcribe(audio, initial_prompt):
+    """Two timestamped segments per window, the way the Whisper batcher answers."""
+    duration = len(audio) / SAMPLE_RATE
+    tag = zlib.crc32(audio.tobytes())
+    return {
+        "text": f" first {tag} second {tag}",
+        "segments": [{"id": 0, "start": 0.0, "end": duration / 2, "text": f" first {tag}"},
+                     {"id": 1, "start": duration / 2, "end": duration, "text": f" second {tag}"}],
+        "language": "en"
+    }
+
+
+def assert_covers(windows, length, overlap_seconds=1.0):
+    assert windows[0][0] == 0 and windows[-1][1] == length
+    for (_, previous_end), (start, end) in zip(windows, windows[1:]):
+        assert start < previous_end and previous_end - start == int(overlap_seconds * SAMPLE_RATE / 2) * 2
+        assert end - start <= 30 * SAMPLE_RATE
+
+
+def test_plan_windows_low_snr_falls_back_to_overlapping_windows():
+    audio = speech_over_noise(75, snr_db=9.5)
+    windows = plan_windows(audio, SAMPLE_RATE)
+    assert len(windows) == 3
+    assert_covers(windows, len(audio))
+
+
+def test_plan_windows_continuous_noise():
+    audio = continuous_noise(95)
+    windows = plan_windows(audio, SAMPLE_RATE)
+    assert len(windows) == 4
+    assert_covers(windows, len(audio))
+
+
+def test_transcribe_long_keeps_segment_timestamps():
+    audio = continuous_noise(95)
+    windows = plan_windows(audio, SAMPLE_RATE)
+    result = transcribe_long(audio, fake_transcribe, SAMPLE_RATE, workers=4)
+
+    assert result["text"]
+    assert len(result["segments"]) == 2 * len(windows)
+    for index, (start, end) in enumerate(windows):
+        first, second = result["segments"][2 * index:2 * index + 2]
+        assert first["start"] == start / SAMPLE_RATE
+        assert second["end"] == end / SAMPLE_RATE
+        assert first["end"] == second["start"] == (start + end) / 2 / SAMPLE_RATE
+    assert [segment["id"] for segment in result["segments"]] == list(range(len(result["segments"])))
+
+
+def test_stitcher_drops_words_repeated_in_the_overlap():
+    stitcher = TranscriptStitcher(SAMPLE_RATE)
+    stitcher.add({"segments": [{"start": 0.0, "end": 29.5, "text": " I went to the store today"}]},
+                 0, 30 * SAMPLE_RATE)
+    text = stitcher.add({"segments": [{"start": 0.0, "end": 1.0, "text": " store today"},
+                                      {"start": 1.0, "end": 4.0, "text": " and bought milk"}]},
+                        29 * SAMPLE_RATE, 40 * SAMPLE_RATE)
+
+    assert text == "and bought milk"
+    result = stitcher.result()
+    assert result["text"] == "I went to the store today and bought milk"
+    assert [(segment["start"], segment["end"]) for segment in result["segments"]] == [(0.0, 29.5), (30.0, 33.0)]
+
+
+def test_stitcher_keeps_repeats_across_silence_cuts():
+    stitcher = TranscriptStitcher(SAMPLE_RATE)
+    stitcher.add({"segments": [{"start": 0.0, "end": 2.0, "text": " no no"}]}, 0, 2 * SAMPLE_RATE)
+    stitcher.add({"segments": [{"start": 0.0, "end": 2.0, "text": " no no"}]}, 3 * SAMPLE_RATE, 5 * SAMPLE_RATE)
+    assert stitcher.result()["text"] == "no no no no"
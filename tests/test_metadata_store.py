@@ -0,0 +1,83 @@
+import json
+
+import utils.metadata_store as metadata_store
+from utils.metadata_store import UPLOADING, JSONFileMetadataStore, SQLiteMetadataStore
+
+
+def test_legacy_records_are_imported_once(tmp_path):
+    legacy = tmp_path / "metadata.json"
+    legacy.write_text(json.dumps([{"id": "1_1700000000", "user_id": "alice"}]))
+
+    store = SQLiteMetadataStore(str(tmp_path / "metadata.db"), legacy_path=str(legacy))
+
+    assert [record["id"] for record in store.records(user_id="alice")] == ["1_1700000000"]
+    assert not legacy.exists() and (tmp_path / "metadata.json.imported").exists()
+
+
+def test_corrupt_legacy_file_is_retried(tmp_path):
+    legacy = tmp_path / "metadata.json"
+    legacy.write_text('[{"id": "1_1700000000", "user_id": "alice"')
+    path = str(tmp_path / "metadata.db")
+
+    store = SQLiteMetadataStore(path, legacy_path=str(legacy))
+    assert store.records() == []
+    assert legacy.exists()
+
+    legacy.write_text(json.dumps([{"id": "1_1700000000", "user_id": "alice"}]))
+    store = SQLiteMetadataStore(path, legacy_path=str(legacy))
+    assert [record["id"] for record in store.records()] == ["1_1700000000"]
+
+
+def test_upload_in_progress_is_not_overwritten_by_a_missing_lookup(tmp_path):
+    store = SQLiteMetadataStore(str(tmp_path / "metadata.db"), legacy_path=None)
+    store.mark_files(["a.wav"], UPLOADING)
+    store.record_missing(["a.wav", "b.wav"])
+    assert store.file_status(["a.wav", "b.wav", "c.wav"]) == {"a.wav": UPLOADING, "b.wav": False, "c.wav": None}
+
+    store.mark_files(["a.wav"], True)
+    store.record_missing(["a.wav"])
+    assert store.file_status(["a.wav"]) == {"a.wav": True}
+
+
+def test_stale_upload_counts_as_unknown(tmp_path, monkeypatch):
+    store = SQLiteMetadataStore(str(tmp_path / "metadata.db"), legacy_path=None)
+    store.mark_files(["a.wav"], UPLOADING)
+    monkeypatch.setattr(metadata_store, "FILE_UPLOAD_STALE_SECONDS", -1)
+    assert store.file_status(["a.wav"]) == {"a.wav": None}
+
+
+def test_json_cursor_survives_removals(tmp_path):
+    store = JSONFileMetadataStore(str(tmp_path / "metadata.json"))
+    for index in range(5):
+        store.append({"id": f"{index}_1700000000", "user_id": "alice"})
+
+    page = list(store.iter_records(limit=2))
+    assert store.remove("0_1700000000") and store.remove("1_1700000000")
+    assert not store.remove("0_1700000000")
+
+    after = [record["id"] for _, record in store.iter_records(after=page[-1][0])]
+    assert after == ["2_1700000000", "3_1700000000", "4_1700000000"]
+    assert store.get("0_1700000000") is None
+
+
+def test_json_tombstones_are_not_imported(tmp_path):
+    legacy = tmp_path / "metadata.json"
+    JSONFileMetadataStore(str(legacy)).append({"id": "1_1700000000", "user_id": "alice"})
+    JSONFileMetadataStore(str(legacy)).append({"id": "2_1700000000", "user_id": "alice"})
+    JSONFileMetadataStore(str(legacy)).remove("1_1700000000")
+
+    store = SQLiteMetadataStore(str(tmp_path / "metadata.db"), legacy_path=str(legacy))
+    assert [record["id"] for record in store.records()] == ["2_1700000000"]
+
+
+def test_tombstones_are_counted_on_an_index(tmp_path):
+    store = SQLiteMetadataStore(str(tmp_path / "metadata.db"), legacy_path=None, compact_threshold=3)
+    plan = store._connection().execute("EXPLAIN QUERY PLAN SELECT COUNT(*) FROM records WHERE deleted = 1").fetchall()
+    assert "idx_records_deleted" in str(plan)
+
+    for index in range(4):
+        store.append({"id": f"{index}_1700000000", "user_id": "alice"})
+    for index in range(3):
+        assert store.remove(f"{index}_1700000000")
+    # The third delete reached the threshold and purged the tombstones
+    assert store._connection().execute("SELECT COUNT(*) FROM records").fetchone()[0] == 1
@@ -0,0 +1,33 @@
+import multiprocessing
+import os
+
+from utils.metrics import MetricsRegistry, ProcessSampler, register_process_metrics
+
+
+def report_from_child(sampler, queue):
+    current = sampler.current()
+    queue.put((os.getpid(), current.pid, current.process.pid, current._thread.is_alive()))
+
+
+def test_sampler_restarts_in_forked_process():
+    sampler = ProcessSampler(interval=0.01)
+    assert sampler.current().pid == os.getpid()
+
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=report_from_child, args=(sampler, queue))
+    child.start()
+    child_pid, sampler_pid, process_pid, thread_alive = queue.get(timeout=10)
+    child.join(10)
+
+    assert child_pid != os.getpid()
+    assert sampler_pid == process_pid == child_pid
+    assert thread_alive
+
+
+def test_process_metrics_are_created_lazily():
+    registry = MetricsRegistry()
+    sampler = register_process_metrics(registry)
+    assert sampler.pid is None
+    assert "process_resident_memory_bytes" in registry.render()
+    assert sampler.pid == os.getpid()
@@ -0,0 +1,21 @@
+import json
+
+from utils.model_registry import DEFAULT_TIER, load_tiers
+
+
+def test_default_tier_decodes_like_the_original_transcribe_call():
+    decode = load_tiers("cuda", "large-v3", path=None)[DEFAULT_TIER]["decode"]
+    # whisper.transcribe defaults: greedy, conditioned on the previous window, temperature fallback
+    assert decode.get("beam_size") is None
+    assert decode.get("condition_on_previous_text", True) is True
+    assert "temperature" not in decode
+
+
+def test_beam_search_is_opt_in(tmp_path):
+    overrides = tmp_path / "tiers.json"
+    overrides.write_text(json.dumps({"accurate": {"decode": {"beam_size": 5}}}))
+
+    tiers = load_tiers("cuda", "large-v3", path=str(overrides))
+
+    assert tiers["accurate"]["decode"] == {"beam_size": 5, "condition_on_previous_text": True}
+    assert all(tier["decode"].get("beam_size") is None for name, tier in tiers.items() if name != "accurate")
@@ -0,0 +1,74 @@
+import numpy as np
+
+from utils import audio_io
+from recordings import SAMPLE_RATE, speech_over_noise, upload_form
+from utils.audio_io import encode_wav
+
+
+def upload(client, audio_bytes, **form):
+    return client.post('/process_audio', data=upload_form(audio_bytes, **form))
+
+
+def test_speaker_is_conditioned_on_the_full_band(client, app_module, monkeypatch):
+    xtts = app_module.tts_resource.get().synthesizer.tts_model
+    received = []
+    original = xtts.get_speaker_embedding
+
+    def get_speaker_embedding(wav, sample_rate):
+        received.append((sample_rate, wav.squeeze(0).numpy()))
+        return original(wav, sample_rate)
+
+    monkeypatch.setattr(xtts, "get_speaker_embedding", get_speaker_embedding)
+    # A 9 kHz component: above what a 16 kHz decode can hold
+    rate = 44100
+    t = np.arange(3 * rate) / rate
+    recording = (0.3 * np.sin(2 * np.pi * 300 * t) + 0.2 * np.sin(2 * np.pi * 9000 * t)).astype(np.float32)
+
+    response = upload(client, encode_wav(recording, rate), user_id="full-band")
+
+    assert response.status_code == 200
+    sample_rate, reference = received[-1]
+    assert sample_rate == 22050
+    spectrum = np.abs(np.fft.rfft(reference))
+    frequencies = np.fft.rfftfreq(len(reference), 1 / sample_rate)
+    assert spectrum[np.abs(frequencies - 9000) < 50].max() > 0.1 * spectrum.max()
+
+
+def test_requests_in_the_same_second_get_their_own_files(client, app_module):
+    recording = encode_wav(speech_over_noise(2, 20, seed=1), SAMPLE_RATE)
+
+    first = upload(client, recording).get_json()
+    second = upload(client, recording).get_json()
+
+    names = {first["input_audio_url"], first["generated_speech_url"],
+             second["input_audio_url"], second["generated_speech_url"]}
+    assert len(names) == 4
+    assert all(name.startswith("NO_ID_") for name in names)
+    app_module.s3_uploader.wait_for_all(app_module.S3_BUCKET, [f"audio/{name}" for name in names], timeout=30)
+    assert {f"audio/{name}" for name in names} <= {key for _, key in app_module.s3_client.objects}
+
+
+def test_output_format_accepts_the_file_extension(client, app_module):
+    recording = encode_wav(speech_over_noise(2, 20, seed=2), SAMPLE_RATE)
+
+    response = upload(client, recording, format="ogg")
+
+    assert response.status_code == 200
+    name = response.get_json()["generated_speech_url"]
+    assert name.endswith(".ogg")
+    app_module.s3_uploader.wait_for_all(app_module.S3_BUCKET, [f"audio/{name}"], timeout=30)
+    assert app_module.s3_client.objects[(app_module.S3_BUCKET, f"audio/{name}")][:4] == b"OggS"
+
+
+def test_without_ffmpeg_everything_is_stored_as_wav(client, app_module, monkeypatch):
+    monkeypatch.setattr(audio_io.shutil, "which", lambda name: None)
+    recording = encode_wav(speech_over_noise(2, 20, seed=3), SAMPLE_RATE)
+
+    response = upload(client, recording, format="mp3")
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["generated_speech_url"].endswith(".wav") and body["input_audio_url"].endswith(".wav")
+    keys = [f"audio/{body['input_audio_url']}", f"audio/{body['generated_speech_url']}"]
+    app_module.s3_uploader.wait_for_all(app_module.S3_BUCKET, keys, timeout=30)
+    assert app_module.s3_client.objects[(app_module.S3_BUCKET, keys[0])] == recording
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+
+def save_records(client, user_id, count):
+    for index in range(count):
+        assert client.post('/save_metadata', json={"user_id": user_id, "index": index}).status_code == 200
+
+
+def test_pages_follow_the_cursor_to_the_end(client):
+    save_records(client, "pager", 5)
+
+    indexes = []
+    cursor = None
+    for _ in range(5):
+        query = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        body = client.get('/get_user_records/pager', query_string=query).get_json()
+        indexes += [record["index"] for record in body["user_records"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert indexes == [0, 1, 2, 3, 4]
+
+    # A page that ends exactly at the last record still points at an (empty) next page
+    body = client.get('/get_user_records/pager', query_string={"limit": 5}).get_json()
+    assert len(body["user_records"]) == 5
+    last = client.get('/get_user_records/pager', query_string={"limit": 5, "cursor": body["next_cursor"]})
+    assert last.get_json()["user_records"] == [] and last.get_json()["next_cursor"] is None
+
+
+def test_ndjson_ends_with_the_next_cursor_only_after_a_full_page(client):
+    save_records(client, "streamer", 3)
+
+    response = client.get('/get_user_records/streamer', query_string={"limit": 2, "format": "ndjson"})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.mimetype == 'application/x-ndjson'
+    assert [line["index"] for line in lines[:2]] == [0, 1]
+
+    response = client.get('/get_user_records/streamer',
+                          query_string={"limit": 2, "cursor": lines[2]["next_cursor"], "format": "ndjson"})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line.get("index") for line in lines] == [2]
+
+    response = client.get('/get_user_records/nobody', query_string={"limit": 2, "format": "ndjson"})
+    assert response.get_data(as_text=True) == ""
+
+
+@pytest.mark.parametrize("query", [{"limit": 0}, {"limit": -1}, {"limit": "ten"}, {"cursor": "abc"}])
+def test_invalid_limit_or_cursor_is_rejected(client, query):
+    save_records(client, "strict", 1)
+    response = client.get('/get_user_records/strict', query_string=query)
+    assert response.status_code == 400
+    assert client.get('/get_records_metadata', query_string=query).status_code == 400
@@ -0,0 +1,68 @@
+import os
+
+from recordings import SAMPLE_RATE, speech_over_noise, upload_form
+from utils.audio_io import encode_wav
+from utils.result_cache import ResultCache, cache_key
+
+
+def test_cache_key_depends_on_every_part():
+    assert cache_key("speech", "text", "digest") == cache_key("speech", "text", "digest")
+    assert cache_key("speech", "text", "digest") != cache_key("speech", "text", "other")
+    assert cache_key("a", "bc") != cache_key("ab", "c")
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(memory_mb=250 / 1024 / 1024, disk_mb=0, directory=str(tmp_path))
+    cache.put("a", b"x" * 100)
+    cache.put("b", b"y" * 100)
+    assert cache.get("a") == b"x" * 100
+    cache.put("c", b"z" * 100)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["memory_bytes"] == 200
+
+
+def test_disk_tier_survives_a_restart_and_is_promoted(tmp_path):
+    ResultCache(memory_mb=1, disk_mb=1, directory=str(tmp_path)).put_json("key", {"text": "hello"})
+
+    cache = ResultCache(memory_mb=1, disk_mb=1, directory=str(tmp_path))
+    assert cache.get_json("key") == {"text": "hello"}
+    assert cache.get_json("key") == {"text": "hello"}
+    assert cache.get("missing") is None
+
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_disk_tier_removes_evicted_files(tmp_path):
+    cache = ResultCache(memory_mb=0, disk_mb=250 / 1024 / 1024, directory=str(tmp_path))
+    for key in ("aa1", "bb2", "cc3"):
+        cache.put(key, b"x" * 100)
+
+    assert not os.path.exists(os.path.join(str(tmp_path), "aa", "aa1"))
+    assert cache.stats()["disk_entries"] == 2
+    assert cache.get("aa1") is None and cache.get("cc3") == b"x" * 100
+
+
+def test_resent_recording_skips_whisper_and_tts(client, app_module, monkeypatch):
+    recording = encode_wav(speech_over_noise(2, 20, seed=5), SAMPLE_RATE)
+    first = client.post('/process_audio', data=upload_form(recording, user_id="cached")).get_json()
+
+    calls = []
+    monkeypatch.setattr(app_module, "whisper_batcher_for", lambda name: calls.append("whisper"))
+    monkeypatch.setattr(app_module.synthesis_executor, "synthesize", lambda *args, **kwargs: calls.append("tts"))
+    hits = app_module.result_cache.stats()["memory_hits"]
+
+    second = client.post('/process_audio', data=upload_form(recording, user_id="cached")).get_json()
+
+    assert second["transcription"] == first["transcription"]
+    assert calls == []
+    assert app_module.result_cache.stats()["memory_hits"] == hits + 2
+    # The cached speech is still stored under the new request's own name
+    names = [first["generated_speech_url"], second["generated_speech_url"]]
+    keys = [f"audio/{name}" for name in names]
+    app_module.s3_uploader.wait_for_all(app_module.S3_BUCKET, keys, timeout=30)
+    objects = app_module.s3_client.objects
+    assert names[0] != names[1]
+    assert objects[(app_module.S3_BUCKET, keys[0])] == objects[(app_module.S3_BUCKET, keys[1])]
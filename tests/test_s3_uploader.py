@@ -0,0 +1,29 @@
+import threading
+import time
+
+from utils.s3_uploader import S3Uploader
+
+
+class SlowClient:
+    def __init__(self, release):
+        self.release = release
+
+    def upload_fileobj(self, fileobj, bucket_name, s3_key, ExtraArgs=None, Config=None):
+        self.release.wait(10)
+
+
+def test_wait_for_all_shares_one_deadline():
+    release = threading.Event()
+    uploader = S3Uploader(SlowClient(release), workers=4)
+    keys = [f"audio/{index}.wav" for index in range(4)]
+    for key in keys:
+        uploader.submit(b"data", "bucket", key)
+
+    start = time.monotonic()
+    uploader.wait_for_all("bucket", keys, timeout=0.3)
+    assert time.monotonic() - start < 0.6
+    assert all(uploader.is_pending("bucket", key) for key in keys)
+
+    release.set()
+    uploader.shutdown()
+    assert uploader.pending() == 0
@@ -0,0 +1,51 @@
+import types
+
+import numpy as np
+import torch
+
+from utils.speaker_cache import SpeakerLatentCache, compute_conditioning_latents
+
+
+class RecordingXtts:
+    """Records what the conditioning encoders were called with."""
+
+    def __init__(self, **config):
+        self.device = torch.device("cpu")
+        self.config = types.SimpleNamespace(**dict(
+            dict(max_ref_len=10, gpt_cond_len=12, gpt_cond_chunk_len=4, sound_norm_refs=False), **config
+        ))
+        self.calls = []
+
+    def get_speaker_embedding(self, wav, sample_rate):
+        self.calls.append(("speaker", wav.shape[-1], float(wav.abs().max())))
+        return torch.zeros(1, 512, 1)
+
+    def get_gpt_cond_latents(self, wav, sample_rate, length, chunk_length):
+        self.calls.append(("gpt", wav.shape[-1], length, chunk_length))
+        return torch.zeros(1, 32, 1024)
+
+
+def test_conditioning_follows_model_config():
+    model = RecordingXtts(max_ref_len=5, gpt_cond_len=3, gpt_cond_chunk_len=2, sound_norm_refs=True)
+    audio = np.full(16000 * 20, 0.1, dtype=np.float32)
+
+    compute_conditioning_latents(model, audio, 16000)
+
+    assert model.calls[0][:2] == ("speaker", 16000 * 5)
+    assert abs(model.calls[0][2] - 0.75) < 1e-6
+    assert model.calls[1] == ("gpt", 16000 * 5, 3, 2)
+
+
+def test_invalidate_user_keeps_the_current_reference():
+    model = RecordingXtts()
+    cache = SpeakerLatentCache(max_entries=4)
+    audio = np.zeros(16000, dtype=np.float32)
+    cache.get_latents(model, audio, 16000, "first", user_id="alice")
+
+    cache.invalidate_user("alice", keep="first")
+    assert cache.stats()["entries"] == 1
+
+    cache.invalidate_user("alice")
+    assert cache.stats()["entries"] == 0
+    cache.get_latents(model, audio, 16000, "first", user_id="alice")
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+
+from recordings import SAMPLE_RATE, continuous_noise
+from utils.streaming_asr import StreamingTranscriber
+
+
+class FakeWhisper:
+    """Answers with one segment per second of the window, numbered across calls."""
+
+    def __init__(self):
+        self.windows = []
+
+    def __call__(self, audio, initial_prompt):
+        self.windows.append(len(audio))
+        seconds = max(1, len(audio) // SAMPLE_RATE)
+        segments = [{"end": min((index + 1) * SAMPLE_RATE, len(audio)) / SAMPLE_RATE,
+                     "text": f" call{len(self.windows)}-{index}"} for index in range(seconds)]
+        return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+
+def utterance(speech_seconds, seed=0):
+    quiet = continuous_noise(1.0, seed=seed, level=0.005)
+    speech = continuous_noise(speech_seconds, seed=seed + 1, level=0.3)
+    return np.concatenate([quiet, speech, continuous_noise(1.5, seed=seed + 2, level=0.005)])
+
+
+def feed_in_frames(transcriber, audio, frame_seconds=0.1):
+    frame = int(frame_seconds * SAMPLE_RATE)
+    events = []
+    for start in range(0, len(audio), frame):
+        events.extend(transcriber.feed(audio[start:start + frame]))
+    return events
+
+
+def test_silence_is_never_decoded():
+    whisper = FakeWhisper()
+    transcriber = StreamingTranscriber(whisper)
+
+    assert feed_in_frames(transcriber, continuous_noise(5, level=0.005)) == []
+    assert transcriber.finish() == "" and whisper.windows == []
+
+
+def test_utterance_gives_partials_then_one_final():
+    whisper = FakeWhisper()
+    transcriber = StreamingTranscriber(whisper, step_seconds=0.5)
+
+    events = feed_in_frames(transcriber, utterance(3))
+
+    kinds = [kind for kind, _ in events]
+    assert kinds.count("final") == 1 and kinds[-1] == "final"
+    assert kinds.count("partial") >= 3
+    assert all(text for _, text in events)
+    # The final transcript ends with the last decode, made once the speaker paused
+    assert events[-1][1].split()[-1].startswith(f"call{len(whisper.windows)}-")
+
+
+def test_decoded_window_stays_bounded_on_long_speech():
+    whisper = FakeWhisper()
+    transcriber = StreamingTranscriber(whisper, window_seconds=5, step_seconds=1, holdback_seconds=1)
+
+    events = feed_in_frames(transcriber, utterance(30))
+
+    assert max(whisper.windows) <= 6 * SAMPLE_RATE
+    final = [text for kind, text in events if kind == "final"]
+    assert len(final) == 1
+    # Committed segments are kept in order in the final transcript
+    calls = [int(piece.split("-")[0][len("call"):]) for piece in final[0].split()]
+    assert calls == sorted(calls) and len(calls) > 10
+
+
+def test_finish_flushes_an_utterance_in_progress():
+    whisper = FakeWhisper()
+    transcriber = StreamingTranscriber(whisper, step_seconds=10)
+    feed_in_frames(transcriber, utterance(3)[:3 * SAMPLE_RATE])
+
+    assert transcriber.finish() == f"call{len(whisper.windows)}-0 call{len(whisper.windows)}-1"
+
+
+def received(socket, name, count=1, timeout=10):
+    """Collect events of one kind from the /transcribe namespace, waiting for count of them."""
+    events = []
+    deadline = time.time() + timeout
+    while len(events) < count and time.time() < deadline:
+        events += [event["args"][0] for event in socket.get_received("/transcribe") if event["name"] == name]
+        time.sleep(0.05)
+    return events
+
+
+def test_namespace_transcribes_a_live_stream(app_module):
+    socket = app_module.socketio.test_client(app_module.app, namespace="/transcribe")
+    rate = 48000
+    audio = np.repeat(utterance(3), rate // SAMPLE_RATE)
+    pcm = (audio * 32767).astype("<i2").tobytes()
+
+    socket.emit("start", {"sample_rate": rate}, namespace="/transcribe")
+    frame = rate // 10 * 2
+    for start in range(0, len(pcm), frame):
+        socket.emit("audio", pcm[start:start + frame], namespace="/transcribe")
+    socket.emit("stop", namespace="/transcribe")
+
+    final = received(socket, "final")
+    assert len(final) == 1 and final[0]["text"]
+    socket.disconnect(namespace="/transcribe")
+
+
+def test_namespace_rejects_audio_before_start(app_module):
+    socket = app_module.socketio.test_client(app_module.app, namespace="/transcribe")
+
+    socket.emit("audio", b"\0\0" * 1600, namespace="/transcribe")
+
+    assert received(socket, "error") == [{"error": "Send 'start' before streaming audio"}]
+    socket.disconnect(namespace="/transcribe")
@@ -0,0 +1,98 @@
+import random
+import statistics
+
+from utils.text_chunker import chunk_text
+
+WORDS = ("the", "patient", "said", "that", "speech", "therapy", "helps", "every", "morning", "with",
+         "breathing", "exercises", "and", "reading", "aloud", "slowly", "before", "lunch")
+
+
+def transcript(n_words, seed=0):
+    rng = random.Random(seed)
+    sentences = []
+    count = 0
+    while count < n_words:
+        length = rng.randint(4, 40)
+        words = [rng.choice(WORDS) for _ in range(length)]
+        for position in range(6, length - 3, rng.randint(6, 12)):
+            words[position] += ","
+        sentences.append(" ".join(words).capitalize() + ".")
+        count += length
+    return " ".join(sentences)
+
+
+def test_chunks_respect_limit_and_keep_all_words():
+    text = transcript(3000)
+    chunks = chunk_text(text, 250)
+    assert all(len(chunk) <= 250 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_short_tail_is_rebalanced():
+    # A greedy split leaves "Three is short." on its own
+    sentences = ["One " + "word " * 45 + "end.", "Two " + "word " * 45 + "end.", "Three is short."]
+    chunks = chunk_text(" ".join(sentences), 250)
+
+    assert len(chunks) == 2
+    lengths = [len(chunk) for chunk in chunks]
+    assert min(lengths) >= 0.5 * max(lengths)
+
+
+def test_tail_chunk_is_not_short():
+    for seed in range(20):
+        lengths = [len(chunk) for chunk in chunk_text(transcript(500, seed), 250)]
+        assert lengths[-1] >= 0.6 * statistics.mean(lengths), (seed, lengths)
+
+
+def greedy_chunk_count(text, max_length):
+    count = length = 0
+    for word in text.split():
+        if length and length + 1 + len(word) <= max_length:
+            length += 1 + len(word)
+        else:
+            count += 1
+            length = len(word)
+    return count
+
+
+def test_as_few_chunks_as_greedy_packing_and_balanced():
+    text = transcript(10000)
+    chunks = chunk_text(text, 250)
+    lengths = [len(chunk) for chunk in chunks]
+    assert len(chunks) == greedy_chunk_count(text, 250)
+    assert statistics.pstdev(lengths) < 0.05 * statistics.mean(lengths)
+
+
+def test_cuts_at_sentence_ends_when_the_count_allows():
+    sentences = [("Word " * 22).strip() + "." for _ in range(5)]
+    text = " ".join(sentences)
+    chunks = chunk_text(text, 250)
+    # Greedy packing cuts the third sentence mid-phrase
+    assert len(chunks) == greedy_chunk_count(text, 250) == 3
+    assert [chunk[-1] for chunk in chunks] == [".", ".", "."]
+
+
+def test_clause_is_preferred_over_a_mid_phrase_cut():
+    text = ("word " * 25 + "pause, " + "word " * 25 + "end.").strip()
+    chunks = chunk_text(text, 250)
+    assert len(chunks) == 2 and chunks[0].endswith("pause,")
+
+
+def test_tokenizer_only_sees_chunks_within_the_character_limit():
+    seen = []
+
+    def count_tokens(chunk):
+        seen.append(chunk)
+        return len(chunk.split()) * 3
+
+    text = transcript(500) + " " + "x" * 300 + " tail."
+    chunks = chunk_text(text, 250, count_tokens, max_tokens=60)
+    assert all(len(chunk) <= 250 or " " not in chunk for chunk in seen)
+    assert all(count_tokens(chunk) <= 60 or " " not in chunk for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_long_sentence_is_cut_evenly():
+    chunks = chunk_text("word " * 120 + "end.", 250)
+    lengths = [len(chunk) for chunk in chunks]
+    assert len(chunks) == 3 and max(lengths) - min(lengths) <= 10
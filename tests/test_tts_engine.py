@@ -0,0 +1,74 @@
+import threading
+import time
+import types
+
+import numpy as np
+
+from utils.tts_engine import SynthesisExecutor, concatenate_wavs, inference_settings
+
+
+class RecordingXtts:
+    def __init__(self):
+        self.config = types.SimpleNamespace(temperature=0.75, length_penalty=1.0, repetition_penalty=5.0,
+                                            top_k=50, top_p=0.85, enable_text_splitting=True, max_ref_len=10)
+        self.calls = []
+
+    def inference(self, text, language, gpt_cond_latent, speaker_embedding, **settings):
+        self.calls.append(settings)
+        return {"wav": np.ones(len(text), dtype=np.float32)}
+
+
+def test_inference_settings_merge_request_options_over_config():
+    settings = inference_settings(RecordingXtts(), {"temperature": 0.3, "speed": 1.2})
+    assert settings == {"temperature": 0.3, "length_penalty": 1.0, "repetition_penalty": 5.0, "top_k": 50,
+                        "top_p": 0.85, "enable_text_splitting": True, "speed": 1.2}
+
+
+def test_executor_passes_config_sampling_settings():
+    model = RecordingXtts()
+    executor = SynthesisExecutor(lambda: model)
+
+    wav = executor.synthesize(["ab", "cde"], None, None, options={"top_k": 10})
+
+    assert len(wav) == 5
+    assert model.calls == [inference_settings(model, {"top_k": 10})] * 2
+
+
+def test_waiting_requests_run_shortest_first():
+    model = RecordingXtts()
+    started = threading.Event()
+    release = threading.Event()
+    inference = model.inference
+
+    def blocking_inference(text, *args, **kwargs):
+        if text == "first":
+            started.set()
+            release.wait(10)
+        return inference(text, *args, **kwargs)
+
+    model.inference = blocking_inference
+    executor = SynthesisExecutor(lambda: model)
+    order = []
+
+    def request(chunks):
+        executor.synthesize(chunks, None, None, on_chunk=lambda index, wav: order.append(chunks[index]))
+
+    threads = [threading.Thread(target=request, args=(["first"],))]
+    threads[0].start()
+    assert started.wait(10)
+    # Queued while the worker is busy: the long request arrives before the short one
+    for chunks in (["long " * 40, "long " * 40], ["short"]):
+        threads.append(threading.Thread(target=request, args=(chunks,)))
+        threads[-1].start()
+        while executor.depth() < len(threads) - 1:
+            time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert order == ["first", "short", "long " * 40, "long " * 40]
+
+
+def test_concatenate_wavs():
+    joined = concatenate_wavs([np.zeros(2, dtype=np.float32), np.ones(3, dtype=np.float32)])
+    assert joined.tolist() == [0, 0, 1, 1, 1]
@@ -0,0 +1,77 @@
+import io
+import time
+import wave
+
+from recordings import SAMPLE_RATE, speech_over_noise, upload_form
+from utils.audio_io import encode_wav
+
+
+def connect(app_module):
+    socket = app_module.socketio.test_client(app_module.app)
+    return socket, app_module.socketio.server.manager.sid_from_eio_sid(socket.eio_sid, "/")
+
+
+def events(socket, name):
+    return [event["args"][0] for event in socket.get_received() if event["name"] == name]
+
+
+def frames(wav_bytes):
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wav_file:
+        return wav_file.getframerate(), wav_file.readframes(wav_file.getnframes())
+
+
+def test_chunks_are_streamed_in_order_and_add_up_to_the_output(client, app_module):
+    socket, sid = connect(app_module)
+    recording = encode_wav(speech_over_noise(40, 20, seed=6), SAMPLE_RATE)
+
+    body = client.post('/process_audio', data=upload_form(recording, stream_sid=sid)).get_json()
+    keys = [f"audio/{body['input_audio_url']}", f"audio/{body['generated_speech_url']}"]
+    app_module.s3_uploader.wait_for_all(app_module.S3_BUCKET, keys, timeout=30)
+
+    received = socket.get_received()
+    chunks = [event["args"][0] for event in received if event["name"] == "tts_chunk"]
+    assert len(chunks) > 1
+    assert [chunk["index"] for chunk in chunks] == list(range(len(chunks)))
+    assert all(chunk["total"] == len(chunks) for chunk in chunks)
+
+    # The streamed chunks are the generated speech, piece by piece
+    output_rate, output = frames(app_module.s3_client.objects[(app_module.S3_BUCKET, keys[1])])
+    streamed = [frames(chunk["audio"]) for chunk in chunks]
+    assert {rate for rate, _ in streamed} == {output_rate} == {chunks[0]["sample_rate"]}
+    assert b"".join(data for _, data in streamed) == output
+
+    done = [event["args"][0] for event in received if event["name"] == "tts_done"]
+    assert done == [{"transcription": body["transcription"], "generated_speech_url": body["generated_speech_url"]}]
+    # upload_done is sent from the upload thread, possibly just after the object landed
+    uploads = [event["args"][0] for event in received if event["name"] == "upload_done"]
+    deadline = time.time() + 10
+    while len(uploads) < 2 and time.time() < deadline:
+        time.sleep(0.05)
+        uploads += events(socket, "upload_done")
+    assert sorted(upload["file"] for upload in uploads) == sorted([body["input_audio_url"], body["generated_speech_url"]])
+    assert {upload["status"] for upload in uploads} == {"uploaded"}
+    socket.disconnect()
+
+
+def test_pipelined_chunks_are_streamed_without_a_total(client, app_module):
+    socket, sid = connect(app_module)
+    recording = encode_wav(speech_over_noise(40, 20, seed=8), SAMPLE_RATE)
+
+    response = client.post('/process_audio', data=upload_form(recording, stream_sid=sid, pipelined="true"))
+
+    assert response.status_code == 200
+    chunks = events(socket, "tts_chunk")
+    assert len(chunks) > 1
+    assert [chunk["index"] for chunk in chunks] == list(range(len(chunks)))
+    assert all(chunk["total"] is None for chunk in chunks)
+    socket.disconnect()
+
+
+def test_nothing_is_streamed_without_a_stream_sid(client, app_module):
+    socket, _ = connect(app_module)
+    recording = encode_wav(speech_over_noise(10, 20, seed=9), SAMPLE_RATE)
+
+    assert client.post('/process_audio', data=upload_form(recording)).status_code == 200
+
+    assert events(socket, "tts_chunk") == [] and events(socket, "tts_done") == []
+    socket.disconnect()
@@ -0,0 +1,67 @@
+import json
+import multiprocessing
+
+from utils.user_storage import UserStore
+
+
+def open_store(tmp_path, flush_seconds=3600):
+    return UserStore(str(tmp_path / "user_details.json"), str(tmp_path / "user_details.json.journal"),
+                     flush_seconds=flush_seconds)
+
+
+def test_journal_is_replayed_over_the_snapshot(tmp_path):
+    (tmp_path / "user_details.json").write_text(json.dumps({"user-a": {"name": "old"}, "user-b": {"name": "b"}}))
+    (tmp_path / "user_details.json.journal").write_text(
+        json.dumps({"user_id": "user-a", "details": {"name": "new"}}) + "\n"
+        + json.dumps({"user_id": "user-c", "details": {"name": "c"}}) + "\n"
+        + '{"user_id": "user-d", "deta'  # torn by a crash
+    )
+
+    store = open_store(tmp_path)
+
+    assert store.snapshot() == {"user-a": {"name": "new"}, "user-b": {"name": "b"}, "user-c": {"name": "c"}}
+
+
+def test_other_processes_changes_are_picked_up(tmp_path):
+    writer = open_store(tmp_path)
+    reader = open_store(tmp_path)
+    assert reader.get("user-a") is None
+
+    writer.put("user-a", {"name": "a"})
+    assert reader.get("user-a") == {"name": "a"}
+
+    writer.flush()
+    assert json.loads((tmp_path / "user_details.json").read_text()) == {"user-a": {"name": "a"}}
+    assert (tmp_path / "user_details.json.journal").read_text() == ""
+    writer.replace_all({"user-b": {"name": "b"}})
+    assert reader.get("user-a") is None and reader.get("user-b") == {"name": "b"}
+
+
+def test_a_store_that_never_wrote_does_not_flush(tmp_path):
+    store = open_store(tmp_path)
+    store.get("user-a")
+    store.flush()
+    assert sorted(path.name for path in tmp_path.iterdir()) == []
+
+
+def write_users(tmp_path, worker, count):
+    store = open_store(tmp_path)
+    for index in range(count):
+        store.put(f"user-{worker}-{index}", {"worker": worker, "index": index})
+        if index % 10 == 9:
+            store.flush()
+    store.flush()
+
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    context = multiprocessing.get_context("fork")
+    writers = [context.Process(target=write_users, args=(tmp_path, worker, 40)) for worker in range(4)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(60)
+        assert writer.exitcode == 0
+
+    data = open_store(tmp_path).snapshot()
+    assert len(data) == 160
+    assert json.loads((tmp_path / "user_details.json").read_text()) == data
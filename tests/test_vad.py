@@ -0,0 +1,25 @@
+import numpy as np
+
+from recordings import SAMPLE_RATE, speech_over_noise
+from utils.vad import speech_spans, split_on_silence
+
+
+def test_split_on_silence_cuts_in_pauses():
+    speech = speech_over_noise(75, snr_db=30)
+    windows = split_on_silence(speech, SAMPLE_RATE, max_seconds=30)
+    assert len(windows) >= 3
+    assert all(end - start <= 30 * SAMPLE_RATE for start, end in windows)
+    assert all(previous[1] <= start for previous, (start, _) in zip(windows, windows[1:]))
+
+
+def test_split_on_silence_low_snr_covers_whole_recording():
+    audio = speech_over_noise(75, snr_db=9.5)
+    # The energy VAD does not hear speech this close to the noise floor
+    assert speech_spans(audio, SAMPLE_RATE) == []
+
+    windows = split_on_silence(audio, SAMPLE_RATE, max_seconds=30)
+    assert windows == [(0, 30 * SAMPLE_RATE), (30 * SAMPLE_RATE, 60 * SAMPLE_RATE), (60 * SAMPLE_RATE, len(audio))]
+
+
+def test_split_on_silence_empty_audio():
+    assert split_on_silence(np.zeros(0, dtype=np.float32), SAMPLE_RATE) == []
@@ -0,0 +1,21 @@
+from whisper.tokenizer import get_tokenizer
+
+from utils.whisper_batcher import _segments
+
+
+def timestamp(tokenizer, seconds):
+    return tokenizer.timestamp_begin + round(seconds / 0.02)
+
+
+def test_segments_follow_timestamp_tokens():
+    tokenizer = get_tokenizer(True, language="en", task="transcribe")
+    tokens = ([timestamp(tokenizer, 0.0)] + tokenizer.encode(" Hello there.") + [timestamp(tokenizer, 2.4)]
+              + [timestamp(tokenizer, 2.4)] + tokenizer.encode(" How are you?") + [timestamp(tokenizer, 5.0)]
+              + [timestamp(tokenizer, 6.0)] + tokenizer.encode(" Cut off"))
+
+    segments = _segments(tokens, tokenizer, duration=7.5)
+
+    assert [(segment["start"], segment["end"], segment["text"]) for segment in segments] == [
+        (0.0, 2.4, " Hello there."), (2.4, 5.0, " How are you?"), (6.0, 7.5, " Cut off")
+    ]
+    assert [segment["id"] for segment in segments] == [0, 1, 2]
@@ -1,17 +1,28 @@
 import os
-import tempfile
-import whisper
+import threading
 import time
-import psutil
 from flask_cors import CORS
-from flask import Flask, request, jsonify, send_file
-from flask_socketio import SocketIO, emit
-from TTS.api import TTS
-from pydub import AudioSegment
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
+from flask_socketio import SocketIO
+from utils.streaming_asr import TranscriptionNamespace
+from utils.inference_backend import select_device, configure_threads, load_whisper, load_tts
+from utils.model_registry import ModelRegistry, load_tiers
+from utils.text_chunker import chunk_text, xtts_limits
+from utils.audio_io import (negotiate_format, available_formats, format_for_extension, decode_audio, resample,
+                            AUDIO_FORMATS, TARGET_SAMPLE_RATE)
+from utils.vad import trim_silence, reference_window, VAD_TRIM
+from utils.speaker_cache import compute_conditioning_latents, reference_sample_rate
+from utils.tts_engine import inference_settings
+from utils.artifacts import ArtifactStore
+from utils.metrics import registry as metrics_registry, stage, install_request_metrics, register_process_metrics
 #=============================================================================================
 app = Flask(__name__, static_folder="./build", static_url_path="/")
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
+# Request and stage latency histograms plus process metrics on /metrics; send X-Trace: 1
+# to get a request's stage breakdown back in Server-Timing
+install_request_metrics(app)
+register_process_metrics()
 #=============================================================================================
 
 # Track load times
@@ -20,40 +31,71 @@ tts_load_time = 0
 total_load_time = 0
 #=============================================================================================
 
+# Inference device (CUDA with CPU fallback) and the latency tiers; this server defaults
+# to the "balanced" tier, i.e. large-v3-turbo on GPU
+INFERENCE_DEVICE = select_device()
+configure_threads()
+MODEL_TIERS = load_tiers(INFERENCE_DEVICE, os.getenv("WHISPER_MODEL", "large-v3"))
+TURBO_DEFAULT_TIER = os.getenv("TURBO_DEFAULT_TIER", "balanced")
+# Encoding of generated speech: wav, opus, mp3 or flac
+OUTPUT_AUDIO_FORMAT = os.getenv("OUTPUT_AUDIO_FORMAT", "wav")
+default_whisper_name = MODEL_TIERS[TURBO_DEFAULT_TIER]["whisper"]
+
 # Measure Whisper model load time
 load_start_whisper = time.time()
-whisper_model = whisper.load_model("large-v3")
+whisper_model = load_whisper(default_whisper_name, INFERENCE_DEVICE)
 whisper_load_time = time.time() - load_start_whisper
 print(f"Whisper model loaded successfully in {whisper_load_time:.2f} seconds.")
 
 # Measure TTS model load time
 load_start_tts = time.time()
-tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2", gpu=True)
+tts = load_tts("tts_models/multilingual/multi-dataset/xtts_v2", INFERENCE_DEVICE)
 tts_load_time = time.time() - load_start_tts
 print(f"TTS model loaded successfully in {tts_load_time:.2f} seconds.")
 
 # Calculate total model load time
 total_load_time = whisper_load_time + tts_load_time
 print(f"Total time taken to load models: {total_load_time:.2f} seconds.")
-#=============================================================================================
 
-def chunk_text(text, max_length=250):
-    """Helper function to split text into chunks of a maximum character length."""
-    words = text.split()
-    chunks = []
-    current_chunk = []
+# Models of the other tiers are paged in on demand under MODEL_MEMORY_BUDGET_MB
+whisper_models = ModelRegistry(
+    lambda name: whisper_model if name == default_whisper_name else load_whisper(name, INFERENCE_DEVICE),
+    pinned=[default_whisper_name]
+)
+
+# Whisper is shared by HTTP requests and live streams, one decode at a time
+whisper_lock = whisper_models.lock(default_whisper_name)
+socketio.on_namespace(TranscriptionNamespace('/transcribe', lambda: whisper_model, whisper_lock))
 
-    for word in words:
-        if len(" ".join(current_chunk + [word])) <= max_length:
-            current_chunk.append(word)
-        else:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [word]
+# Generated speech: one uniquely named file per request, removed after ARTIFACT_TTL_SECONDS
+artifacts = ArtifactStore()
+artifacts.start_sweeper()
 
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
+metrics_registry.gauge("speech_model_load_seconds", "Time the startup models took to load",
+                       lambda: [({"model": "Whisper model"}, whisper_load_time), ({"model": "TTS model"}, tts_load_time)])
+metrics_registry.gauge("speech_whisper_model_bytes", "Memory held by each loaded Whisper model",
+                       lambda: [({"model": name}, size) for name, size in whisper_models.status()["loaded"].items()])
+#=============================================================================================
 
-    return chunks
+def synthesize_to_artifact(writer, text_chunks, gpt_cond_latent, speaker_embedding, language, inference, trace=None):
+    """Helper function to synthesize the chunks one after another into an artifact with the speaker's conditioning."""
+    try:
+        settings = inference_settings(tts.synthesizer.tts_model, inference)
+        for chunk in text_chunks:
+            with stage("tts_chunk", trace):
+                output = tts.synthesizer.tts_model.inference(
+                    text=chunk,
+                    language=language,
+                    gpt_cond_latent=gpt_cond_latent,
+                    speaker_embedding=speaker_embedding,
+                    **settings
+                )
+            writer.write(output["wav"])
+    except Exception as e:
+        writer.abort(e)
+        raise
+    with stage("export", trace):
+        writer.close()
 #=============================================================================================
 
 # Route to Home Page
@@ -71,23 +113,47 @@ def hello_world():
 def process_audio():
     """Combined endpoint for transcribing and generating speech using the same uploaded audio for cloning."""
     
-    if 'audio' not in request.files:
-        return jsonify({"error": "No audio file uploaded"}), 400
+    # Parsing the form receives the whole upload
+    with stage("upload_receive", g.trace):
+        if 'audio' not in request.files:
+            return jsonify({"error": "No audio file uploaded"}), 400
+        audio_bytes = request.files['audio'].read()
     
-    audio_file = request.files['audio']
+    tier = request.form.get('tier', TURBO_DEFAULT_TIER)  # fast / balanced / accurate
+    language = request.form.get('language', 'en')
+    stream = request.form.get('stream', 'false').lower() in ('1', 'true', 'yes')
+    if tier not in MODEL_TIERS:
+        return jsonify({"error": f"Unknown tier '{tier}', expected one of {sorted(MODEL_TIERS)}"}), 400
+    settings = MODEL_TIERS[tier]
+    # The 'format' field, else an audio type in the Accept header, else OUTPUT_AUDIO_FORMAT
+    output_format = negotiate_format(request.form.get('format'), [value for value, _ in request.accept_mimetypes],
+                                     OUTPUT_AUDIO_FORMAT)
+    if output_format is None:
+        return jsonify({"error": f"Unknown format '{request.form.get('format')}', expected one of {sorted(AUDIO_FORMATS)}"}), 400
 
     try:
         # Measure total response time
         response_start_time = time.time()
 
-        # Save the uploaded audio file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_audio_file:
-            tmp_audio_file.write(audio_file.read())
-            tmp_audio_path = tmp_audio_file.name
+        # Decode the upload once, at the rate XTTS conditions on (22.05 kHz mono, ffmpeg resamples
+        # in the same pass); Whisper gets a 16 kHz copy, the speaker encoder the full band
+        reference_rate = reference_sample_rate(tts.synthesizer.tts_model)
+        with stage("decode", g.trace):
+            full_band = decode_audio(audio_bytes, reference_rate)
+
+        # Drop silent spans before Whisper and pick a clean stretch of speech for cloning
+        with stage("vad", g.trace):
+            if VAD_TRIM:
+                full_band, _ = trim_silence(full_band, reference_rate)
+            reference = reference_window(full_band, reference_rate)
+        with stage("resample", g.trace):
+            audio = resample(full_band, reference_rate, TARGET_SAMPLE_RATE)
 
         # Measure transcription time (Whisper)
         transcription_start_time = time.time()
-        result = whisper_model.transcribe(tmp_audio_path, language='en')
+        model = whisper_models.get(settings["whisper"])
+        with whisper_models.lock(settings["whisper"]), stage("whisper", g.trace):
+            result = model.transcribe(audio, language=language, **settings["decode"])
         transcription_text = result['text'].strip()
         transcription_time = time.time() - transcription_start_time
         print(f"Transcription completed in {transcription_time:.2f} seconds.")
@@ -95,39 +161,46 @@ def process_audio():
         # Print the transcription before sending to TTS
         print("Transcription from Whisper:", transcription_text)
 
-        # Split the transcription into chunks if it exceeds the character limit
-        text_chunks = chunk_text(transcription_text, max_length=250)
+        # Split the transcription into the fewest evenly sized chunks within the XTTS limits, cut at sentence ends where possible
+        count_tokens, max_tokens, char_limit = xtts_limits(tts.synthesizer.tts_model, language)
+        max_chunk_length = settings["tts"].get("max_chunk_length", 250)
+        text_chunks = chunk_text(transcription_text, min(max_chunk_length, char_limit or max_chunk_length),
+                                 count_tokens, max_tokens)
 
-        # Create an empty AudioSegment object to concatenate all chunks
-        final_audio = AudioSegment.silent(duration=0)
+        # Condition XTTS on the reference once for all chunks
+        with stage("speaker_latents", g.trace):
+            gpt_cond_latent, speaker_embedding = compute_conditioning_latents(
+                tts.synthesizer.tts_model, reference, reference_rate
+            )
 
-        # Measure TTS generation time
-        tts_start_time = time.time()
+        # Synthesize into a uniquely named artifact that can be downloaded while it is written
+        writer = artifacts.create(output_format, tts.synthesizer.output_sample_rate)
+        download_url = request.host_url + 'download/' + writer.name
+        inference = settings["tts"].get("inference", {})
 
-        # Process each chunk separately using TTS
-        for idx, chunk in enumerate(text_chunks):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f"_part_{idx}.wav") as tmp_output_file:
-                tts.tts_to_file(
-                    text=chunk,
-                    file_path=tmp_output_file.name,
-                    speaker_wav=tmp_audio_path,  # Use the uploaded audio for voice cloning
-                    language="en"
-                )
-                
-                # Load the generated chunk audio and append it to the final audio
-                chunk_audio = AudioSegment.from_wav(tmp_output_file.name)
-                final_audio += chunk_audio
+        if stream:
+            # Hand out the URL right away; the download follows the file as chunks are added
+            threading.Thread(
+                target=synthesize_to_artifact,
+                args=(writer, text_chunks, gpt_cond_latent, speaker_embedding, language, inference),
+                name=f"synthesize-{writer.name}",
+                daemon=True
+            ).start()
+            return jsonify({
+                "transcription": transcription_text,
+                "tier": tier,
+                "output_format": output_format,
+                "streaming": True,
+                "transcription_time": f"{transcription_time:.2f} seconds",
+                "generated_speech_url": download_url
+            })
 
+        # Measure TTS generation time
+        tts_start_time = time.time()
+        synthesize_to_artifact(writer, text_chunks, gpt_cond_latent, speaker_embedding, language, inference, g.trace)
         tts_generation_time = time.time() - tts_start_time
         print(f"TTS generation completed in {tts_generation_time:.2f} seconds.")
 
-        # Save the final concatenated audio to a new file
-        combined_output_path = os.path.join(tempfile.gettempdir(), "combined_output.wav")
-        final_audio.export(combined_output_path, format="wav")
-
-        # Clean up temporary files
-        os.remove(tmp_audio_path)
-
         # Measure total response time
         total_response_time = time.time() - response_start_time
         print(f"Total time taken to generate response: {total_response_time:.2f} seconds.")
@@ -135,10 +208,13 @@ def process_audio():
         # Return the transcription and the generated speech file
         return jsonify({
             "transcription": transcription_text,
+            "tier": tier,
+            "output_format": output_format,
+            "streaming": False,
             "transcription_time": f"{transcription_time:.2f} seconds",
             "tts_generation_time": f"{tts_generation_time:.2f} seconds",
             "total_response_time": f"{total_response_time:.2f} seconds",
-            "generated_speech_url": request.host_url + 'download/' + os.path.basename(combined_output_path)
+            "generated_speech_url": download_url
         })
 
     except Exception as e:
@@ -147,17 +223,41 @@ def process_audio():
 
 @app.route('/download/<filename>', methods=['GET'])
 def download_generated_audio(filename):
-    """Endpoint to download the generated speech audio file."""
-    file_path = os.path.join(tempfile.gettempdir(), filename)
-    
-    if os.path.exists(file_path):
-        return send_file(file_path, mimetype='audio/wav', as_attachment=True, download_name=filename)
-    else:
+    """Endpoint to download the generated speech audio file.
+
+    The encoding is negotiated: ?format=opus|mp3|flac|wav or the Accept header; other
+    encodings are converted once and kept next to the file. Finished files support
+    Range and conditional (ETag / If-None-Match) requests; files still being
+    synthesized are streamed with chunked transfer encoding as they grow."""
+    if not artifacts.exists(filename):
         return jsonify({"error": "File not found"}), 404
+
+    stored_format = format_for_extension(filename) or "wav"
+    wanted_format = negotiate_format(request.args.get('format'), [value for value, _ in request.accept_mimetypes],
+                                     stored_format, available_formats(stored_format))
+    if wanted_format is None:
+        return jsonify({"error": f"Unknown format '{request.args.get('format')}'"}), 400
+    spec = AUDIO_FORMATS[wanted_format]
+
+    if wanted_format == stored_format and artifacts.in_progress(filename):
+        response = Response(stream_with_context(artifacts.stream(filename)), mimetype=spec['content_type'], headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Cache-Control": "no-store"
+        })
+    else:
+        if wanted_format != stored_format:
+            # Conversion needs the complete file
+            if not artifacts.wait(filename):
+                return jsonify({"error": "Speech generation failed"}), 500
+            filename = artifacts.variant(filename, wanted_format)
+        response = send_file(artifacts.path(filename), mimetype=spec['content_type'], as_attachment=True,
+                             download_name=filename, conditional=True, etag=True)
+    response.headers["Vary"] = "Accept"
+    return response
 #=============================================================================================
 
 if __name__ == '__main__':
-    app.run(debug=False, host='0.0.0.0', port=5050)
+    socketio.run(app, debug=False, host='0.0.0.0', port=5050, allow_unsafe_werkzeug=True)
 
 # if __name__ == '__main__':
 #     # Specify the paths to your SSL certificate and key files
@@ -0,0 +1,247 @@
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from utils.audio_io import AUDIO_FORMATS, transcode
+
+# Where generated files are kept and for how long
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "speech-artifacts"))
+ARTIFACT_TTL_SECONDS = float(os.getenv("ARTIFACT_TTL_SECONDS", "3600"))
+ARTIFACT_SWEEP_SECONDS = float(os.getenv("ARTIFACT_SWEEP_SECONDS", "300"))
+
+ARTIFACT_NAME_PATTERN = re.compile(r'^[0-9a-f]{32}\.(' + '|'.join(
+    spec["extension"] for spec in AUDIO_FORMATS.values()) + r')$')
+
+
+class ArtifactWriter:
+    """
+    Writes one generated file progressively, so it can be downloaded while synthesis runs.
+
+    WAV is written directly (the header sizes are patched on close); the other
+    formats go through a streaming ffmpeg encoder whose output is appended to
+    the file as it is produced.
+    """
+
+    def __init__(self, store, name, audio_format, sample_rate):
+        self.store = store
+        self.name = name
+        self.audio_format = audio_format
+        self.sample_rate = sample_rate
+        self.path = store.path(name)
+        self._file = open(self.path, 'wb')
+        self._encoder = None
+        self._copier = None
+        self._data_bytes = 0
+
+        if audio_format == "wav":
+            self._file.write(self._wav_header(0xFFFFFFFF - 36))
+            self._file.flush()
+        else:
+            command = [
+                "ffmpeg", "-loglevel", "error", "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0"
+            ] + AUDIO_FORMATS[audio_format]["codec"]
+            if AUDIO_FORMATS[audio_format]["bitrate"]:
+                command += ["-b:a", AUDIO_FORMATS[audio_format]["bitrate"]]
+            command.append("pipe:1")
+            self._encoder = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            self._copier = threading.Thread(target=self._copy_encoded, name=f"encode-{name}", daemon=True)
+            self._copier.start()
+
+    def _wav_header(self, data_size):
+        header = bytearray(b"RIFF")
+        header += (min(data_size + 36, 0xFFFFFFFF)).to_bytes(4, "little") + b"WAVEfmt "
+        header += (16).to_bytes(4, "little") + (1).to_bytes(2, "little") + (1).to_bytes(2, "little")
+        header += self.sample_rate.to_bytes(4, "little") + (self.sample_rate * 2).to_bytes(4, "little")
+        header += (2).to_bytes(2, "little") + (16).to_bytes(2, "little")
+        header += b"data" + data_size.to_bytes(4, "little")
+        return bytes(header)
+
+    def _copy_encoded(self):
+        for block in iter(lambda: self._encoder.stdout.read1(65536), b""):
+            self._file.write(block)
+            self._file.flush()
+            self.store.notify(self.name)
+
+    def write(self, wav):
+        """Append float32 samples."""
+        pcm = (np.clip(np.asarray(wav, dtype=np.float32), -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        if self._encoder is not None:
+            self._encoder.stdin.write(pcm)
+            self._encoder.stdin.flush()
+        else:
+            self._file.write(pcm)
+            self._file.flush()
+            self._data_bytes += len(pcm)
+            self.store.notify(self.name)
+
+    def close(self):
+        """Finish the file and tell waiting downloads it is complete."""
+        try:
+            if self._encoder is not None:
+                self._encoder.stdin.close()
+                self._copier.join()
+                if self._encoder.wait() != 0:
+                    raise RuntimeError(f"ffmpeg failed to encode {self.name}")
+            else:
+                self._file.seek(0)
+                self._file.write(self._wav_header(self._data_bytes))
+            self._file.close()
+            self.store.finish(self.name)
+        except Exception as e:
+            self.abort(e)
+            raise
+
+    def abort(self, error=None):
+        """Give up on the file; it is removed and downloads in progress stop."""
+        if self._encoder is not None and self._encoder.poll() is None:
+            self._encoder.kill()
+        if not self._file.closed:
+            self._file.close()
+        self.store.finish(self.name, failed=True)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        print(f"Discarded artifact {self.name}: {error}")
+
+
+class ArtifactStore:
+    """
+    Per-request output files in ARTIFACT_DIR with unique names.
+
+    Files being written are tracked so stream() can follow them as they grow.
+    A sweeper thread deletes files older than ARTIFACT_TTL_SECONDS.
+    """
+
+    def __init__(self, directory=ARTIFACT_DIR, ttl=ARTIFACT_TTL_SECONDS):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self._writing = {}
+        self._failed = set()
+        self._condition = threading.Condition()
+        self._sweeper = None
+        self._sweep_interval = None
+        self._sweeper_pid = None
+
+    def new_name(self, audio_format):
+        return f"{uuid.uuid4().hex}.{AUDIO_FORMATS[audio_format]['extension']}"
+
+    def path(self, name):
+        """Path of an artifact; raises ValueError for names that are not ours (no path traversal)."""
+        if not ARTIFACT_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid artifact name: {name}")
+        return os.path.join(self.directory, name)
+
+    def create(self, audio_format, sample_rate):
+        """Start a new artifact and return its writer."""
+        name = self.new_name(audio_format)
+        with self._condition:
+            self._writing[name] = True
+            # Started before a fork (preloaded app): the sweeper thread stayed in the parent
+            if self._sweep_interval is not None and self._sweeper_pid != os.getpid():
+                self.start_sweeper(self._sweep_interval)
+        return ArtifactWriter(self, name, audio_format, sample_rate)
+
+    def notify(self, name):
+        with self._condition:
+            self._condition.notify_all()
+
+    def finish(self, name, failed=False):
+        with self._condition:
+            self._writing.pop(name, None)
+            if failed:
+                self._failed.add(name)
+            self._condition.notify_all()
+
+    def in_progress(self, name):
+        with self._condition:
+            return name in self._writing
+
+    def exists(self, name):
+        try:
+            path = self.path(name)
+        except ValueError:
+            return False
+        return os.path.exists(path) or self.in_progress(name)
+
+    def wait(self, name, timeout=None):
+        """Block until the artifact is complete; return False if it failed or the wait timed out."""
+        with self._condition:
+            finished = self._condition.wait_for(lambda: name not in self._writing, timeout)
+            return finished and name not in self._failed
+
+    def stream(self, name, block_size=65536, idle_timeout=60):
+        """Yield the artifact's bytes, following the file while it is still being written."""
+        with open(self.path(name), 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if block:
+                    yield block
+                    continue
+                with self._condition:
+                    if name not in self._writing:
+                        # Written completely (or aborted); drain whatever is left
+                        for rest in iter(lambda: f.read(block_size), b""):
+                            yield rest
+                        return
+                    if not self._condition.wait(idle_timeout):
+                        return
+
+    def variant(self, name, audio_format):
+        """
+        Return the name of the artifact converted to another format, creating it once.
+        Variants share the artifact's id, so they expire with it.
+        """
+        base, _ = os.path.splitext(name)
+        variant_name = f"{base}.{AUDIO_FORMATS[audio_format]['extension']}"
+        variant_path = self.path(variant_name)
+        if not os.path.exists(variant_path):
+            with open(self.path(name), 'rb') as f:
+                data = transcode(f.read(), audio_format)
+            tmp_path = f"{variant_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, variant_path)
+        return variant_name
+
+    def sweep(self):
+        """Delete artifacts older than the TTL; return how many were removed."""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if self.in_progress(entry.name):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        with self._condition:
+            self._failed.clear()
+        if removed:
+            print(f"Removed {removed} expired artifacts from {self.directory}")
+        return removed
+
+    def start_sweeper(self, interval=ARTIFACT_SWEEP_SECONDS):
+        """Run sweep() every interval seconds in a daemon thread (restarted by create() in a forked process)."""
+        self._sweep_interval = interval
+        self._sweeper_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"Error sweeping artifacts: {str(e)}")
+
+        self._sweeper = threading.Thread(target=run, name="artifact-sweeper", daemon=True)
+        self._sweeper.start()
@@ -0,0 +1,227 @@
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import wave
+
+import numpy as np
+
+# Whisper works on 16 kHz mono audio (stored recordings are normalized to it too)
+TARGET_SAMPLE_RATE = 16000
+
+# Bitrates of the lossy encodings (speech, so low rates are transparent enough)
+OPUS_BITRATE = os.getenv("OPUS_BITRATE", "32k")
+MP3_BITRATE = os.getenv("MP3_BITRATE", "64k")
+
+# Encodings generated speech and stored recordings can be written in
+AUDIO_FORMATS = {
+    "wav": {"extension": "wav", "content_type": "audio/wav", "codec": ["-c:a", "pcm_s16le", "-f", "wav"],
+            "bitrate": None},
+    "opus": {"extension": "ogg", "content_type": "audio/ogg", "codec": ["-c:a", "libopus", "-f", "ogg"],
+             "bitrate": OPUS_BITRATE},
+    "mp3": {"extension": "mp3", "content_type": "audio/mpeg", "codec": ["-c:a", "libmp3lame", "-f", "mp3"],
+            "bitrate": MP3_BITRATE},
+    "flac": {"extension": "flac", "content_type": "audio/flac", "codec": ["-c:a", "flac", "-f", "flac"],
+             "bitrate": None},
+}
+
+
+def format_for_extension(filename):
+    """Helper function to find the AUDIO_FORMATS entry of a file name, or None."""
+    extension = filename.rsplit(".", 1)[-1].lower()
+    return next((name for name, spec in AUDIO_FORMATS.items() if spec["extension"] == extension), None)
+
+
+def _decode_pcm_wav(audio_bytes, sample_rate):
+    """Decode 16-bit PCM WAV already at the target rate without spawning ffmpeg, else return None."""
+    if audio_bytes[:4] != b"RIFF" or audio_bytes[8:12] != b"WAVE":
+        return None
+    try:
+        with wave.open(io.BytesIO(audio_bytes), "rb") as wav_file:
+            if wav_file.getsampwidth() != 2 or wav_file.getframerate() != sample_rate:
+                return None
+            channels = wav_file.getnchannels()
+            frames = wav_file.readframes(wav_file.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def decode_audio(audio_bytes, sample_rate=TARGET_SAMPLE_RATE):
+    """
+    Helper function to decode an uploaded recording into mono float32 samples.
+
+    The bytes are piped through ffmpeg (same conversion as whisper.load_audio),
+    so nothing is written to disk. Containers that ffmpeg cannot read from a
+    pipe (e.g. MP4 with the index at the end) fall back to a temp file that is
+    removed straight away.
+    """
+    samples = _decode_pcm_wav(audio_bytes, sample_rate)
+    if samples is not None:
+        return samples
+
+    command = [
+        "ffmpeg", "-threads", "0", "-i", "{input}",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"
+    ]
+    try:
+        output = subprocess.run(
+            [part.replace("{input}", "pipe:0") for part in command],
+            input=audio_bytes, capture_output=True, check=True
+        ).stdout
+    except subprocess.CalledProcessError:
+        with tempfile.NamedTemporaryFile() as tmp_file:
+            tmp_file.write(audio_bytes)
+            tmp_file.flush()
+            try:
+                output = subprocess.run(
+                    [part.replace("{input}", tmp_file.name) for part in command],
+                    capture_output=True, check=True
+                ).stdout
+            except subprocess.CalledProcessError as e:
+                raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore')}") from e
+
+    return np.frombuffer(output, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def resample(audio, source_rate, target_rate=TARGET_SAMPLE_RATE):
+    """
+    Helper function to resample mono float32 samples in memory.
+
+    Uses ffmpeg's resampler, the one whisper.load_audio and decode_audio go
+    through, so the result matches decoding the upload at target_rate.
+    """
+    if source_rate == target_rate or len(audio) == 0:
+        return audio
+    command = [
+        "ffmpeg", "-f", "f32le", "-ac", "1", "-ar", str(source_rate), "-i", "pipe:0",
+        "-f", "f32le", "-ac", "1", "-ar", str(target_rate), "-"
+    ]
+    try:
+        output = subprocess.run(
+            command, input=np.ascontiguousarray(audio, dtype="<f4").tobytes(), capture_output=True, check=True
+        ).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to resample audio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(output, dtype="<f4").copy()
+
+
+def encode_wav(wav, sample_rate):
+    """Helper function to encode a float32 waveform as 16-bit PCM WAV bytes."""
+    pcm = (np.clip(np.asarray(wav, dtype=np.float32), -1.0, 1.0) * 32767).astype(np.int16)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def transcode(audio_bytes, audio_format, sample_rate=None, channels=None, bitrate=None):
+    """
+    Helper function to convert an encoded recording to one of AUDIO_FORMATS with ffmpeg.
+
+    :param sample_rate: resample to this rate (default: keep)
+    :param channels: downmix to this many channels (default: keep)
+    :param bitrate: override the format's default bitrate
+    """
+    spec = AUDIO_FORMATS[audio_format]
+    if (audio_format == "wav" and sample_rate is None and channels is None
+            and _decode_pcm_wav(audio_bytes, _wav_rate(audio_bytes)) is not None):
+        return audio_bytes
+
+    command = ["ffmpeg", "-threads", "0", "-i", "pipe:0", "-vn"]
+    if channels:
+        command += ["-ac", str(channels)]
+    if sample_rate:
+        command += ["-ar", str(sample_rate)]
+    command += spec["codec"]
+    if bitrate or spec["bitrate"]:
+        command += ["-b:a", bitrate or spec["bitrate"]]
+    command.append("pipe:1")
+    try:
+        output = subprocess.run(command, input=audio_bytes, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to encode audio as {audio_format}: {e.stderr.decode(errors='ignore')}") from e
+    return _fix_wav_sizes(output) if audio_format == "wav" else output
+
+
+def encode_audio(wav, sample_rate, audio_format="wav", bitrate=None):
+    """Helper function to encode a float32 waveform in one of AUDIO_FORMATS."""
+    wav_bytes = encode_wav(wav, sample_rate)
+    if audio_format == "wav":
+        return wav_bytes
+    return transcode(wav_bytes, audio_format, bitrate=bitrate)
+
+
+def _fix_wav_sizes(wav_bytes):
+    """ffmpeg cannot seek back to fill in the RIFF and data sizes when writing to a pipe."""
+    data_offset = wav_bytes.find(b"data", 12)
+    if wav_bytes[:4] != b"RIFF" or data_offset < 0:
+        return wav_bytes
+    fixed = bytearray(wav_bytes)
+    fixed[4:8] = (len(wav_bytes) - 8).to_bytes(4, "little")
+    fixed[data_offset + 4:data_offset + 8] = (len(wav_bytes) - data_offset - 8).to_bytes(4, "little")
+    return bytes(fixed)
+
+
+def _wav_rate(audio_bytes):
+    """Sample rate of a WAV file, or None if the bytes are not WAV."""
+    if audio_bytes[:4] != b"RIFF" or audio_bytes[8:12] != b"WAVE":
+        return None
+    try:
+        with wave.open(io.BytesIO(audio_bytes), "rb") as wav_file:
+            return wav_file.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+
+def ffmpeg_available():
+    """Helper function to check that the ffmpeg binary is on the PATH."""
+    return shutil.which("ffmpeg") is not None
+
+
+def available_formats(stored_format=None):
+    """
+    Helper function to list the formats that can be produced right now.
+
+    All of AUDIO_FORMATS with ffmpeg; without it only WAV written from samples,
+    or, for a file that already exists, only the encoding it is stored in.
+    """
+    if ffmpeg_available():
+        return set(AUDIO_FORMATS)
+    return {stored_format or "wav"}
+
+
+def negotiate_format(requested, accepted_types, default, available=None):
+    """
+    Helper function to choose an output format.
+
+    An explicit format wins, given by name or by file extension (e.g. "opus" or
+    "ogg"; None if it is neither); otherwise the first audio type in
+    accepted_types (an Accept header, best first) that we can produce; otherwise
+    the default. Formats missing from available (default: available_formats())
+    fall back to the default, or to WAV if the default cannot be produced either.
+    """
+    if available is None:
+        available = available_formats()
+    fallback = default if default in available else "wav"
+    if requested:
+        requested = requested.lower()
+        name = requested if requested in AUDIO_FORMATS else format_for_extension(requested)
+        if name is None:
+            return None
+        return name if name in available else fallback
+    by_content_type = {spec["content_type"]: name for name, spec in AUDIO_FORMATS.items()}
+    by_content_type.update({"audio/opus": "opus", "audio/mp3": "mp3", "audio/x-flac": "flac", "audio/x-wav": "wav"})
+    for content_type in accepted_types:
+        if by_content_type.get(content_type) in available:
+            return by_content_type[content_type]
+    return fallback
@@ -0,0 +1,97 @@
+import os
+
+import torch
+from torch import nn
+
+# "auto" picks CUDA when available and falls back to CPU
+INFERENCE_DEVICE = os.getenv("INFERENCE_DEVICE", "auto")
+# "auto" = dynamic int8 on CPU, full precision on GPU; or force "int8" / "none"
+INFERENCE_QUANTIZE = os.getenv("INFERENCE_QUANTIZE", "auto")
+# 0 keeps PyTorch's defaults
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+
+# Whisper size used when WHISPER_MODEL is not set; large-v3 is impractical on CPU
+DEFAULT_WHISPER_MODEL = {"cuda": "large-v3", "cpu": "small"}
+
+
+def select_device(preference=INFERENCE_DEVICE):
+    """Helper function to resolve the inference device, falling back to CPU."""
+    if preference == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    if preference.startswith("cuda") and not torch.cuda.is_available():
+        print(f"INFERENCE_DEVICE={preference} requested but CUDA is not available, using CPU")
+        return "cpu"
+    return preference
+
+
+def should_quantize(device, setting=INFERENCE_QUANTIZE):
+    if setting == "auto":
+        return device == "cpu"
+    return setting == "int8"
+
+
+def configure_threads(num_threads=TORCH_NUM_THREADS, interop_threads=TORCH_INTEROP_THREADS):
+    """Apply the thread settings; must run before any model work starts."""
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    if interop_threads > 0:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Can only be set once, before inter-op parallel work has started
+            print("torch inter-op threads already initialized, TORCH_INTEROP_THREADS ignored")
+
+
+def _plain_linears(module):
+    """
+    Turn every Linear-like layer into a plain nn.Linear so quantize_dynamic
+    picks it up: subclasses (Whisper's Linear) are re-typed and the Conv1D
+    layers of HF GPT-2 (used by XTTS) are replaced by equivalent Linears.
+    """
+    try:
+        from transformers.pytorch_utils import Conv1D
+    except ImportError:
+        Conv1D = None
+
+    for name, child in list(module.named_children()):
+        if Conv1D is not None and isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = nn.Linear(in_features, out_features)
+            linear.weight = nn.Parameter(child.weight.detach().t().contiguous())
+            linear.bias = nn.Parameter(child.bias.detach())
+            setattr(module, name, linear)
+        elif isinstance(child, nn.Linear) and type(child) is not nn.Linear:
+            child.__class__ = nn.Linear
+        else:
+            _plain_linears(child)
+
+
+def quantize_int8(module):
+    """Helper function to apply dynamic int8 quantization to the Linear layers of a CPU model."""
+    _plain_linears(module)
+    return torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_whisper(name, device):
+    """Load a Whisper model on the device, quantized when running on CPU (see INFERENCE_QUANTIZE)."""
+    import whisper
+
+    model = whisper.load_model(name, device=device)
+    if should_quantize(device):
+        model = quantize_int8(model)
+        print(f"Whisper {name} quantized to int8")
+    return model
+
+
+def load_tts(name, device):
+    """Load a Coqui TTS model on the device; for XTTS on CPU the GPT decoder is quantized to int8."""
+    from TTS.api import TTS
+
+    tts = TTS(name).to(device)
+    if should_quantize(device):
+        gpt = getattr(tts.synthesizer.tts_model, "gpt", None)
+        if gpt is not None:
+            quantize_int8(gpt)
+            print(f"{name} GPT decoder quantized to int8")
+    return tts
@@ -0,0 +1,152 @@
+import os
+import queue
+import threading
+import time
+import uuid
+
+# Number of model workers and maximum number of jobs waiting for one
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+# Finished jobs are kept this long (seconds) for polling
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class JobQueue:
+    """
+    In-process job queue drained by a fixed pool of worker threads.
+
+    submit() never blocks: when JOB_QUEUE_SIZE jobs are already waiting it
+    raises QueueFull so the caller can reject the request instead of piling up
+    work. Job state can be polled with get(), and every state change is passed
+    to the optional on_update(job_id, state) callback (used for Socket.IO push).
+    With a shared store (see MetadataStore.save_job) every state change is also
+    published there, so get() answers for jobs queued by other worker processes.
+    """
+
+    def __init__(self, handler, workers=JOB_WORKERS, max_pending=JOB_QUEUE_SIZE,
+                 result_ttl=JOB_RESULT_TTL, on_update=None, store=None):
+        """
+        :param handler: callable(payload) returning a JSON-serializable result
+        :param store: optional store with save_job / get_job / prune_jobs shared between processes
+        """
+        self.handler = handler
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.on_update = on_update
+        self.store = store
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._jobs = {}
+        self._events = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    def start(self):
+        """Start the worker pool (called lazily by submit, again in a forked process)."""
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Threads do not survive a fork, and the parent's idle workers are still
+                # registered as waiters on its queue: a forked worker starts afresh
+                self._pending = queue.Queue(maxsize=self._pending.maxsize)
+            self._threads = []
+            self._pid = os.getpid()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, payload):
+        """Queue a job and return its id, or raise QueueFull."""
+        self.start()
+        self._prune()
+
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {"job_id": job_id, "status": "queued", "submitted_at": time.time()}
+            self._events[job_id] = threading.Event()
+        try:
+            self._pending.put_nowait((job_id, payload))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+                del self._events[job_id]
+            raise QueueFull(f"Job queue is full ({self._pending.maxsize} jobs waiting)")
+
+        self._notify(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Return a copy of the job state, or None for unknown/expired ids."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        if self.store is not None:
+            # Queued by another worker process
+            try:
+                return self.store.get_job(job_id)
+            except Exception as e:
+                print(f"Error reading job {job_id} from the shared store: {str(e)}")
+        return None
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job has finished and return its state."""
+        with self._lock:
+            event = self._events.get(job_id)
+        if event is not None:
+            event.wait(timeout)
+        return self.get(job_id)
+
+    def depth(self):
+        """Number of jobs waiting for a worker."""
+        return self._pending.qsize()
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+        self._notify(job_id)
+
+    def _notify(self, job_id):
+        if self.store is not None:
+            try:
+                self.store.save_job(self.get(job_id))
+            except Exception as e:
+                print(f"Error publishing job {job_id} to the shared store: {str(e)}")
+        if self.on_update is not None:
+            try:
+                self.on_update(job_id, self.get(job_id))
+            except Exception as e:
+                print(f"Error publishing job update: {str(e)}")
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.get("finished_at", time.time()) < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+                del self._events[job_id]
+        if self.store is not None:
+            try:
+                self.store.prune_jobs(cutoff)
+            except Exception as e:
+                print(f"Error pruning jobs from the shared store: {str(e)}")
+
+    def _run(self):
+        while True:
+            job_id, payload = self._pending.get()
+            with self._lock:
+                done = self._events[job_id]
+            self._update(job_id, status="running", started_at=time.time())
+            try:
+                result = self.handler(payload)
+                self._update(job_id, status="done", result=result, finished_at=time.time())
+            except Exception as e:
+                self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+            finally:
+                done.set()
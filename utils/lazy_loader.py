@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+# "background": start loading at import in parallel threads (default)
+# "lazy": load on first use, or when the first readiness probe asks
+# "eager": load at import and block until done (the old behaviour)
+MODEL_LOADING = os.getenv("MODEL_LOADING", "background")
+
+
+class ResourceUnavailable(Exception):
+    """Raised when a resource failed to load."""
+
+
+class LazyResource:
+    """
+    A model (or other slow-to-initialize dependency) loaded off the request path.
+
+    start() loads it in a background thread; get() returns it, loading it in
+    the calling thread first if nobody started it yet, or waiting for the
+    background load to finish. status() reports the state and load time for
+    the readiness endpoint.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.state = "pending"
+        self.load_time = None
+        self.error = None
+        self._value = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def start(self):
+        """Begin loading in a background thread, unless a load already started."""
+        if self.state != "pending":
+            return
+        threading.Thread(target=self._load, name=f"load-{self.name}", daemon=True).start()
+
+    def _load(self):
+        with self._lock:
+            if self.state != "pending":
+                return
+            self.state = "loading"
+
+        load_start = time.time()
+        try:
+            self._value = self.loader()
+            self.load_time = time.time() - load_start
+            self.state = "ready"
+            print(f"{self.name} loaded successfully in {self.load_time:.2f} seconds.")
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+            print(f"Failed to load {self.name}: {self.error}")
+        finally:
+            self._done.set()
+
+    def get(self, timeout=None):
+        """Return the loaded resource, waiting for (or triggering) the load."""
+        if self.state == "pending":
+            self._load()
+        if not self._done.wait(timeout):
+            raise ResourceUnavailable(f"{self.name} is still loading")
+        if self.state != "ready":
+            raise ResourceUnavailable(f"{self.name} failed to load: {self.error}")
+        return self._value
+
+    def wait(self, timeout=None):
+        """Block until loading has finished (successfully or not)."""
+        return self._done.wait(timeout)
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def status(self):
+        return {"state": self.state, "load_time": self.load_time, "error": self.error}
+
+
+def start_loading(resources, mode=MODEL_LOADING):
+    """Helper function to kick off loading according to MODEL_LOADING."""
+    if mode == "lazy":
+        return
+    for resource in resources:
+        resource.start()
+    if mode == "eager":
+        for resource in resources:
+            resource.wait()
@@ -0,0 +1,165 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.vad import split_on_silence
+
+# Recordings longer than this are transcribed as independent windows in parallel
+LONGFORM_MIN_SECONDS = float(os.getenv("LONGFORM_MIN_SECONDS", "60"))
+# Windows in flight at once; concurrent windows share one batched Whisper decode
+LONGFORM_WORKERS = int(os.getenv("LONGFORM_WORKERS", os.getenv("WHISPER_BATCH_SIZE", "8")))
+# Audio shared by the two windows around a cut through speech (no silence to cut at)
+LONGFORM_OVERLAP_SECONDS = float(os.getenv("LONGFORM_OVERLAP_SECONDS", "1.0"))
+
+# Whisper decodes fixed 30 second windows
+WINDOW_SECONDS = 30
+# Longest run of repeated words looked for where two windows overlap
+MAX_OVERLAP_WORDS = 20
+# Words at the very edge of a window may be cut off and misheard
+EDGE_WORDS = 2
+
+
+def plan_windows(audio, sample_rate=16000, overlap_seconds=LONGFORM_OVERLAP_SECONDS):
+    """
+    Helper function to split a recording into windows that can be decoded independently.
+
+    Windows are cut at silence (see split_on_silence). Where a speech span is
+    longer than a window and has to be cut hard, the two windows overlap by
+    overlap_seconds so the word under the cut is heard whole by at least one
+    of them; the repeated words are removed again when stitching. A
+    recording in which the VAD hears no speech is covered end to end by such
+    overlapping windows. Every window stays within Whisper's 30 seconds.
+    Returns (start, end) tuples.
+    """
+    windows = split_on_silence(audio, sample_rate, max_seconds=WINDOW_SECONDS - overlap_seconds)
+    half = int(overlap_seconds * sample_rate / 2)
+    planned = []
+    for index, (start, end) in enumerate(windows):
+        if index > 0 and windows[index - 1][1] == start:
+            start = max(0, start - half)
+        if index + 1 < len(windows) and windows[index + 1][0] == end:
+            end = min(len(audio), end + half)
+        planned.append((start, end))
+    return planned
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def _repeated_words(previous, words):
+    """
+    Number of leading words that repeat the end of the previous window.
+
+    Looks for the longest run of words ending `previous` that also starts
+    `words`, allowing up to EDGE_WORDS garbled words at the edge of either
+    window (a fuzzy match needs at least two words). Returns 0 if none.
+    """
+    previous = [_normalize(word) for word in previous]
+    current = [_normalize(word) for word in words[:MAX_OVERLAP_WORDS + EDGE_WORDS]]
+    for length in range(min(MAX_OVERLAP_WORDS, len(previous), len(current)), 0, -1):
+        for skip_previous in range(EDGE_WORDS + 1):
+            for skip_current in range(EDGE_WORDS + 1):
+                if length < 2 and (skip_previous or skip_current):
+                    continue
+                end = len(previous) - skip_previous
+                if end - length < 0 or skip_current + length > len(current):
+                    continue
+                if previous[end - length:end] == current[skip_current:skip_current + length]:
+                    return skip_current + length
+    return 0
+
+
+class TranscriptStitcher:
+    """
+    Joins the Whisper results of consecutive windows into one transcript.
+
+    Segment timestamps are moved from window time to recording time, and
+    where a window overlaps the previous one the words both of them heard
+    are kept only once. Windows must be added in order.
+    """
+
+    def __init__(self, sample_rate=16000):
+        self.sample_rate = sample_rate
+        self.texts = []
+        self.segments = []
+        self.language = None
+        self._previous_end = None
+        self._tail = []
+
+    def add(self, result, start, end):
+        """Add the result of window (start, end); returns the text it contributes (may be empty)."""
+        self.language = self.language or result.get("language")
+        offset = start / self.sample_rate
+        segments = [dict(segment, start=segment["start"] + offset, end=segment["end"] + offset)
+                    for segment in result.get("segments", [])]
+        if not segments and result.get("text", "").strip():
+            segments = [{"start": offset, "end": end / self.sample_rate, "text": result["text"]}]
+
+        if self._previous_end is not None and start < self._previous_end:
+            words = [word for segment in segments for word in segment["text"].split()]
+            segments = self._drop_words(segments, _repeated_words(self._tail, words))
+        self._previous_end = end
+
+        text = " ".join(segment["text"].strip() for segment in segments if segment["text"].strip())
+        for segment in segments:
+            segment["id"] = len(self.segments)
+            self.segments.append(segment)
+        if text:
+            self.texts.append(text)
+            self._tail = (self._tail + text.split())[-(MAX_OVERLAP_WORDS + EDGE_WORDS):]
+        return text
+
+    @staticmethod
+    def _drop_words(segments, count):
+        """Remove the first `count` words from a list of segments, dropping segments left empty."""
+        kept = []
+        for segment in segments:
+            words = segment["text"].split()
+            if count >= len(words):
+                count -= len(words)
+                continue
+            if count:
+                segment = dict(segment, text=" " + " ".join(words[count:]))
+                count = 0
+            kept.append(segment)
+        return kept
+
+    def result(self):
+        """The stitched transcript as a transcribe()-style result dict."""
+        return {"text": " ".join(self.texts), "segments": self.segments, "language": self.language}
+
+
+def transcribe_windows(audio, windows, transcribe, workers=LONGFORM_WORKERS):
+    """
+    Helper function to transcribe windows of a recording in parallel.
+
+    Windows are decoded without a prompt, so none waits for the text of
+    another; with transcribe going through a WhisperBatcher, the windows in
+    flight are decoded together in one batch. Yields (start, end, result)
+    in window order as soon as each result and those before it are ready.
+
+    :param transcribe: callable(audio, initial_prompt) returning a Whisper result dict
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="longform") as pool:
+        futures = [pool.submit(transcribe, audio[start:end], None) for start, end in windows]
+        try:
+            for (start, end), future in zip(windows, futures):
+                yield start, end, future.result()
+        finally:
+            # Stopped early (an error downstream): skip the windows not started yet
+            for future in futures:
+                future.cancel()
+
+
+def transcribe_long(audio, transcribe, sample_rate=16000, workers=LONGFORM_WORKERS):
+    """
+    Helper function to transcribe a long recording as parallel windows.
+
+    Returns a transcribe()-style result dict with the segments of all
+    windows on the recording's timeline.
+    """
+    stitcher = TranscriptStitcher(sample_rate)
+    for start, end, result in transcribe_windows(audio, plan_windows(audio, sample_rate), transcribe, workers):
+        stitcher.add(result, start, end)
+    return stitcher.result()
@@ -0,0 +1,390 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Which backend holds the records metadata: "sqlite" (default) or "json" (legacy single file)
+METADATA_STORE = os.getenv("METADATA_STORE", "sqlite")
+METADATA_DB = os.getenv("METADATA_DB", os.path.join(os.getcwd(), "metadata.db"))
+LEGACY_METADATA_FILE = os.path.join(os.getcwd(), "metadata.json")
+# Tombstoned rows are purged once there are this many of them
+METADATA_COMPACT_THRESHOLD = int(os.getenv("METADATA_COMPACT_THRESHOLD", "1000"))
+# An upload still marked as in progress after this long is assumed lost (e.g. a worker crashed)
+FILE_UPLOAD_STALE_SECONDS = float(os.getenv("FILE_UPLOAD_STALE_SECONDS", "900"))
+
+# file_status() of a file some worker is still uploading
+UPLOADING = "uploading"
+# How the files table stores it (present is 1 or 0 otherwise)
+_UPLOADING_FLAG = 2
+
+
+def _created_at(record):
+    """Best-effort creation time of a record: ids look like '<random>_<epoch>'."""
+    try:
+        return float(str(record.get("id", "")).rsplit("_", 1)[1])
+    except (IndexError, ValueError):
+        return 0.0
+
+
+class MetadataStore:
+    """Interface of the records metadata backends."""
+
+    def append(self, record):
+        """Store a new record."""
+        raise NotImplementedError
+
+    def get(self, record_id):
+        """Return the record with this id, or None."""
+        raise NotImplementedError
+
+    def remove(self, record_id):
+        """Delete the record with this id; return True if it existed."""
+        raise NotImplementedError
+
+    def iter_records(self, user_id=None, record_type=None, since=None, until=None, after=None, limit=None):
+        """
+        Yield (cursor, record) pairs of live records, oldest first.
+
+        :param user_id: only records of this user
+        :param record_type: only records with this 'type'
+        :param since: only records created at or after this epoch time
+        :param until: only records created before this epoch time
+        :param after: cursor of the last record of the previous page
+        :param limit: maximum number of records
+        """
+        raise NotImplementedError
+
+    def records(self, user_id=None):
+        """Return all live records, optionally only those of one user, oldest first."""
+        return [record for _, record in self.iter_records(user_id=user_id)]
+
+    def compact(self):
+        """Reclaim space used by deleted records."""
+
+    def mark_files(self, names, present):
+        """
+        Record that audio files were uploaded to S3 (present=True), deleted from
+        it (False), or are being uploaded right now (UPLOADING).
+        """
+
+    def record_missing(self, names):
+        """Record that S3 does not have these files, unless the store learned about them meanwhile."""
+
+    def file_status(self, names):
+        """
+        Return {name: status} for audio files: True if uploaded, False if deleted,
+        UPLOADING while an upload is in progress (in any process), None if the
+        store does not know the file (callers then ask S3).
+        """
+        return {name: None for name in names}
+
+    def save_job(self, state):
+        """Publish the state of a queued job so every worker process can report it."""
+
+    def get_job(self, job_id):
+        """Return the last published state of a job, or None if the store does not know it."""
+        return None
+
+    def prune_jobs(self, before):
+        """Forget jobs last updated before this epoch time."""
+
+
+class JSONFileMetadataStore(MetadataStore):
+    """
+    The original format: every record in one JSON list, rewritten on each change.
+
+    A deleted record is replaced by null rather than taken out of the list,
+    so the list index of every other record (its cursor) stays the same.
+    """
+
+    def __init__(self, path=LEGACY_METADATA_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r') as json_file:
+                return json.load(json_file)
+        except json.JSONDecodeError:
+            return []
+
+    def _save(self, data):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as json_file:
+            json.dump(data, json_file, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def append(self, record):
+        with self._lock:
+            data = self._load()
+            data.append(record)
+            self._save(data)
+
+    def get(self, record_id):
+        return next((record for record in self._load() if record and record.get("id") == record_id), None)
+
+    def remove(self, record_id):
+        with self._lock:
+            data = self._load()
+            removed = [index for index, record in enumerate(data) if record and record.get("id") == record_id]
+            if removed:
+                for index in removed:
+                    data[index] = None
+                self._save(data)
+            return bool(removed)
+
+    def iter_records(self, user_id=None, record_type=None, since=None, until=None, after=None, limit=None):
+        count = 0
+        for index, record in enumerate(self._load()):
+            if limit is not None and count >= limit:
+                return
+            if record is None or (after is not None and index <= after):
+                continue
+            if user_id is not None and record.get("user_id") != user_id:
+                continue
+            if record_type is not None and record.get("type") != record_type:
+                continue
+            created_at = _created_at(record)
+            if (since is not None and created_at < since) or (until is not None and created_at >= until):
+                continue
+            count += 1
+            yield index, record
+
+
+class SQLiteMetadataStore(MetadataStore):
+    """
+    Records metadata in SQLite, indexed on id and user_id.
+
+    Each record is a row holding the original JSON document, so arbitrary
+    fields sent to /save_metadata are kept as they are. A separate files table
+    tracks which audio files are in S3, so URLs can be signed without asking S3,
+    and a jobs table holds the state of queued jobs, so any worker process can
+    report them. Deletes only set a tombstone flag; tombstoned rows are
+    purged by compact(), which runs automatically once
+    METADATA_COMPACT_THRESHOLD of them have piled up.
+    The legacy metadata.json is imported once, the first time the database
+    is created, and then renamed to metadata.json.imported.
+    """
+
+    def __init__(self, path=METADATA_DB, legacy_path=LEGACY_METADATA_FILE,
+                 compact_threshold=METADATA_COMPACT_THRESHOLD):
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self._local = threading.local()
+        self._inherited = []
+        self._write_lock = threading.Lock()
+
+        with self._write_lock:
+            connection = self._connection()
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS records (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT,
+                    user_id TEXT,
+                    type TEXT,
+                    created_at REAL NOT NULL DEFAULT 0,
+                    deleted INTEGER NOT NULL DEFAULT 0,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_records_id ON records (id);
+                CREATE INDEX IF NOT EXISTS idx_records_user ON records (user_id, seq);
+                CREATE INDEX IF NOT EXISTS idx_records_created ON records (created_at);
+                CREATE INDEX IF NOT EXISTS idx_records_deleted ON records (deleted) WHERE deleted = 1;
+                CREATE TABLE IF NOT EXISTS store_info (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS files (
+                    name TEXT PRIMARY KEY,
+                    present INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs (updated_at);
+            """)
+            imported = connection.execute("SELECT value FROM store_info WHERE key = 'legacy_import'").fetchone()
+            if imported is None:
+                self._import_legacy(connection, legacy_path)
+
+    def _connection(self):
+        """
+        SQLite connections cannot be shared between threads or across a fork,
+        keep one per thread and process. A connection inherited from the parent
+        (a preloaded gunicorn master) is left untouched, not closed: closing it
+        would release the parent's locks.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid != os.getpid():
+            self._inherited.append(connection)
+            connection = None
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _import_legacy(self, connection, legacy_path):
+        records = []
+        if legacy_path and os.path.exists(legacy_path):
+            try:
+                with open(legacy_path, 'r') as json_file:
+                    records = json.load(json_file)
+                if not isinstance(records, list):
+                    raise ValueError(f"expected a list of records, found {type(records).__name__}")
+                # Records deleted through JSONFileMetadataStore are left as null
+                records = [record for record in records if record is not None]
+            except (OSError, ValueError) as e:
+                # Leave the import pending so the file is retried once it has been repaired
+                print(f"Error importing {legacy_path}, its records were not imported: {str(e)}")
+                return
+        with connection:
+            connection.executemany(
+                "INSERT INTO records (id, user_id, type, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                [self._row(record) for record in records]
+            )
+            connection.execute("INSERT INTO store_info (key, value) VALUES ('legacy_import', ?)", (str(len(records)),))
+        if records:
+            os.replace(legacy_path, f"{legacy_path}.imported")
+            print(f"Imported {len(records)} records from {legacy_path} into {self.path}")
+
+    @staticmethod
+    def _row(record):
+        return (
+            record.get("id"),
+            record.get("user_id"),
+            record.get("type"),
+            record.get("created_at", _created_at(record)),
+            json.dumps(record)
+        )
+
+    def append(self, record):
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                connection.execute(
+                    "INSERT INTO records (id, user_id, type, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                    self._row(record)
+                )
+
+    def get(self, record_id):
+        row = self._connection().execute(
+            "SELECT data FROM records WHERE id = ? AND deleted = 0 ORDER BY seq DESC LIMIT 1", (record_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def remove(self, record_id):
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                removed = connection.execute(
+                    "UPDATE records SET deleted = 1 WHERE id = ? AND deleted = 0", (record_id,)
+                ).rowcount
+            # Counted on the partial index, which compact() keeps below the threshold
+            tombstones = connection.execute("SELECT COUNT(*) FROM records WHERE deleted = 1").fetchone()[0]
+        if tombstones >= self.compact_threshold:
+            self.compact()
+        return removed > 0
+
+    def iter_records(self, user_id=None, record_type=None, since=None, until=None, after=None, limit=None):
+        clauses = ["deleted = 0"]
+        params = []
+        for clause, value in (("user_id = ?", user_id), ("type = ?", record_type), ("created_at >= ?", since),
+                              ("created_at < ?", until), ("seq > ?", after)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        query = f"SELECT seq, data FROM records WHERE {' AND '.join(clauses)} ORDER BY seq"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        # Fetch in batches so large listings are never held in memory at once
+        rows = self._connection().execute(query, params)
+        while True:
+            batch = rows.fetchmany(500)
+            if not batch:
+                return
+            for seq, data in batch:
+                yield seq, json.loads(data)
+
+    def mark_files(self, names, present):
+        now = time.time()
+        flag = _UPLOADING_FLAG if present == UPLOADING else int(present)
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO files (name, present, updated_at) VALUES (?, ?, ?)",
+                    [(name, flag, now) for name in names]
+                )
+
+    def record_missing(self, names):
+        # INSERT OR IGNORE: an upload started (or finished) since the lookup wins
+        now = time.time()
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO files (name, present, updated_at) VALUES (?, 0, ?)",
+                    [(name, now) for name in names]
+                )
+
+    def file_status(self, names):
+        status = {name: None for name in names}
+        names = list(status)
+        connection = self._connection()
+        # Stay below SQLite's limit on bound parameters
+        for start in range(0, len(names), 500):
+            batch = names[start:start + 500]
+            rows = connection.execute(
+                f"SELECT name, present, updated_at FROM files WHERE name IN ({', '.join('?' * len(batch))})", batch
+            )
+            for name, present, updated_at in rows:
+                if present == _UPLOADING_FLAG:
+                    status[name] = UPLOADING if updated_at > time.time() - FILE_UPLOAD_STALE_SECONDS else None
+                else:
+                    status[name] = bool(present)
+        return status
+
+    def save_job(self, state):
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO jobs (job_id, state, updated_at) VALUES (?, ?, ?)",
+                    (state["job_id"], json.dumps(state), time.time())
+                )
+
+    def get_job(self, job_id):
+        row = self._connection().execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune_jobs(self, before):
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                connection.execute("DELETE FROM jobs WHERE updated_at < ?", (before,))
+
+    def compact(self):
+        start = time.time()
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                purged = connection.execute("DELETE FROM records WHERE deleted = 1").rowcount
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print(f"Compacted metadata store: purged {purged} deleted records in {time.time() - start:.2f} seconds.")
+
+
+def open_metadata_store(backend=METADATA_STORE):
+    """Return the metadata store selected by METADATA_STORE."""
+    if backend == "json":
+        return JSONFileMetadataStore()
+    if backend == "sqlite":
+        return SQLiteMetadataStore()
+    raise ValueError(f"Unknown METADATA_STORE backend: {backend}")
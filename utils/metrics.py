@@ -0,0 +1,280 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psutil
+
+# Upper bounds (seconds) of the latency histogram buckets
+METRICS_BUCKETS = tuple(float(bound) for bound in os.getenv(
+    "METRICS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60,120").split(","))
+# How often the process RSS and CPU usage are sampled
+METRICS_SAMPLE_SECONDS = float(os.getenv("METRICS_SAMPLE_SECONDS", "5"))
+# Requests sending this header (with any value but 0/false) get their stage breakdown
+# back in a Server-Timing response header
+TRACE_HEADER = os.getenv("TRACE_HEADER", "X-Trace")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative latency histogram per label combination, in the Prometheus layout."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=METRICS_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, dict(value, counts=list(value["counts"]))) for key, value in self._series.items())
+        for key, value in series:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, value["counts"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(dict(labels, le=_format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(dict(labels, le='+Inf'))} {value['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {value['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Histograms plus callback metrics rendered in the Prometheus text format.
+
+    Callback metrics are read at scrape time from the components that already
+    keep the numbers (queues, caches, uploaders); a callback returns a single
+    value or a list of (labels dict, value) pairs.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, labelnames=(), buckets=METRICS_BUCKETS):
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, help_text, labelnames, buckets)
+            return self._histograms[name]
+
+    def gauge(self, name, help_text, callback):
+        self._register(name, help_text, "gauge", callback)
+
+    def counter(self, name, help_text, callback):
+        self._register(name, help_text, "counter", callback)
+
+    def _register(self, name, help_text, kind, callback):
+        with self._lock:
+            self._callbacks = [entry for entry in self._callbacks if entry[0] != name]
+            self._callbacks.append((name, help_text, kind, callback))
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            histograms = list(self._histograms.values())
+            callbacks = list(self._callbacks)
+
+        lines = []
+        for histogram in histograms:
+            lines.extend(histogram.render())
+        for name, help_text, kind, callback in callbacks:
+            try:
+                value = callback()
+            except Exception as e:
+                print(f"Error collecting metric {name}: {str(e)}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            samples = value if isinstance(value, list) else [({}, value)]
+            for labels, sample in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(sample)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Time per processing stage of a request, wherever it runs (request thread, job worker,
+# TTS engine or upload pool)
+STAGE_SECONDS = registry.histogram("speech_stage_seconds", "Time spent in each processing stage", ("stage",))
+REQUEST_SECONDS = registry.histogram("speech_request_seconds", "HTTP request handling time",
+                                     ("endpoint", "method", "status"))
+
+
+class Trace:
+    """Stage durations of one request, for the Server-Timing header."""
+
+    def __init__(self):
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.stages.append((name, seconds))
+
+    def breakdown(self):
+        """{stage: (total seconds, occurrences)} in the order the stages first ran."""
+        totals = {}
+        with self._lock:
+            for name, seconds in self.stages:
+                total, count = totals.get(name, (0.0, 0))
+                totals[name] = (total + seconds, count + 1)
+        return totals
+
+    def server_timing(self, total=None):
+        entries = []
+        for name, (seconds, count) in self.breakdown().items():
+            description = f';desc="{count} calls"' if count > 1 else ""
+            entries.append(f"{name};dur={seconds * 1000:.1f}{description}")
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def observe_stage(name, seconds, trace=None):
+    """Record a stage duration in the stage histogram and, if given, the request's trace."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def stage(name, trace=None):
+    """Time the enclosed block as a processing stage (see observe_stage)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start, trace)
+
+
+class ProcessSampler:
+    """
+    Samples the RSS and CPU usage of this process with psutil in a daemon thread.
+
+    Nothing is bound to a process until the first read: psutil handles and
+    threads do not survive a fork, so when the app is preloaded in a gunicorn
+    master each worker starts its own sampler on its first scrape.
+    """
+
+    def __init__(self, interval=METRICS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.pid = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def current(self):
+        """Return the sampler, (re)started for this process if it was created in another one."""
+        if self.pid != os.getpid():
+            with self._lock:
+                if self.pid != os.getpid():
+                    self._start()
+        return self
+
+    def _start(self):
+        self.process = psutil.Process()
+        self.rss = self.process.memory_info().rss
+        self.peak_rss = self.rss
+        self.cpu_percent = self.process.cpu_percent(None)
+        self.start_time = time.time()
+        self.pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.sample()
+                except Exception as e:
+                    print(f"Error sampling process metrics: {str(e)}")
+
+        self._thread = threading.Thread(target=run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+
+    def sample(self):
+        self.rss = self.process.memory_info().rss
+        self.peak_rss = max(self.peak_rss, self.rss)
+        # Average over the time since the previous sample
+        self.cpu_percent = self.process.cpu_percent(None)
+
+
+def register_process_metrics(metrics_registry=registry):
+    """Expose process RSS (current and sampled peak), CPU usage, threads and uptime, per serving process."""
+    sampler = ProcessSampler()
+    metrics_registry.gauge("process_resident_memory_bytes", "Resident set size",
+                           lambda: sampler.current().process.memory_info().rss)
+    metrics_registry.gauge("process_resident_memory_peak_bytes", "Highest sampled resident set size",
+                           lambda: max(sampler.current().peak_rss, sampler.process.memory_info().rss))
+    metrics_registry.gauge("process_cpu_percent", "CPU usage over the last sampling interval (100 = one core)",
+                           lambda: sampler.current().cpu_percent)
+    metrics_registry.counter("process_cpu_seconds_total", "User and system CPU time",
+                             lambda: sum(sampler.current().process.cpu_times()[:2]))
+    metrics_registry.gauge("process_threads", "Number of threads", lambda: sampler.current().process.num_threads())
+    metrics_registry.gauge("process_uptime_seconds", "Seconds since this process started serving metrics",
+                           lambda: time.time() - sampler.current().start_time)
+    return sampler
+
+
+def install_request_metrics(app, metrics_registry=registry):
+    """
+    Time every request of a Flask app into speech_request_seconds, give each
+    request a Trace (flask.g.trace) and serve the registry on /metrics.
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.trace = Trace()
+
+    @app.after_request
+    def finish_request_timer(response):
+        start = getattr(g, "request_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        REQUEST_SECONDS.observe(elapsed, endpoint=request.endpoint or "unknown", method=request.method,
+                                status=response.status_code)
+        if request.headers.get(TRACE_HEADER, "0").lower() not in ("", "0", "false", "no"):
+            response.headers["Server-Timing"] = g.trace.server_timing(elapsed)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        """Endpoint exposing the metrics in the Prometheus text format."""
+        return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,149 @@
+import copy
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+
+# Tier used when a request does not ask for one
+DEFAULT_TIER = os.getenv("DEFAULT_TIER", "accurate")
+# JSON file with per-tier overrides, e.g. {"fast": {"whisper": "tiny.en"}}
+MODEL_TIERS_FILE = os.getenv("MODEL_TIERS_FILE")
+# Whisper models loaded at the same time may use this much memory (0 = no limit)
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+
+
+def default_tiers(device, accurate_model):
+    """
+    Latency tiers a request can pick with the 'tier' form field.
+
+    whisper: model name passed to whisper.load_model
+    decode:  Whisper decoding options (fp16 is chosen from the device when left out)
+    tts:     max_chunk_length for the text chunker and extra XTTS inference() arguments
+
+    Every tier decodes greedily. The default tier ("accurate") keeps the
+    decoding of the original transcribe(path, language='en') call; beam search
+    is opt-in through MODEL_TIERS_FILE, e.g. {"accurate": {"decode": {"beam_size": 5}}}.
+    """
+    return {
+        "fast": {
+            "whisper": "base" if device != "cpu" else "tiny",
+            "decode": {"beam_size": None, "temperature": 0.0, "condition_on_previous_text": False},
+            "tts": {"max_chunk_length": 150, "inference": {"top_k": 20, "top_p": 0.8}}
+        },
+        "balanced": {
+            "whisper": "turbo" if device != "cpu" else "base",
+            "decode": {"beam_size": None, "condition_on_previous_text": False},
+            "tts": {"max_chunk_length": 250, "inference": {}}
+        },
+        "accurate": {
+            "whisper": accurate_model,
+            "decode": {"beam_size": None, "condition_on_previous_text": True},
+            "tts": {"max_chunk_length": 250, "inference": {}}
+        }
+    }
+
+
+def load_tiers(device, accurate_model, path=MODEL_TIERS_FILE):
+    """Helper function to build the tier table, applying MODEL_TIERS_FILE overrides when set."""
+    tiers = default_tiers(device, accurate_model)
+    if path:
+        with open(path, 'r') as f:
+            overrides = json.load(f)
+        for name, override in overrides.items():
+            tier = tiers.setdefault(name, copy.deepcopy(tiers["balanced"]))
+            for key, value in override.items():
+                if isinstance(value, dict) and isinstance(tier.get(key), dict):
+                    tier[key].update(value)
+                else:
+                    tier[key] = value
+    return tiers
+
+
+def model_size_bytes(model):
+    """Approximate memory held by a model: every tensor in its state dict (quantized weights included)."""
+    total = 0
+    for value in model.state_dict().values():
+        tensors = value if isinstance(value, (tuple, list)) else (value,)
+        for tensor in tensors:
+            if isinstance(tensor, torch.Tensor):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """
+    Whisper models by name, loaded on demand under a memory budget.
+
+    Pinned models (the default tier) are never evicted. When loading another
+    model would go over the budget, the least recently used unpinned models
+    are dropped first; a request still holding one keeps it alive until it is
+    done. Each model gets its own lock so different models can decode at the
+    same time.
+    """
+
+    def __init__(self, load_model, budget_mb=MODEL_MEMORY_BUDGET_MB, pinned=()):
+        """
+        :param load_model: callable(name) returning the loaded model
+        """
+        self.load_model = load_model
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.pinned = set(pinned)
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._locks = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+
+    def lock(self, name):
+        """The lock serializing inference on one model."""
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        """Return the model, loading it (and evicting others) if needed."""
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # One load per model; concurrent callers wait for it
+        with load_lock:
+            with self._lock:
+                if name in self._models:
+                    return self._models[name]
+            model = self.load_model(name)
+            size = model_size_bytes(model)
+            with self._lock:
+                self._models[name] = model
+                self._sizes[name] = size
+                self._evict(keep=name)
+            print(f"Whisper model {name} loaded ({size / 1024 / 1024:.0f} MB)")
+            return model
+
+    def _evict(self, keep):
+        """Drop least recently used unpinned models until the budget holds; caller holds the lock."""
+        if self.budget <= 0:
+            return
+        evicted = False
+        for name in list(self._models):
+            if sum(self._sizes.values()) <= self.budget:
+                break
+            if name == keep or name in self.pinned:
+                continue
+            del self._models[name]
+            del self._sizes[name]
+            evicted = True
+            print(f"Whisper model {name} unloaded to stay within the memory budget")
+        if evicted and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def status(self):
+        with self._lock:
+            return {
+                "loaded": {name: self._sizes[name] for name in self._models},
+                "pinned": sorted(self.pinned),
+                "budget_bytes": self.budget
+            }
@@ -0,0 +1,84 @@
+import os
+import queue
+import threading
+
+from utils.longform import TranscriptStitcher, transcribe_windows
+from utils.tts_engine import concatenate_wavs
+
+# Inputs longer than this are transcribed and synthesized in overlapping stages
+PIPELINE_MIN_SECONDS = float(os.getenv("PIPELINE_MIN_SECONDS", "60"))
+
+
+def transcribe_and_synthesize(audio, windows, transcribe, synthesize_chunks, chunker, on_chunk=None, workers=1):
+    """
+    Run ASR and TTS as a two-stage pipeline over the windows of a recording.
+
+    Each window is transcribed on the calling thread; as soon as its text is
+    available it is handed to a TTS thread, so synthesis of window N overlaps
+    with transcription of window N+1. Audio is reassembled in window order.
+    With workers > 1 the windows are transcribed independently and in
+    parallel instead (see utils.longform), and stitched back together in order.
+
+    :param audio: 16 kHz float32 samples
+    :param windows: list of (start, end) sample offsets, see split_on_silence (or plan_windows
+                    when workers > 1)
+    :param transcribe: callable(audio, initial_prompt) returning a Whisper result dict
+    :param synthesize_chunks: callable(chunks, on_chunk) returning a float32 waveform
+    :param chunker: callable(text) splitting text into TTS chunks
+    :param on_chunk: optional callback(index, wav) with indexes running across windows
+    :param workers: number of windows transcribed at once
+    :return: (transcription_text, waveform)
+    """
+    texts = queue.Queue()
+    wavs = []
+    errors = []
+
+    def tts_stage():
+        offset = 0
+        while True:
+            text = texts.get()
+            if text is None:
+                return
+            if errors:
+                continue
+            chunks = chunker(text)
+            callback = None
+            if on_chunk is not None:
+                callback = lambda index, wav, base=offset: on_chunk(base + index, wav)
+            try:
+                wavs.append(synthesize_chunks(chunks, callback))
+            except Exception as e:
+                errors.append(e)
+            offset += len(chunks)
+
+    worker = threading.Thread(target=tts_stage, name="pipeline-tts", daemon=True)
+    worker.start()
+
+    def window_texts():
+        if workers > 1:
+            stitcher = TranscriptStitcher()
+            for start, end, result in transcribe_windows(audio, windows, transcribe, workers):
+                yield stitcher.add(result, start, end)
+            return
+        for start, end in windows:
+            # Condition each window on the end of the previous one
+            prompt = transcript[-1][-200:] if transcript else None
+            yield transcribe(audio[start:end], prompt)['text'].strip()
+
+    transcript = []
+    texts_in_order = window_texts()
+    try:
+        for text in texts_in_order:
+            if errors:
+                break
+            if text:
+                transcript.append(text)
+                texts.put(text)
+    finally:
+        texts_in_order.close()
+        texts.put(None)
+        worker.join()
+
+    if errors:
+        raise errors[0]
+    return " ".join(transcript), concatenate_wavs(wavs)
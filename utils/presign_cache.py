@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Lifetime of the signed URLs handed out by /temp_url and /temp_urls
+PRESIGN_EXPIRY_SECONDS = int(os.getenv("PRESIGN_EXPIRY_SECONDS", "3600"))
+# A cached URL is re-signed once it has less than this left
+PRESIGN_REFRESH_MARGIN_SECONDS = int(os.getenv("PRESIGN_REFRESH_MARGIN_SECONDS", "300"))
+PRESIGN_CACHE_SIZE = int(os.getenv("PRESIGN_CACHE_SIZE", "10000"))
+
+
+class PresignedURLCache:
+    """
+    LRU cache of presigned GET URLs.
+
+    A URL is reused until it is within PRESIGN_REFRESH_MARGIN_SECONDS of its
+    expiry, so every URL handed out stays valid for at least that long.
+    Entries are dropped when their object is deleted or renamed.
+    """
+
+    def __init__(self, client, expiration=PRESIGN_EXPIRY_SECONDS, refresh_margin=PRESIGN_REFRESH_MARGIN_SECONDS,
+                 max_entries=PRESIGN_CACHE_SIZE):
+        self.client = client
+        self.expiration = expiration
+        self.refresh_margin = min(refresh_margin, expiration // 2)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, bucket_name, s3_key):
+        """Return a presigned URL for the object, signing a new one if the cached one is about to expire."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((bucket_name, s3_key))
+            if entry is not None and entry[1] - now > self.refresh_margin:
+                self._entries.move_to_end((bucket_name, s3_key))
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        url = self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': bucket_name, 'Key': s3_key}, ExpiresIn=self.expiration
+        )
+        with self._lock:
+            self._entries[(bucket_name, s3_key)] = (url, now + self.expiration)
+            self._entries.move_to_end((bucket_name, s3_key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return url
+
+    def invalidate(self, bucket_name, s3_keys):
+        with self._lock:
+            for s3_key in s3_keys:
+                self._entries.pop((bucket_name, s3_key), None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Size limits of the two cache tiers (0 disables a tier)
+RESULT_CACHE_MEMORY_MB = float(os.getenv("RESULT_CACHE_MEMORY_MB", "64"))
+RESULT_CACHE_DISK_MB = float(os.getenv("RESULT_CACHE_DISK_MB", "1024"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(os.getcwd(), "result_cache"))
+
+
+def cache_key(*parts):
+    """Build a cache key from the values that determine a result (hashes, model names, settings)."""
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of processing results with a memory and a disk tier.
+
+    Both tiers are LRU and bounded by total size in bytes. Disk entries survive
+    restarts; their modification time records the last use so the LRU order is
+    rebuilt when the directory is scanned at startup. Disk hits are promoted to
+    the memory tier.
+    """
+
+    def __init__(self, memory_mb=RESULT_CACHE_MEMORY_MB, disk_mb=RESULT_CACHE_DISK_MB, directory=RESULT_CACHE_DIR):
+        self.memory_limit = int(memory_mb * 1024 * 1024)
+        self.disk_limit = int(disk_mb * 1024 * 1024)
+        self.directory = directory
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = OrderedDict()
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.disk_limit > 0:
+            self._scan_disk()
+
+    def get(self, key):
+        """Return the cached bytes for key, or None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+            on_disk = key in self._disk
+
+        if on_disk:
+            try:
+                path = self._path(key)
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path)
+            except OSError:
+                data = None
+            if data is not None:
+                with self._lock:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self.disk_hits += 1
+                    self._store_memory(key, data)
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        """Store bytes under key in both tiers."""
+        with self._lock:
+            self._store_memory(key, data)
+        if self.disk_limit > 0 and len(data) <= self.disk_limit:
+            self._store_disk(key, data)
+
+    def get_json(self, key):
+        data = self.get(key)
+        return json.loads(data) if data is not None else None
+
+    def put_json(self, key, value):
+        self.put(key, json.dumps(value).encode("utf-8"))
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size
+            }
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _store_memory(self, key, data):
+        """Insert into the memory tier; caller holds the lock."""
+        if len(data) > self.memory_limit:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _store_disk(self, key, data):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing result cache entry: {str(e)}")
+            return
+
+        evicted = []
+        with self._lock:
+            self._disk_size -= self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._disk_size += len(data)
+            while self._disk_size > self.disk_limit:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def _scan_disk(self):
+        """Rebuild the disk index, least recently used first."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
@@ -0,0 +1,170 @@
+import atexit
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+from utils.metrics import observe_stage
+
+# Connection pool shared by every thread using the client
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+# Set to a MinIO (or other S3-compatible) URL to use a local stand-in
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+# Background uploads
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "4"))
+S3_UPLOAD_ATTEMPTS = int(os.getenv("S3_UPLOAD_ATTEMPTS", "4"))
+S3_UPLOAD_BACKOFF_SECONDS = float(os.getenv("S3_UPLOAD_BACKOFF_SECONDS", "0.5"))
+# Files above the threshold are sent as multipart uploads with parts of S3_MULTIPART_CHUNK_MB
+S3_MULTIPART_THRESHOLD_MB = float(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8"))
+S3_MULTIPART_CHUNK_MB = float(os.getenv("S3_MULTIPART_CHUNK_MB", "8"))
+
+
+def make_s3_client(region_name=None, aws_access_key_id=None, aws_secret_access_key=None):
+    """Helper function to create the S3 client shared by the whole process (boto3 clients are thread-safe)."""
+    return boto3.client(
+        's3',
+        region_name=region_name,
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_access_key,
+        endpoint_url=S3_ENDPOINT_URL,
+        config=Config(
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            retries={"max_attempts": 5, "mode": "standard"},
+            tcp_keepalive=True
+        )
+    )
+
+
+def s3_url(bucket_name, s3_key):
+    return f"https://{bucket_name}.s3.amazonaws.com/{s3_key}"
+
+
+class S3Uploader:
+    """
+    Background upload executor for in-memory files.
+
+    submit() returns right away with a future resolving to the S3 URL. A pool
+    of S3_UPLOAD_WORKERS threads uploads with upload_fileobj (multipart above
+    S3_MULTIPART_THRESHOLD_MB) and retries failed uploads with exponential
+    backoff. Keys still in flight can be waited for with wait_for_all(), e.g.
+    before presigning a URL for them. Pending uploads are flushed at exit.
+    """
+
+    def __init__(self, client, workers=S3_UPLOAD_WORKERS, attempts=S3_UPLOAD_ATTEMPTS,
+                 backoff=S3_UPLOAD_BACKOFF_SECONDS):
+        self.client = client
+        self.attempts = attempts
+        self.backoff = backoff
+        self.transfer_config = TransferConfig(
+            multipart_threshold=int(S3_MULTIPART_THRESHOLD_MB * 1024 * 1024),
+            multipart_chunksize=int(S3_MULTIPART_CHUNK_MB * 1024 * 1024),
+            # Parallelism comes from the upload pool; nested transfer threads could not
+            # be started while pending uploads are flushed at interpreter exit
+            use_threads=False
+        )
+        self.workers = workers
+        self._executor = None
+        self._pid = None
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.uploaded = 0
+        self.retried = 0
+        self.failed = 0
+        atexit.register(self.shutdown)
+
+    def submit(self, data, bucket_name, s3_key, content_type=None):
+        """
+        Queue bytes for upload to bucket_name/s3_key; return a future for the S3 URL.
+
+        :param data: the bytes, or a callable returning them that runs on the upload
+                     thread (e.g. to transcode the file off the request path)
+        """
+        with self._lock:
+            future = self._pool().submit(self._upload, data, bucket_name, s3_key, content_type)
+            self._in_flight[(bucket_name, s3_key)] = future
+        future.add_done_callback(lambda _: self._forget(bucket_name, s3_key, future))
+        return future
+
+    def _pool(self):
+        """The upload threads of this process, created on first use (again after a fork)."""
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="s3-upload")
+            self._pid = os.getpid()
+            # Uploads started before the fork belong to the parent
+            self._in_flight = {}
+        return self._executor
+
+    def _forget(self, bucket_name, s3_key, future):
+        with self._lock:
+            if self._in_flight.get((bucket_name, s3_key)) is future:
+                del self._in_flight[(bucket_name, s3_key)]
+
+    def _upload(self, data, bucket_name, s3_key, content_type):
+        if callable(data):
+            try:
+                data = data()
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"Error preparing {s3_key} for upload: {str(e)}")
+                raise
+        extra_args = {"ContentType": content_type} if content_type else None
+
+        for attempt in range(1, self.attempts + 1):
+            try:
+                upload_start = time.perf_counter()
+                self.client.upload_fileobj(io.BytesIO(data), bucket_name, s3_key, ExtraArgs=extra_args,
+                                           Config=self.transfer_config)
+                observe_stage("s3_upload", time.perf_counter() - upload_start)
+                url = s3_url(bucket_name, s3_key)
+                with self._lock:
+                    self.uploaded += 1
+                print(f"File uploaded successfully: {url}")
+                return url
+            except Exception as e:
+                if attempt == self.attempts:
+                    with self._lock:
+                        self.failed += 1
+                    print(f"Error uploading {s3_key} to S3 after {attempt} attempts: {str(e)}")
+                    raise
+                with self._lock:
+                    self.retried += 1
+                delay = self.backoff * 2 ** (attempt - 1)
+                print(f"Upload of {s3_key} failed ({str(e)}), retrying in {delay:.1f} seconds")
+                time.sleep(delay)
+
+    def wait_for_all(self, bucket_name, s3_keys, timeout=None):
+        """Block until the pending uploads of these keys have finished, with one deadline for all of them."""
+        with self._lock:
+            futures = [self._in_flight[(bucket_name, s3_key)] for s3_key in s3_keys
+                       if (bucket_name, s3_key) in self._in_flight]
+        if futures:
+            wait(futures, timeout)
+
+    def is_pending(self, bucket_name, s3_key):
+        """True while an upload of this key is queued or running in this process."""
+        with self._lock:
+            return (bucket_name, s3_key) in self._in_flight
+
+    def pending(self):
+        with self._lock:
+            return len(self._in_flight)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._in_flight),
+                "uploaded": self.uploaded,
+                "retried": self.retried,
+                "failed": self.failed
+            }
+
+    def shutdown(self):
+        """Finish the queued uploads."""
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+
+# Number of speaker references kept across requests (0 = only reuse within a request)
+SPEAKER_CACHE_SIZE = int(os.getenv("SPEAKER_CACHE_SIZE", "32"))
+# Rate XTTS loads speaker references at (XttsAudioConfig.sample_rate)
+XTTS_REFERENCE_SAMPLE_RATE = 22050
+
+
+def audio_digest(audio_bytes):
+    """Return the content hash used to identify a reference recording."""
+    return hashlib.sha256(audio_bytes).hexdigest()
+
+
+def reference_sample_rate(model):
+    """Sample rate XTTS expects speaker references at (the model's config.audio.sample_rate)."""
+    audio_config = getattr(model.config, "audio", None)
+    return getattr(audio_config, "sample_rate", XTTS_REFERENCE_SAMPLE_RATE)
+
+
+def compute_conditioning_latents(model, audio, sample_rate):
+    """
+    Compute XTTS (gpt_cond_latent, speaker_embedding) from samples in memory.
+
+    Mirrors Xtts.get_conditioning_latents without reading the reference from
+    disk, with the reference settings of the model config (max_ref_len,
+    gpt_cond_len, gpt_cond_chunk_len, sound_norm_refs) that tts_to_file uses.
+    Pass the reference at reference_sample_rate(model), like the file XTTS
+    would load: the encoders resample it, but cannot restore a band that a
+    lower rate has already cut off.
+    """
+    config = model.config
+    reference = audio[:int(sample_rate * config.max_ref_len)]
+    with torch.inference_mode():
+        wav = torch.from_numpy(reference).float().unsqueeze(0).to(model.device)
+        if config.sound_norm_refs:
+            wav = (wav / torch.abs(wav).max()) * 0.75
+        speaker_embedding = model.get_speaker_embedding(wav, sample_rate)
+        gpt_cond_latent = model.get_gpt_cond_latents(
+            wav, sample_rate, length=config.gpt_cond_len, chunk_length=config.gpt_cond_chunk_len
+        )
+    return gpt_cond_latent, speaker_embedding
+
+
+class SpeakerLatentCache:
+    """
+    LRU cache of XTTS speaker conditioning latents.
+
+    Entries are keyed by the content hash of the reference audio, so the same
+    recording is only conditioned once. Each user_id also points at the last
+    reference it used; when a user uploads a new recording, the previous entry
+    is dropped unless another user still refers to it.
+    """
+
+    def __init__(self, max_entries=SPEAKER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._user_digests = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_latents(self, model, audio, sample_rate, digest, user_id=None):
+        """
+        Return (gpt_cond_latent, speaker_embedding) for the reference audio.
+
+        :param model: the XTTS model (tts.synthesizer.tts_model)
+        :param audio: reference samples as a float32 array
+        :param sample_rate: sample rate of `audio`
+        :param digest: audio_digest() of the uploaded file
+        :param user_id: optional owner of the reference
+        """
+        with self._lock:
+            latents = self._entries.get(digest)
+            if latents is not None:
+                self._entries.move_to_end(digest)
+                self._remember_user(user_id, digest)
+                self.hits += 1
+                return latents
+            self.misses += 1
+
+        # Conditioning is the expensive part, keep it outside the lock
+        latents = compute_conditioning_latents(model, audio, sample_rate)
+
+        with self._lock:
+            if self.max_entries > 0:
+                self._entries[digest] = latents
+                self._entries.move_to_end(digest)
+                self._remember_user(user_id, digest)
+                while len(self._entries) > self.max_entries:
+                    self._evict(next(iter(self._entries)))
+        return latents
+
+    def invalidate_user(self, user_id, keep=None):
+        """
+        Drop the cached reference of a user, e.g. after their recordings are deleted.
+
+        :param keep: digest of a reference to leave in place (the one just uploaded)
+        """
+        with self._lock:
+            digest = self._user_digests.get(user_id)
+            if digest is None or digest == keep:
+                return
+            del self._user_digests[user_id]
+            if digest not in self._user_digests.values():
+                self._entries.pop(digest, None)
+
+    def stats(self):
+        """Return cache size and hit/miss counters."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _remember_user(self, user_id, digest):
+        if user_id is None:
+            return
+        previous = self._user_digests.get(user_id)
+        self._user_digests[user_id] = digest
+        if previous and previous != digest and previous not in self._user_digests.values():
+            self._entries.pop(previous, None)
+
+    def _evict(self, digest):
+        self._entries.pop(digest, None)
+        for user_id in [u for u, d in self._user_digests.items() if d == digest]:
+            del self._user_digests[user_id]
@@ -0,0 +1,228 @@
+import os
+import queue
+import threading
+
+import numpy as np
+from flask import request
+from flask_socketio import Namespace
+
+from utils.vad import EnergyVAD
+
+# Whisper always works on 16 kHz mono audio
+WHISPER_SAMPLE_RATE = 16000
+
+# Streaming settings (seconds unless noted)
+STREAM_WINDOW_SECONDS = float(os.getenv("STREAM_WINDOW_SECONDS", "15"))
+STREAM_STEP_SECONDS = float(os.getenv("STREAM_STEP_SECONDS", "1.0"))
+STREAM_HOLDBACK_SECONDS = float(os.getenv("STREAM_HOLDBACK_SECONDS", "1.0"))
+STREAM_ENDPOINT_MS = int(os.getenv("STREAM_ENDPOINT_MS", "700"))
+STREAM_PREROLL_MS = 300
+
+
+def pcm16_to_float(frame_bytes):
+    """Helper function to convert little-endian 16-bit PCM bytes to float32 samples."""
+    return np.frombuffer(frame_bytes, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def resample_linear(audio, source_rate, target_rate=WHISPER_SAMPLE_RATE):
+    """Helper function to resample a mono buffer with linear interpolation."""
+    if source_rate == target_rate or len(audio) == 0:
+        return audio
+    target_length = int(round(len(audio) * target_rate / source_rate))
+    positions = np.linspace(0, len(audio) - 1, num=target_length)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+class StreamingTranscriber:
+    """
+    Incremental transcription of one live audio stream.
+
+    Audio is segmented into utterances with an energy VAD. While an utterance
+    is in progress, only the uncommitted tail (at most STREAM_WINDOW_SECONDS)
+    is decoded every STREAM_STEP_SECONDS. Segments that end before the last
+    STREAM_HOLDBACK_SECONDS are committed and cut from the window, so the
+    final decode at the end of an utterance only covers the last window.
+    """
+
+    def __init__(self, transcribe, window_seconds=STREAM_WINDOW_SECONDS, step_seconds=STREAM_STEP_SECONDS,
+                 holdback_seconds=STREAM_HOLDBACK_SECONDS, endpoint_ms=STREAM_ENDPOINT_MS):
+        """
+        :param transcribe: callable(audio, initial_prompt) returning a Whisper result dict
+        """
+        self.transcribe = transcribe
+        self.window_samples = int(window_seconds * WHISPER_SAMPLE_RATE)
+        self.step_samples = int(step_seconds * WHISPER_SAMPLE_RATE)
+        self.holdback_samples = int(holdback_seconds * WHISPER_SAMPLE_RATE)
+        self.endpoint_samples = int(endpoint_ms * WHISPER_SAMPLE_RATE / 1000)
+        self.preroll_samples = int(STREAM_PREROLL_MS * WHISPER_SAMPLE_RATE / 1000)
+        self.vad = EnergyVAD(WHISPER_SAMPLE_RATE)
+        self._unframed = np.zeros(0, dtype=np.float32)
+        self._reset()
+
+    def _reset(self):
+        self._window = np.zeros(0, dtype=np.float32)
+        self._in_speech = False
+        self._silence_samples = 0
+        self._since_decode = 0
+        self._committed = []
+
+    def feed(self, audio):
+        """
+        Add 16 kHz float32 audio and return a list of (kind, text) events,
+        where kind is 'partial' or 'final'.
+        """
+        events = []
+        self._unframed = np.concatenate([self._unframed, audio])
+        speech = self.vad.process(self._unframed)
+        framed = len(speech) * self.vad.frame_length
+        frames, self._unframed = self._unframed[:framed], self._unframed[framed:]
+
+        for index, is_speech in enumerate(speech):
+            frame = frames[index * self.vad.frame_length:(index + 1) * self.vad.frame_length]
+            self._window = np.concatenate([self._window, frame])
+
+            if is_speech:
+                self._in_speech = True
+                self._silence_samples = 0
+            elif self._in_speech:
+                self._silence_samples += len(frame)
+            else:
+                # Keep a short pre-roll so the first syllable is not clipped
+                self._window = self._window[-self.preroll_samples:]
+                continue
+
+            self._since_decode += len(frame)
+            if self._silence_samples >= self.endpoint_samples:
+                text = self.finish()
+                if text:
+                    events.append(("final", text))
+            elif self._since_decode >= self.step_samples:
+                events.append(("partial", self._decode_partial()))
+        return events
+
+    def finish(self):
+        """Decode what is left of the current utterance and return its full text."""
+        if self._in_speech and len(self._window):
+            result = self.transcribe(self._window, self._prompt())
+            self._committed.extend(segment["text"].strip() for segment in result["segments"])
+        text = " ".join(piece for piece in self._committed if piece)
+        self._reset()
+        return text
+
+    def _prompt(self):
+        return " ".join(self._committed[-3:]) or None
+
+    def _decode_partial(self):
+        self._since_decode = 0
+        result = self.transcribe(self._window, self._prompt())
+        segments = result["segments"]
+
+        # Commit segments that are safely behind the live edge and drop their audio
+        stable_end = len(self._window) - self.holdback_samples
+        cut = 0
+        tentative = []
+        for index, segment in enumerate(segments):
+            end = int(segment["end"] * WHISPER_SAMPLE_RATE)
+            last_segment = index == len(segments) - 1
+            window_full = len(self._window) >= self.window_samples
+            if end <= stable_end and (not last_segment or window_full):
+                self._committed.append(segment["text"].strip())
+                cut = end
+            else:
+                tentative.append(segment["text"].strip())
+        if cut:
+            self._window = self._window[cut:]
+        elif len(self._window) > self.window_samples:
+            # Nothing could be committed, keep the window bounded anyway
+            self._window = self._window[-self.window_samples:]
+
+        return " ".join(piece for piece in self._committed + tentative if piece)
+
+
+class TranscriptionNamespace(Namespace):
+    """
+    Socket.IO namespace for live microphone transcription.
+
+    Client protocol:
+        'start' {"sample_rate": 48000}   begin a stream (default 16000 Hz)
+        'audio' <bytes>                  little-endian 16-bit mono PCM frames
+        'stop'                           flush the last utterance
+    Server events:
+        'partial' {"text": ...}          running transcript of the current utterance
+        'final'   {"text": ...}          transcript of a completed utterance
+    """
+
+    def __init__(self, namespace, get_model, model_lock=None):
+        """
+        :param get_model: callable returning the Whisper model
+        """
+        super().__init__(namespace)
+        self.get_model = get_model
+        self.model_lock = model_lock or threading.Lock()
+        self.sessions = {}
+
+    def _transcribe(self, audio, initial_prompt):
+        model = self.get_model()
+        with self.model_lock:
+            return model.transcribe(
+                audio, language='en', initial_prompt=initial_prompt, condition_on_previous_text=False
+            )
+
+    def on_start(self, data=None):
+        sample_rate = int((data or {}).get("sample_rate", WHISPER_SAMPLE_RATE))
+        self._close(request.sid)
+        frames = queue.Queue()
+        self.sessions[request.sid] = (frames, sample_rate)
+        # One worker per stream keeps frames in order and decoding off the socket thread
+        threading.Thread(
+            target=self._run_session, args=(request.sid, frames, sample_rate), daemon=True
+        ).start()
+
+    def on_audio(self, frame_bytes):
+        session = self.sessions.get(request.sid)
+        if session is None:
+            self.emit('error', {"error": "Send 'start' before streaming audio"}, room=request.sid)
+            return
+        session[0].put(frame_bytes)
+
+    def on_stop(self, data=None):
+        self._close(request.sid)
+
+    def on_disconnect(self, *args):
+        self._close(request.sid)
+
+    def _close(self, sid):
+        session = self.sessions.pop(sid, None)
+        if session is not None:
+            session[0].put(None)
+
+    def _run_session(self, sid, frames, sample_rate):
+        transcriber = StreamingTranscriber(self._transcribe)
+        while True:
+            frame_bytes = frames.get()
+            stopped = frame_bytes is None
+            chunks = [] if stopped else [frame_bytes]
+            # Drain everything that arrived while the last decode was running
+            while not stopped:
+                try:
+                    frame_bytes = frames.get_nowait()
+                except queue.Empty:
+                    break
+                if frame_bytes is None:
+                    stopped = True
+                else:
+                    chunks.append(frame_bytes)
+
+            try:
+                if chunks:
+                    audio = resample_linear(pcm16_to_float(b"".join(chunks)), sample_rate)
+                    for kind, text in transcriber.feed(audio):
+                        self.emit(kind, {"text": text}, room=sid)
+                if stopped:
+                    text = transcriber.finish()
+                    if text:
+                        self.emit('final', {"text": text}, room=sid)
+                    return
+            except Exception as e:
+                self.emit('error', {"error": str(e)}, room=sid)
+                return
@@ -0,0 +1,141 @@
+from bisect import bisect_left
+import re
+
+# Cut points: the space after a sentence end (. ! ? or …, plus closing quotes/brackets),
+# or after a clause end (, ; : or a dash)
+SENTENCE_END_PATTERN = re.compile(r'[.!?…]["\'”’)\]]*(?= )')
+CLAUSE_END_PATTERN = re.compile(r'[,;:—–](?= )')
+
+# XTTS refuses inputs longer than gpt_max_text_tokens (402 for xtts_v2)
+XTTS_DEFAULT_MAX_TOKENS = 402
+# Cost of ending a chunk at a clause or between two words rather than at a sentence end,
+# as the distance from the even share (fraction of it) that would cost as much
+CLAUSE_CUT_PENALTY = 0.1
+WORD_CUT_PENALTY = 0.3
+# Headroom for the language tag and BPE merges across a chunk
+TOKEN_MARGIN = 8
+
+
+def xtts_limits(model, language):
+    """
+    Helper function to read the chunking limits of an XTTS model for a language.
+
+    Returns (count_tokens, max_tokens, max_chars): a callable counting tokens with
+    the model's own tokenizer, the GPT text token limit and the per-language
+    character limit XTTS warns about. Models without a tokenizer fall back to
+    character counts.
+    """
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return None, None, None
+
+    max_tokens = getattr(getattr(model, "args", None), "gpt_max_text_tokens", XTTS_DEFAULT_MAX_TOKENS)
+    max_chars = getattr(tokenizer, "char_limits", {}).get(language.split("-")[0])
+
+    def count_tokens(text):
+        return len(tokenizer.encode(text, lang=language))
+
+    return count_tokens, max_tokens - TOKEN_MARGIN, max_chars
+
+
+def _split(text, max_length):
+    """
+    Helper function to split whitespace-normalised text into the fewest chunks
+    of at most max_length characters, cutting at sentence ends, then clauses,
+    then between words.
+    """
+    n = len(text)
+
+    def furthest(start):
+        # End (a space, or the end of the text) of the longest chunk starting at start
+        if n - start <= max_length:
+            return n
+        end = text.rfind(" ", start, start + max_length + 1)
+        if end < 0:
+            # A single word longer than the limit gets a chunk of its own
+            end = text.find(" ", start + max_length)
+        return n if end < 0 else end
+
+    def earliest(end):
+        # Start of the longest chunk ending at end
+        if end <= max_length:
+            return 0
+        space = text.find(" ", end - max_length - 1, end)
+        if space < 0:
+            space = text.rfind(" ", 0, end)
+        return space + 1
+
+    # Packing greedily from the start gives the fewest chunks and the latest each cut can be
+    latest = [furthest(0)]
+    while latest[-1] < n:
+        latest.append(furthest(latest[-1] + 1))
+    count = len(latest)
+    if count == 1:
+        return [text]
+
+    # Packing greedily from the end gives the earliest each cut can be without adding a chunk
+    lowest = [0] * count
+    end = n
+    for index in range(count - 2, -1, -1):
+        end = earliest(end) - 1
+        lowest[index] = end
+
+    sentence_cuts = [match.end() for match in SENTENCE_END_PATTERN.finditer(text)]
+    clause_cuts = [match.end() for match in CLAUSE_END_PATTERN.finditer(text)]
+    share = n / count
+    penalties = ((sentence_cuts, 0.0), (clause_cuts, CLAUSE_CUT_PENALTY * share))
+
+    chunks = []
+    start = 0
+    for index in range(count - 1):
+        high = furthest(start)
+        low = min(lowest[index], high)
+        # Aim for an even share of what is left, so there is no short tail either
+        remaining = count - index
+        ideal = start + (n - start - remaining + 1) / remaining
+        aim = min(max(ideal, low), high)
+
+        before = text.rfind(" ", low, int(aim) + 1)
+        after = text.find(" ", int(aim), high + 1)
+        candidates = [(abs(cut - ideal) + WORD_CUT_PENALTY * share, cut) for cut in (before, after) if cut >= 0]
+        for cuts, penalty in penalties:
+            position = bisect_left(cuts, aim)
+            for cut in cuts[max(position - 1, 0):position + 1]:
+                if low <= cut <= high:
+                    candidates.append((abs(cut - ideal) + penalty, cut))
+        cut = min(candidates)[1]
+        chunks.append(text[start:cut])
+        start = cut + 1
+    chunks.append(text[start:])
+    return chunks
+
+
+def chunk_text(text, max_length=250, count_tokens=None, max_tokens=None):
+    """
+    Helper function to split text into TTS chunks at sentence and clause boundaries.
+
+    Chunks stay within max_length characters and, when count_tokens is given,
+    max_tokens tokens. The text is split into as few chunks as the greedy word
+    packer makes, and each cut is placed, among the positions that keep that
+    count, at a sentence end, else a clause, else between words, as close to an
+    even share of the text as it can (so there is no short tail chunk either).
+    Runs in time linear in the length of the text. The tokenizer only sees
+    finished chunks, which are already within the character limit; a chunk
+    over the token budget is split again with a proportionally smaller limit.
+    """
+    text = " ".join(text.split())
+    if not text:
+        return []
+
+    chunks = _split(text, max_length)
+    if count_tokens is None or not max_tokens:
+        return chunks
+
+    checked = []
+    for chunk in chunks:
+        tokens = count_tokens(chunk)
+        if tokens <= max_tokens or " " not in chunk:
+            checked.append(chunk)
+        else:
+            checked.extend(chunk_text(chunk, len(chunk) * max_tokens // tokens, count_tokens, max_tokens))
+    return checked
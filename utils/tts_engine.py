@@ -0,0 +1,148 @@
+import os
+import queue
+import threading
+
+import numpy as np
+
+from utils.metrics import stage
+
+# Maximum number of text chunks drained from the queue and ordered together in one worker pass
+TTS_MAX_ROUND_CHUNKS = int(os.getenv("TTS_MAX_ROUND_CHUNKS", "32"))
+
+# Sampling settings Xtts.synthesize (behind tts_to_file) takes from the model config
+CONFIG_INFERENCE_SETTINGS = ("temperature", "length_penalty", "repetition_penalty", "top_k", "top_p",
+                             "enable_text_splitting")
+
+
+def inference_settings(model, options=None):
+    """Helper function to merge per-request inference() options over the model config's sampling settings."""
+    settings = {key: getattr(model.config, key) for key in CONFIG_INFERENCE_SETTINGS if hasattr(model.config, key)}
+    settings.update(options or {})
+    return settings
+
+
+def concatenate_wavs(wavs):
+    """Helper function to join waveforms into one preallocated float32 buffer."""
+    total_length = sum(len(wav) for wav in wavs)
+    output = np.empty(total_length, dtype=np.float32)
+
+    offset = 0
+    for wav in wavs:
+        output[offset:offset + len(wav)] = wav
+        offset += len(wav)
+    return output
+
+
+class _SynthesisJob:
+    """Chunks of one request waiting for synthesis."""
+
+    def __init__(self, chunks, gpt_cond_latent, speaker_embedding, language, options, on_chunk, trace):
+        self.chunks = chunks
+        self.gpt_cond_latent = gpt_cond_latent
+        self.speaker_embedding = speaker_embedding
+        self.language = language
+        self.options = options
+        self.on_chunk = on_chunk
+        self.trace = trace
+        self.wavs = []
+        self.error = None
+        self.done = threading.Event()
+
+
+class SynthesisExecutor:
+    """
+    Single worker that owns the XTTS model and runs every request's TTS chunks,
+    one inference() call at a time.
+
+    This serialises synthesis; it does not batch it. XTTS inference() takes one
+    text per call, so chunks are never run together on the GPU. What the
+    executor adds over a lock is ordering: the worker drains every job that is
+    waiting (up to TTS_MAX_ROUND_CHUNKS chunks) and runs them shortest job
+    first, so a short request does not wait behind a long dictation that
+    arrived just before it. Chunks use the sampling settings of the model
+    config unless a request overrides them. Results are kept as NumPy arrays
+    and joined with concatenate_wavs, no temp files involved.
+    """
+
+    def __init__(self, get_model, max_round_chunks=TTS_MAX_ROUND_CHUNKS):
+        """
+        :param get_model: callable returning the XTTS model (tts.synthesizer.tts_model)
+        """
+        self.get_model = get_model
+        self.max_round_chunks = max_round_chunks
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def synthesize(self, chunks, gpt_cond_latent, speaker_embedding, language="en", options=None, on_chunk=None,
+                   trace=None):
+        """
+        Synthesize all chunks of a request and return a single float32 waveform.
+
+        :param options: inference() keyword arguments overriding the model config (temperature, top_k, speed, ...)
+        :param on_chunk: optional callback(index, wav) invoked from the worker as
+                         soon as each chunk is ready, used for streaming
+        :param trace: optional metrics Trace receiving the per-chunk and concatenation times
+        """
+        if not chunks:
+            return np.zeros(0, dtype=np.float32)
+
+        job = _SynthesisJob(chunks, gpt_cond_latent, speaker_embedding, language, options or {}, on_chunk, trace)
+        self._ensure_worker()
+        self._queue.put(job)
+        job.done.wait()
+
+        if job.error is not None:
+            raise job.error
+        with stage("concatenate", trace):
+            return concatenate_wavs(job.wavs)
+
+    def depth(self):
+        """Number of requests waiting for the worker."""
+        return self._queue.qsize()
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="tts-executor", daemon=True)
+                self._worker.start()
+
+    def _next_round(self):
+        """Block for one job, then take whatever else is already waiting."""
+        jobs = [self._queue.get()]
+        round_chunks = len(jobs[0].chunks)
+        while round_chunks < self.max_round_chunks:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            jobs.append(job)
+            round_chunks += len(job.chunks)
+        return jobs
+
+    def _run(self):
+        while True:
+            jobs = self._next_round()
+            # Short requests first so a long dictation does not hold them back
+            jobs.sort(key=lambda job: sum(len(chunk) for chunk in job.chunks))
+            for job in jobs:
+                try:
+                    model = self.get_model()
+                    settings = inference_settings(model, job.options)
+                    for index, chunk in enumerate(job.chunks):
+                        with stage("tts_chunk", job.trace):
+                            output = model.inference(
+                                text=chunk,
+                                language=job.language,
+                                gpt_cond_latent=job.gpt_cond_latent,
+                                speaker_embedding=job.speaker_embedding,
+                                **settings
+                            )
+                        wav = np.asarray(output["wav"], dtype=np.float32).reshape(-1)
+                        job.wavs.append(wav)
+                        if job.on_chunk is not None:
+                            job.on_chunk(index, wav)
+                except Exception as e:
+                    job.error = e
+                finally:
+                    job.done.set()
@@ -1,26 +1,173 @@
+import atexit
 import json
 import os
+import threading
 from flask import request, jsonify
 
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, cross-process locking is skipped there
+    fcntl = None
+
 # Define the path to the user storage file (JSON format)
 USER_STORAGE_FILE = "user_details.json"
+# Changes are appended here right away and folded into USER_STORAGE_FILE on flush
+USER_JOURNAL_FILE = f"{USER_STORAGE_FILE}.journal"
+# How long (seconds) changes may sit in the journal before the snapshot is rewritten
+USER_STORE_FLUSH_SECONDS = float(os.getenv("USER_STORE_FLUSH_SECONDS", "5"))
 
-def load_user_data():
-    """Load existing user details from the storage file."""
-    if os.path.exists(USER_STORAGE_FILE):
-        with open(USER_STORAGE_FILE, 'r') as f:
+
+class UserStore:
+    """
+    In-memory index of user details backed by a snapshot file and a journal.
+
+    Lookups are dict hits. Every update is appended to the journal as one JSON
+    line (durable immediately) and the full snapshot is only rewritten by a
+    write-behind flush, atomically via os.replace, which then empties the
+    journal. Writers in different processes serialize on an flock, and since
+    every change touches the journal, each process reloads its index when the
+    journal changed on disk (one stat per lookup), so all workers see the
+    same data. A process that never writes never flushes or takes the lock.
+    """
+
+    def __init__(self, path=USER_STORAGE_FILE, journal_path=USER_JOURNAL_FILE,
+                 flush_seconds=USER_STORE_FLUSH_SECONDS):
+        self.path = path
+        self.journal_path = journal_path
+        self.lock_path = f"{path}.lock"
+        self.flush_seconds = flush_seconds
+        self._lock = threading.RLock()
+        self._data = {}
+        # Journal signature the index was loaded at; None would mean "no journal"
+        self._signature = ()
+        self._flush_timer = None
+        # Journal entries written by this process that are not in the snapshot yet
+        self._dirty = False
+        atexit.register(self.flush)
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _truncate_journal(self):
+        """Empty the journal (creating it if needed), which tells other processes to reload."""
+        with open(self.journal_path, 'w') as f:
+            os.fsync(f.fileno())
+
+    def _process_lock(self):
+        """Exclusive lock shared by every process using the same storage file."""
+        lock_file = open(self.lock_path, 'a')
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _reload_if_changed(self):
+        """Re-read snapshot and journal if another process changed them."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature == self._signature:
+                return
+            data = {}
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    try:
+                        data = json.load(f)
+                    except json.JSONDecodeError:
+                        # Handle the case where the file is empty or contains invalid JSON
+                        data = {}
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, 'r') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A torn last line from a crash, everything before it is intact
+                            continue
+                        data[entry["user_id"]] = entry["details"]
+            self._data = data
+            self._signature = signature
+
+    def get(self, user_id):
+        """Return the details of a user, or None."""
+        self._reload_if_changed()
+        return self._data.get(user_id)
+
+    def snapshot(self):
+        """Return a copy of all user details."""
+        self._reload_if_changed()
+        with self._lock:
+            return dict(self._data)
+
+    def put(self, user_id, details):
+        """Store the details of one user."""
+        with self._lock:
+            lock_file = self._process_lock()
             try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                # Handle the case where the file is empty or contains invalid JSON
-                return {}
-    return {}
+                self._reload_if_changed()
+                with open(self.journal_path, 'a') as f:
+                    f.write(json.dumps({"user_id": user_id, "details": details}) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._data[user_id] = details
+                self._signature = self._file_signature()
+                self._dirty = True
+            finally:
+                lock_file.close()
+            self._schedule_flush()
+
+    def replace_all(self, data):
+        """Replace every stored user and write the snapshot right away."""
+        with self._lock:
+            self._data = dict(data)
+            self.flush(force=True)
+
+    def _schedule_flush(self):
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_seconds, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self, force=False):
+        """Fold the journal into the snapshot file (atomic replace) and truncate the journal."""
+        with self._lock:
+            self._flush_timer = None
+            if not force and not self._dirty:
+                return
+            lock_file = self._process_lock()
+            try:
+                if not force:
+                    self._reload_if_changed()
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(self._data, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._truncate_journal()
+                self._signature = self._file_signature()
+                self._dirty = False
+            except Exception as e:
+                print(f"Error flushing user details: {str(e)}")
+            finally:
+                lock_file.close()
+
+
+user_store = UserStore()
+
+
+def load_user_data():
+    """Load existing user details (a copy of the in-memory index)."""
+    return user_store.snapshot()
 
 
 def save_user_data(data):
     """Save updated user details to the storage file."""
-    with open(USER_STORAGE_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    user_store.replace_all(data)
 
 def store_user():
     """Store Google login details and create a user ID."""
@@ -32,15 +179,12 @@ def store_user():
     if 'uid' not in user_data and 'sub' not in user_data:
     	return jsonify({"error": "Missing both 'uid' and 'sub' fields in user data"}), 400
 
-    
+
     # Generate a unique user_id
     user_id = f"user-{user_data['uid']}"
 
-    # Load existing user data
-    stored_data = load_user_data() 
-    
     # Update or add new user details
-    stored_data[user_id] ={
+    details = {
     "providerId": user_data.get("providerId"),
     "uid": user_data.get("uid"),
     "displayName": user_data.get("displayName"),
@@ -50,14 +194,14 @@ def store_user():
     #"user_id": user_data.get("user_id")
     "user_id": user_data.get("user_id") if 'user_id' in user_data else user_id  # Set user_id to a generated ID if missing
     }
-    
-    
-    # Save the updated data to the storage file
-    save_user_data(stored_data)
+
+
+    # Journal the change; the storage file is rewritten in the background
+    user_store.put(user_id, details)
 
     return jsonify({
         "message": "User details stored successfully",
         #"user_id": user_id,
-        "stored_data": stored_data[user_id]
+        "stored_data": details
     }), 200
 #====================================================================================
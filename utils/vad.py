@@ -0,0 +1,181 @@
+import os
+
+import numpy as np
+
+# Length of one VAD analysis frame
+VAD_FRAME_MS = 30
+# "0" sends whole recordings to Whisper; otherwise leading/trailing silence is dropped
+# and longer pauses are shortened to VAD_KEEP_PAUSE_MS (Whisper's cost grows with length)
+VAD_TRIM = os.getenv("VAD_TRIM", "1") != "0"
+VAD_KEEP_PAUSE_MS = int(os.getenv("VAD_KEEP_PAUSE_MS", "400"))
+# Length of the stretch of speech used as the XTTS speaker reference
+REFERENCE_SECONDS = float(os.getenv("REFERENCE_SECONDS", "10"))
+# Samples at or above this level count as clipped
+CLIP_LEVEL = 0.99
+
+
+class EnergyVAD:
+    """
+    Lightweight energy-based voice activity detector.
+
+    Frame energy is compared against a running noise-floor estimate that drops
+    immediately to quieter frames and rises slowly (very slowly during speech),
+    so it adapts to background noise without following the speaker. The
+    detector keeps its state between calls and can be fed audio incrementally.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=VAD_FRAME_MS, threshold_db=12.0, min_energy_db=-50.0):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.threshold_db = threshold_db
+        self.min_energy_db = min_energy_db
+        self.noise_db = None
+
+    def process(self, audio):
+        """
+        Classify whole frames of a float32 mono buffer.
+
+        Trailing samples that do not fill a frame are ignored; the caller keeps
+        them for the next call. Returns a boolean array, one entry per frame.
+        """
+        frame_count = len(audio) // self.frame_length
+        if frame_count == 0:
+            return np.zeros(0, dtype=bool)
+
+        frames = np.asarray(audio[:frame_count * self.frame_length], dtype=np.float32)
+        frames = frames.reshape(frame_count, self.frame_length)
+        energies = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+        speech = np.zeros(frame_count, dtype=bool)
+        for index, energy in enumerate(energies):
+            if self.noise_db is None or energy < self.noise_db:
+                self.noise_db = energy
+            is_speech = energy > max(self.noise_db + self.threshold_db, self.min_energy_db)
+            # Creep up slowly, and much more slowly while someone is talking
+            self.noise_db += (energy - self.noise_db) * (0.0005 if is_speech else 0.01)
+            speech[index] = is_speech
+        return speech
+
+
+def speech_spans(audio, sample_rate=16000, min_silence_ms=300, pad_ms=100):
+    """
+    Helper function to find the spans of a recording that contain speech.
+
+    Gaps shorter than min_silence_ms are bridged and every span is padded by
+    pad_ms on both sides. Returns a list of (start_sample, end_sample) tuples.
+    """
+    vad = EnergyVAD(sample_rate)
+    speech = vad.process(audio)
+    frame_length = vad.frame_length
+    max_gap = max(1, int(min_silence_ms / VAD_FRAME_MS))
+    pad = int(sample_rate * pad_ms / 1000)
+
+    spans = []
+    start = None
+    last_speech = None
+    for index, is_speech in enumerate(speech):
+        if not is_speech:
+            continue
+        if start is None:
+            start = index
+        elif index - last_speech > max_gap:
+            spans.append((start, last_speech + 1))
+            start = index
+        last_speech = index
+    if start is not None:
+        spans.append((start, last_speech + 1))
+
+    return [
+        (max(0, begin * frame_length - pad), min(len(audio), end * frame_length + pad))
+        for begin, end in spans
+    ]
+
+
+def split_on_silence(audio, sample_rate=16000, max_seconds=30):
+    """
+    Helper function to cut a recording into windows of at most max_seconds.
+
+    Cuts are placed in the middle of the silent gaps between speech spans;
+    a single span longer than max_seconds is cut hard. Silence before the
+    first and after the last span is left out. When no speech is found
+    (steady or low-SNR audio) the whole recording is cut into fixed-length
+    windows, leaving the decision to Whisper. Returns (start, end) tuples.
+    """
+    max_samples = int(max_seconds * sample_rate)
+    windows = []
+    window_start = None
+    window_end = None
+
+    spans = speech_spans(audio, sample_rate)
+    if not spans and len(audio):
+        spans = [(0, len(audio))]
+
+    for start, end in spans:
+        if window_start is not None and end - window_start > max_samples:
+            windows.append((window_start, window_end))
+            window_start = None
+        if window_start is None:
+            window_start = start
+        window_end = end
+        while window_end - window_start > max_samples:
+            windows.append((window_start, window_start + max_samples))
+            window_start += max_samples
+
+    if window_start is not None:
+        windows.append((window_start, window_end))
+    return windows
+
+
+def trim_silence(audio, sample_rate=16000, keep_pause_ms=VAD_KEEP_PAUSE_MS):
+    """
+    Helper function to drop leading and trailing silence and shorten long pauses.
+
+    Pauses longer than keep_pause_ms keep that much of their own audio (half
+    on each side), so Whisper still hears the sentence breaks. Returns
+    (trimmed_audio, spans); when no speech is found the recording is returned
+    as it is, leaving the decision to Whisper.
+    """
+    spans = speech_spans(audio, sample_rate)
+    if not spans:
+        return audio, []
+
+    keep = int(sample_rate * keep_pause_ms / 1000)
+    ranges = []
+    for start, end in spans:
+        if ranges and start - ranges[-1][1] <= keep:
+            ranges[-1] = (ranges[-1][0], end)
+            continue
+        if ranges:
+            ranges[-1] = (ranges[-1][0], ranges[-1][1] + keep // 2)
+            start -= keep - keep // 2
+        ranges.append((start, end))
+
+    if len(ranges) == 1 and ranges[0] == (0, len(audio)):
+        return audio, spans
+    return np.concatenate([audio[start:end] for start, end in ranges]), spans
+
+
+def reference_window(audio, sample_rate=16000, seconds=REFERENCE_SECONDS):
+    """
+    Helper function to pick a short, clean speaker reference for voice cloning.
+
+    Returns the stretch of `seconds` with the most speech frames and the
+    fewest clipped frames (expects silence to be trimmed already). Shorter
+    recordings are returned whole.
+    """
+    length = int(seconds * sample_rate)
+    if len(audio) <= length:
+        return audio
+
+    vad = EnergyVAD(sample_rate)
+    speech = vad.process(audio)
+    frame_count = len(speech)
+    frames = np.asarray(audio[:frame_count * vad.frame_length]).reshape(frame_count, vad.frame_length)
+    clipped = np.abs(frames).max(axis=1) >= CLIP_LEVEL
+    # A clipped frame costs more than a silent one: distortion carries into the cloned voice
+    score = speech.astype(np.float32) - 4.0 * clipped
+    window = min(frame_count, length // vad.frame_length)
+    totals = np.concatenate(([0.0], np.cumsum(score)))
+    best = int(np.argmax(totals[window:] - totals[:-window]))
+    start = best * vad.frame_length
+    return audio[start:start + length]
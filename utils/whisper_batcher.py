@@ -0,0 +1,210 @@
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+
+import torch
+import whisper
+from whisper.tokenizer import get_tokenizer
+
+# Micro-batching settings
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+WHISPER_BATCH_WAIT_MS = float(os.getenv("WHISPER_BATCH_WAIT_MS", "10"))
+
+# Same thresholds transcribe() uses to decide that a greedy decode went wrong
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+
+# Whisper decodes fixed 30 second windows of 16 kHz audio
+WINDOW_SAMPLES = whisper.audio.N_SAMPLES
+# Seconds per timestamp token
+TIME_PRECISION = 2 * whisper.audio.HOP_LENGTH / whisper.audio.SAMPLE_RATE
+
+
+# Decoding options that also apply to a single batched decode
+BATCHED_OPTIONS = ("beam_size", "temperature", "fp16")
+
+
+class _Request:
+    def __init__(self, audio, initial_prompt, options):
+        self.audio = audio
+        self.initial_prompt = initial_prompt
+        self.options = options
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+def _compression_ratio(text):
+    data = text.encode("utf-8")
+    return len(data) / len(zlib.compress(data)) if data else 0.0
+
+
+def _segments(tokens, tokenizer, duration):
+    """
+    Split decoded tokens into transcribe()-style segments at their timestamp tokens.
+
+    Whisper brackets each segment with <|start|> and <|end|> timestamps; text
+    after the last timestamp (a segment cut off by the end of the window)
+    runs to the end of the clip.
+    """
+    segments = []
+    start = None
+    text_tokens = []
+    for token in tokens:
+        if token < tokenizer.timestamp_begin:
+            text_tokens.append(token)
+            continue
+        position = min((token - tokenizer.timestamp_begin) * TIME_PRECISION, duration)
+        if start is not None and text_tokens:
+            segments.append((start, position, text_tokens))
+            start = None
+            text_tokens = []
+        else:
+            start = position
+    if text_tokens:
+        segments.append((start or 0.0, duration, text_tokens))
+
+    results = []
+    for start, end, text_tokens in segments:
+        text = tokenizer.decode(text_tokens)
+        if text.strip():
+            results.append({"id": len(results), "start": round(start, 2), "end": round(max(start, end), 2),
+                            "text": text})
+    return results
+
+
+class WhisperBatcher:
+    """
+    Micro-batching front end for a Whisper model.
+
+    Clips of up to 30 seconds are queued; a single scheduler thread waits at
+    most WHISPER_BATCH_WAIT_MS for up to WHISPER_BATCH_SIZE of them, stacks
+    their mel spectrograms and decodes them in one batched forward pass.
+    Each caller gets back a transcribe()-style result dict, with the segment
+    timestamps Whisper predicted. Longer clips, and
+    batched results that look like a failed greedy decode, go through the
+    regular model.transcribe() so accuracy is unchanged. Requests are only
+    batched with others using the same prompt and decoding options.
+    """
+
+    def __init__(self, get_model, model_lock=None, max_batch_size=WHISPER_BATCH_SIZE,
+                 max_wait_ms=WHISPER_BATCH_WAIT_MS, language="en"):
+        """
+        :param get_model: callable returning the Whisper model
+        """
+        self.get_model = get_model
+        self.model_lock = model_lock or threading.Lock()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.language = language
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def transcribe(self, audio, initial_prompt=None, options=None):
+        """
+        Transcribe 16 kHz float32 samples, batching short clips with concurrent callers.
+
+        :param options: transcribe() keyword arguments (language, beam_size, temperature,
+                        fp16, condition_on_previous_text)
+        """
+        options = dict(options or {})
+        if len(audio) > WINDOW_SAMPLES:
+            return self._transcribe_full(audio, initial_prompt, options)
+
+        request = _Request(audio, initial_prompt, options)
+        self._ensure_worker()
+        self._queue.put(request)
+        request.done.wait()
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def depth(self):
+        """Number of clips waiting for the next batch."""
+        return self._queue.qsize()
+
+    def _transcribe_full(self, audio, initial_prompt, options):
+        options = dict(options)
+        language = options.pop("language", self.language)
+        model = self.get_model()
+        with self.model_lock:
+            return model.transcribe(audio, language=language, initial_prompt=initial_prompt, **options)
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="whisper-batcher", daemon=True)
+                self._worker.start()
+
+    def _next_batch(self):
+        """Block for one request, then collect more until the batch is full or the wait runs out."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            # DecodingOptions carry a single prompt, so batch per prompt and options
+            groups = {}
+            for request in batch:
+                key = (request.initial_prompt, json.dumps(request.options, sort_keys=True))
+                groups.setdefault(key, []).append(request)
+            for (prompt, _), requests in groups.items():
+                try:
+                    self._decode_batch(requests, prompt, requests[0].options)
+                except Exception as e:
+                    for request in requests:
+                        request.error = e
+                finally:
+                    for request in requests:
+                        request.done.set()
+
+    def _decode_batch(self, requests, prompt, request_options):
+        model = self.get_model()
+        n_mels = model.dims.n_mels
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(request.audio)), n_mels)
+            for request in requests
+        ]).to(model.device)
+        language = request_options.get("language", self.language)
+        # A temperature fallback schedule (list) only makes sense for transcribe()
+        decoding = {key: request_options[key] for key in BATCHED_OPTIONS
+                    if key in request_options and not isinstance(request_options[key], (list, tuple))}
+        decoding.setdefault("fp16", model.device.type != "cpu")
+        options = whisper.DecodingOptions(language=language, prompt=prompt, without_timestamps=False, **decoding)
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, language=language,
+                                  task="transcribe")
+
+        with self.model_lock:
+            results = whisper.decode(model, mels, options)
+
+        for request, result in zip(requests, results):
+            text = result.text.strip()
+            if (_compression_ratio(text) > COMPRESSION_RATIO_THRESHOLD
+                    or result.avg_logprob < LOGPROB_THRESHOLD):
+                # Let transcribe() retry with its temperature fallback
+                try:
+                    request.result = self._transcribe_full(request.audio, prompt, request_options)
+                except Exception as e:
+                    request.error = e
+                continue
+            duration = len(request.audio) / whisper.audio.SAMPLE_RATE
+            request.result = {
+                "text": text,
+                "segments": _segments(result.tokens, tokenizer, duration),
+                "language": language
+            }
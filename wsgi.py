@@ -0,0 +1,20 @@
+import importlib.util
+import os
+
+# The entry scripts have file names that are not importable module names,
+# so load the one to serve (speech-endpoints.py by default) by path.
+SERVE_SCRIPT = os.getenv("SERVE_SCRIPT", "speech-endpoints.py")
+
+_spec = importlib.util.spec_from_file_location(
+    "speech_app", os.path.join(os.path.dirname(os.path.abspath(__file__)), SERVE_SCRIPT)
+)
+_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_module)
+
+# With preload_app the weights must be in memory before gunicorn forks the
+# workers, otherwise every worker would load its own copy
+if hasattr(_module, "wait_for_models"):
+    _module.wait_for_models()
+
+app = _module.app
+socketio = _module.socketio